@@ -1,19 +1,35 @@
 from typing import Union
 from typing import Optional
+from contextlib import AsyncExitStack, asynccontextmanager
+import os
+import re
+import time
+import json
 import oracledb
 from pydantic import BaseModel
+from pydantic import ValidationError
 from fastapi import FastAPI
 from fastapi import HTTPException
-from passlib.context import CryptContext
-import uuid
+from fastapi import Depends
+from fastapi import Query
+from fastapi import Request
+from fastapi import Response
+from fastapi import Header
+from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse
 from datetime import datetime
-
-# Configuración para el hashing de las contraseñas
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto",
-    bcrypt__rounds=10
-)
+import passwords
+import keys
+import pagination
+import export
+import cache
+import conditional
+import reservations
+import statements
+import sessions
+import telemetry
+import repository
+import catalog_loader
 
 
 class ContactInfo(BaseModel):
@@ -86,10 +102,141 @@ class PaymentCreate(BaseModel):
     method: str
 
 
-app = FastAPI(root_path="/api")
+# Pool del backend de datos (repository.DB_BACKEND: oracle o sqlite)
+pool = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Crear el pool una sola vez al iniciar la api
+    global pool
+    pool = repository.db.create_pool()
+    yield
+    await pool.close(force=True)
+    pool = None
+    passwords.shutdown()
+    catalog_loader.shutdown()
+
+
+@asynccontextmanager
+async def pooled_connection():
+    # Obtener una conexion del pool y devolverla al terminar.
+    # La conexion se entrega envuelta para medir round-trips y filas
+    started_at = time.perf_counter()
+    try:
+        connection = await pool.acquire()
+    except oracledb.Error as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"No hay conexiones disponibles: {str(e)}"
+        )
+    finally:
+        telemetry.record("acquire_seconds", time.perf_counter() - started_at)
+    try:
+        yield telemetry.InstrumentedConnection(connection)
+    finally:
+        await pool.release(connection)
+
+
+async def get_connection():
+    # Dependencia: una conexion del pool por peticion
+    async with pooled_connection() as connection:
+        yield connection
+
+
+async def backend_route(request: Request):
+    # Dependencia de todas las rutas: con un backend que no las implementa
+    # todas (sqlite) las demas responden 501 y no un 500 por el SQL de Oracle
+    route = request.scope.get("route")
+    if route is not None and not repository.db.supports(request.method, route.path):
+        raise HTTPException(
+            status_code=501,
+            detail=f"{request.method} {route.path} no esta disponible con el backend {repository.db.name}"
+        )
+
+
+async def current_client(authorization: Optional[str] = Header(None), connection: oracledb.AsyncConnection = Depends(get_connection)):
+    # Dependencia: id_client de la sesion del header
+    # "Authorization: Bearer <SessionID>". Reemplaza volver a enviar la
+    # contraseña, validar es buscar el token en el almacen de sesiones.
+    token = sessions.bearer_token(authorization)
+    if token is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Falta el token de sesion"
+        )
+
+    try:
+        id_client = await sessions.store.validate(connection, token)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al validar la sesion: {str(e)}"
+        )
+
+    if id_client is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Sesion invalida o expirada"
+        )
+    return id_client
+
+
+def check_session_client(session_client, id):
+    # Un cliente solo puede ver y modificar sus propios datos
+    if session_client != id:
+        raise HTTPException(
+            status_code=403,
+            detail="No tiene permiso para acceder a este usuario"
+        )
+
+
+async def row_version(query, id, kind):
+    # Consulta barata de la version de un recurso (updated_at, ORA_ROWSCN),
+    # query es la lectura del repositorio. Devuelve (etag, last_modified) o
+    # None si no existe
+    try:
+        row = await query
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al consultar la version: {str(e)}"
+        )
+
+    if not row:
+        return None
+    return conditional.make_etag(kind, id, *row), conditional.parse_db_date(row[0])
+
+
+async def bump_catalog_version(cursor):
+    # Se ejecuta justo antes del commit de cualquier cambio en productos, la
+    # fila queda bloqueada solo hasta ese commit. Las ordenes no la tocan
+    await cursor.execute(statements.BUMP_CATALOG_VERSION)
+
+
+async def catalog_version(connection):
+    # (updated_at, version) de todo el catalogo
+    try:
+        return await repository.db.catalog_version(connection)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al consultar la version: {str(e)}"
+        )
+
 
-# conectar a la base de datos
-dsn = 'system/bases1@localhost:1521/XE'
+def catalog_etag(version, stock):
+    # ETag de las respuestas del catalogo, que incluyen stock. La version
+    # cubre los productos; el stock lo descuentan las ordenes sin tocar
+    # catalogo_version (su bloqueo hasta el commit serializaria todas las
+    # ordenes), por eso entra el stock de la propia respuesta. Sin
+    # Last-Modified: la fecha del catalogo no cambia con el stock
+    return conditional.make_etag("catalog", *version, *stock)
+
+
+app = FastAPI(root_path="/api", lifespan=lifespan,
+              dependencies=[Depends(backend_route)])
+app.add_middleware(telemetry.TelemetryMiddleware)
 
 
 @app.get("/Hola_mundo")
@@ -97,14 +244,51 @@ def hola_mundo():
     return {"message": "Hola mundo"}
 
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    # Latencia, round-trips, filas, espera del pool y bcrypt por endpoint,
+    # mas los contadores de los demas /metrics/*, en formato Prometheus
+    return PlainTextResponse(
+        telemetry.render({
+            "cache": cache.catalog.get_stats(),
+            "passwords": passwords.get_stats(),
+            "reservations": reservations.get_stats(),
+            "sessions": sessions.store.get_stats()
+        }),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/metrics/cache")
+async def cache_metrics():
+    # Aciertos, fallos y desalojos del cache del catalogo
+    return cache.catalog.get_stats()
+
+
+@app.get("/metrics/passwords")
+async def password_metrics():
+    # Tiempos de hash/verify y espera en la cola de bcrypt
+    return passwords.get_stats()
+
+
+@app.get("/metrics/reservations")
+async def reservation_metrics():
+    # Descuentos de stock, conflictos y reintentos de las ordenes
+    return reservations.get_stats()
+
+
+@app.get("/metrics/sessions")
+async def session_metrics():
+    return sessions.store.get_stats()
+
+
 @app.get("/tablas")
-def read_root():
+async def read_root(connection: oracledb.AsyncConnection = Depends(get_connection)):
     try:
-        connection = oracledb.connect(dsn)
         cursor = connection.cursor()
 
         # Consulta las tablas disponibles
-        cursor.execute("""
+        await cursor.execute("""
             SELECT table_name 
             FROM user_tables 
             ORDER BY table_name
@@ -112,10 +296,9 @@ def read_root():
 
         columns = [col.name for col in cursor.description]
         cursor.rowfactory = lambda *args: dict(zip(columns, args))
-        data = cursor.fetchall()
+        data = await cursor.fetchall()
 
         cursor.close()
-        connection.close()
 
         return {
             "connection_status": "success",
@@ -124,11 +307,23 @@ def read_root():
     except Exception as e:
         return {"error": str(e)}, 500
 
+def violated_constraint(error):
+    # Nombre de la restriccion de un ORA-00001, en minusculas
+    match = re.search(r"ORA-00001: .*?\(\w+\.(\w+)\)", str(error))
+    return match.group(1).lower() if match else None
+
+
+# Restricciones unicas de clientes -> respuesta 409
+CLIENT_CONFLICTS = {
+    "uq_clients_national_document": "Documento nacional ya registrado",
+    "uq_inf_client_email": "Email ya registrado"
+}
+
 # Create client
 
 
 @app.post("/users", response_model=Client, status_code=201)
-async def create_client(cliente: Client):
+async def create_client(cliente: Client, connection: oracledb.AsyncConnection = Depends(get_connection)):
 
     # Validar que todos los campos requeridos estén presentes
     required_fields = [
@@ -160,111 +355,45 @@ async def create_client(cliente: Client):
             detail="El campo confirmed_email debe ser 'TRUE' o 'FALSE'"
         )
 
-    # Conectar a la base de datos
-    connection = oracledb.connect(dsn)
     cursor = connection.cursor()
 
     try:
-        # Verificar si el documento nacional ya existe
-        cursor.execute(
-            "SELECT COUNT(*) FROM CLIENTES WHERE national_document = :doc",
-            [cliente.national_document]
-        )
-        if cursor.fetchone()[0] > 0:
-            raise HTTPException(
-                status_code=409,
-                detail="Documento nacional ya registrado"
+        # Generar hash de la contraseña
+        hash_password = await passwords.hash_password(cliente.password)
+
+        # Ids del bloque ya reservado, normalmente sin ir a la base
+        nuevo_id = await keys.next_id(connection, "clientes")
+        nuevo_id_inf = await keys.next_id(
+            connection, "informacion_contacto_clientes")
+
+        # Insertar el cliente y su información de contacto y confirmar en
+        # un solo round-trip. Documento o email repetidos fallan con ORA-00001
+        try:
+            await cursor.execute(
+                statements.REGISTER_CLIENT,
+                {
+                    "id": nuevo_id,
+                    "doc": cliente.national_document,
+                    "nombre": cliente.name,
+                    "apellido": cliente.lastname,
+                    "pwd": hash_password,
+                    "id_inf": nuevo_id_inf,
+                    "phone": cliente.contact_info.phone,
+                    "email": cliente.contact_info.email,
+                    "active": cliente.contact_info.active.upper(),
+                    "confirmed_email": cliente.contact_info.confirmed_email.upper()
+                }
             )
-
-        # Verificar si el email ya existe
-        cursor.execute(
-            "SELECT COUNT(*) FROM informacion_contacto_clientes WHERE email = :email",
-            [cliente.contact_info.email]
-        )
-        if cursor.fetchone()[0] > 0:
+        except oracledb.IntegrityError as e:
+            detail = CLIENT_CONFLICTS.get(violated_constraint(e))
+            if detail is None:
+                raise
+            await connection.rollback()
             raise HTTPException(
                 status_code=409,
-                detail="Email ya registrado"
+                detail=detail
             )
 
-        # Generar hash de la contraseña
-        hash_password = pwd_context.hash(cliente.password)
-
-        # Obtener ID disponible para cliente
-        cursor.execute("SELECT COALESCE(MAX(id_client), 0) + 1 FROM clientes")
-        nuevo_id = cursor.fetchone()[0]
-
-        # Insertar nuevo cliente
-        cursor.execute(
-            """
-                INSERT INTO clientes (
-                    id_client,
-                    national_document,
-                    name,
-                    lastname,
-                    password,
-                    created_at,
-                    updated_at
-                ) VALUES (
-                    :id,
-                    :doc,
-                    :nombre,
-                    :apellido,
-                    :pwd,
-                    SYSDATE,
-                    SYSDATE
-                )
-                """,
-            {
-                "id": nuevo_id,
-                "doc": cliente.national_document,
-                "nombre": cliente.name,
-                "apellido": cliente.lastname,
-                "pwd": hash_password
-            }
-        )
-
-        # Obtener ID disponible para información del cliente (otra tabla)
-        cursor.execute(
-            "SELECT COALESCE(MAX(id_inf_client), 0) + 1 FROM informacion_contacto_clientes")
-        nuevo_id_inf = cursor.fetchone()[0]
-
-        # Insertar información de contacto
-        cursor.execute(
-            """
-                INSERT INTO informacion_contacto_clientes (
-                    id_inf_client,
-                    id_client,
-                    phone,
-                    email,
-                    active,
-                    confirmed_email,
-                    created_at,
-                    updated_at
-                ) VALUES (
-                    :id_inf,
-                    :id_client,
-                    :phone,
-                    :email,
-                    :active,
-                    :confirmed_email,
-                    SYSDATE,
-                    SYSDATE
-                )
-                """,
-            {
-                "id_inf": nuevo_id_inf,
-                "id_client": nuevo_id,
-                "phone": cliente.contact_info.phone,
-                "email": cliente.contact_info.email,
-                "active": cliente.contact_info.active.upper(),
-                "confirmed_email": cliente.contact_info.confirmed_email.upper()
-            }
-        )
-
-        # Commit the transaction
-        connection.commit()
-
         # Devolver los datos del cliente creado (sin la contraseña hash)
         response_data = {
             "national_document": cliente.national_document,
@@ -284,21 +413,20 @@ async def create_client(cliente: Client):
         # Re-lanzar las excepciones HTTP que ya hemos manejado
         raise
     except Exception as e:
-        connection.rollback()
+        await connection.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error creating client: {str(e)}"
         )
     finally:
-        # Close the cursor and the connection
+        # Close the cursor
         cursor.close()
-        connection.close()
 
 # login cliente
 
 
 @app.post("/users/login", status_code=200)
-async def login_client(login_data: Login):
+async def login_client(login_data: Login, connection: oracledb.AsyncConnection = Depends(get_connection)):
 
     # campos requeridos
     if not login_data.national_document or not login_data.password:
@@ -307,24 +435,10 @@ async def login_client(login_data: Login):
             detail="Falta algun campo requerido"
         )
 
-    # Conectar a la base de datos
-    connection = oracledb.connect(dsn)
-    cursor = connection.cursor()
-
     try:
-        # Buscar el cliente por national_document
-        cursor.execute(
-            """
-            SELECT c.id_client, c.national_document, c.name, c.lastname, c.password,
-                   ic.phone, ic.email, ic.active, ic.confirmed_email
-            FROM clientes c
-            JOIN informacion_contacto_clientes ic ON c.id_client = ic.id_client
-            WHERE c.national_document = :doc
-            """,
-            {"doc": login_data.national_document}
-        )
-
-        client_data = cursor.fetchone()
+        # Buscar el cliente por national_document: (id_client, password)
+        client_data = await repository.db.client_credentials(
+            connection, login_data.national_document)
 
         # Verificar si el documento nacional existe
         if not client_data:
@@ -334,20 +448,30 @@ async def login_client(login_data: Login):
             )
 
         # Verificar la contraseña
-        if not pwd_context.verify(login_data.password, client_data[4]):
+        valid, new_hash = await passwords.verify_and_update(
+            login_data.password, client_data[1])
+        if not valid:
             raise HTTPException(
                 status_code=401,
                 detail="Credenciales invalidas"
             )
 
-        # Generar ID aleatorio (token) para la sesión
-        session_id = str(uuid.uuid4())
+        # El hash guardado usa un costo fuera de la politica actual:
+        # se reemplaza aprovechando que se tiene la contraseña
+        if new_hash is not None:
+            await repository.db.rehash_password(
+                connection, client_data[0], client_data[1], new_hash)
+
+        # Crear la sesión, el token se usa en el header Authorization
+        session_id = await sessions.store.create(connection, client_data[0])
+        await connection.commit()
 
         # respuesta
         response_data = {
             "status": "success",
             "message": "User authenticated",
             "SessionID": session_id,
+            "expires_in": sessions.SESSION_TTL
         }
 
         return response_data
@@ -355,96 +479,145 @@ async def login_client(login_data: Login):
     except HTTPException:
         raise
     except Exception as e:
+        await connection.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error durante el login: {str(e)}"
         )
-    finally:
-        cursor.close()
-        connection.close()
 
-# get un cliente
+# Renovar y cerrar sesion
+@app.post("/users/refresh", status_code=200)
+async def refresh_session(authorization: Optional[str] = Header(None), connection: oracledb.AsyncConnection = Depends(get_connection)):
+    token = sessions.bearer_token(authorization)
+    if token is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Falta el token de sesion"
+        )
+
+    try:
+        if not await sessions.store.refresh(connection, token):
+            raise HTTPException(
+                status_code=401,
+                detail="Sesion invalida o expirada"
+            )
+        await connection.commit()
 
+        return {
+            "status": "success",
+            "message": "Session refreshed",
+            "SessionID": token,
+            "expires_in": sessions.SESSION_TTL
+        }
 
-@app.get("/users/{id}", status_code=200)
-async def get_client(id: int):
-    # Conectar a la base de datos
-    connection = oracledb.connect(dsn)
-    cursor = connection.cursor()
+    except HTTPException:
+        raise
+    except Exception as e:
+        await connection.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al renovar la sesion: {str(e)}"
+        )
+
+
+@app.post("/users/logout", status_code=200)
+async def logout_client(authorization: Optional[str] = Header(None), connection: oracledb.AsyncConnection = Depends(get_connection)):
+    token = sessions.bearer_token(authorization)
+    if token is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Falta el token de sesion"
+        )
 
     try:
+        await sessions.store.revoke(connection, token)
+        await connection.commit()
 
-        # información de contacto
-        cursor.execute(
-            """
-            SELECT c.id_client, c.national_document, c.name, c.lastname,
-                   ic.phone, ic.email, ic.active, ic.confirmed_email,
-                   TO_CHAR(c.created_at, 'YYYY-MM-DD HH24:MI:SS'),
-                   TO_CHAR(c.updated_at, 'YYYY-MM-DD HH24:MI:SS')
-            FROM clientes c
-            JOIN informacion_contacto_clientes ic ON c.id_client = ic.id_client
-            WHERE c.id_client = :id
-            """,
-            {"id": id}
+        return {"status": "success", "message": "Session closed"}
+
+    except Exception as e:
+        await connection.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al cerrar la sesion: {str(e)}"
         )
 
-        client_data = cursor.fetchone()
+# get un cliente
 
-        # Verificar si el cliente existe
-        if not client_data:
-            raise HTTPException(
-                status_code=404,
-                detail="El usuario no existe"
-            )
 
-        # response
-        response_data = {
-            "id_client": client_data[0],
-            "national_document": client_data[1],
-            "name": client_data[2],
-            "lastname": client_data[3],
-            "contact_info": {
-                "phone": client_data[4],
-                "email": client_data[5],
-                "active": client_data[6],
-                "confirmed_email": client_data[7]
-            },
-            "created_at": client_data[8],
-            "updated_at": client_data[9]
-        }
+@app.get("/users/{id}", status_code=200)
+async def get_client(id: int, request: Request, response: Response, connection: oracledb.AsyncConnection = Depends(get_connection), session_client: int = Depends(current_client)):
+    check_session_client(session_client, id)
 
-        return response_data
+    # Version del cliente para responder 304 sin armar la respuesta
+    version = await row_version(
+        repository.db.client_version(connection, id), id, "client")
+
+    if version is None:
+        raise HTTPException(
+            status_code=404,
+            detail="El usuario no existe"
+        )
+
+    etag, last_modified = version
+    if conditional.not_modified(request, etag, last_modified):
+        return conditional.not_modified_response(etag, last_modified)
+
+    response_data = await load_client(connection, id)
+    response.headers.update(conditional.headers(etag, last_modified))
+    return response_data
 
-    except HTTPException:
-        raise
-    except Exception as e:
 
+async def load_client(connection, id):
+    try:
+        # información de contacto
+        client_data = await repository.db.client_detail(connection, id)
+    except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error al obtener información del cliente: {str(e)}"
         )
-    finally:
 
-        cursor.close()
-        connection.close()
+    # Verificar si el cliente existe
+    if not client_data:
+        raise HTTPException(
+            status_code=404,
+            detail="El usuario no existe"
+        )
+
+    # response
+    return {
+        "id_client": client_data[0],
+        "national_document": client_data[1],
+        "name": client_data[2],
+        "lastname": client_data[3],
+        "contact_info": {
+            "phone": client_data[4],
+            "email": client_data[5],
+            "active": client_data[6],
+            "confirmed_email": client_data[7]
+        },
+        "created_at": client_data[8],
+        "updated_at": client_data[9]
+    }
 
 # Actualizar cliente
 
 
 @app.put("/users/{id}", status_code=200)
-async def update_client(id: int, update_data: dict):
-    # Conectar a la base de datos
-    connection = oracledb.connect(dsn)
+async def update_client(id: int, update_data: dict, connection: oracledb.AsyncConnection = Depends(get_connection), session_client: int = Depends(current_client)):
+    check_session_client(session_client, id)
+
     cursor = connection.cursor()
 
     try:
         # ver si el usuario existe
-        cursor.execute(
-            "SELECT COUNT(*) FROM clientes WHERE id_client = :id",
+        await cursor.execute(
+            statements.CLIENT_EXISTS,
             {"id": id}
         )
 
-        if cursor.fetchone()[0] == 0:
+        if (await cursor.fetchone())[0] == 0:
             raise HTTPException(
                 status_code=404,
                 detail="Usuario no existe"
@@ -470,52 +643,52 @@ async def update_client(id: int, update_data: dict):
             'confirmed_email': 'confirmed_email'
         }
 
-        client_updates = []
-        contact_updates = []
-        params = {"id": id}
+        # Las sentencias tienen texto fijo: los campos que no se envian
+        # van como NULL y conservan su valor (NVL)
+        client_params = {"id": id}
+        contact_params = {"id": id}
 
         # Procesar campos de clientes
         for field, db_field in client_fields.items():
-            if field in update_data:
-                client_updates.append(f"{db_field} = :{field}")
-                params[field] = update_data[field]
+            client_params[db_field] = update_data.get(field)
 
         # Procesar campos de contacto_cliente
         for field, db_field in contact_fields.items():
-            if field in update_data:
-                # Validar campos booleanos
-                if field in ['active', 'confirmed_email']:
-                    if update_data[field].upper() not in ['TRUE', 'FALSE']:
-                        raise HTTPException(
-                            status_code=400,
-                            detail=f"El campo {field} debe ser 'TRUE' o 'FALSE'"
-                        )
-                    params[field] = update_data[field].upper()
-                else:
-                    params[field] = update_data[field]
-                contact_updates.append(f"{db_field} = :{field}")
+            value = update_data.get(field)
+            # Validar campos booleanos
+            if value is not None and field in ['active', 'confirmed_email']:
+                if value.upper() not in ['TRUE', 'FALSE']:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"El campo {field} debe ser 'TRUE' o 'FALSE'"
+                    )
+                value = value.upper()
+            contact_params[db_field] = value
+
+        client_updates = any(
+            value is not None for field, value in client_params.items() if field != "id")
+        contact_updates = any(
+            value is not None for field, value in contact_params.items() if field != "id")
 
         # Verificar si el nuevo email ya existe
-        if 'email' in update_data:
-            cursor.execute(
-                """SELECT COUNT(*) FROM informacion_contacto_clientes 
-                   WHERE email = :email AND id_client != :id""",
+        if update_data.get('email') is not None:
+            await cursor.execute(
+                statements.EMAIL_TAKEN,
                 {"email": update_data['email'], "id": id}
             )
-            if cursor.fetchone()[0] > 0:
+            if (await cursor.fetchone())[0] > 0:
                 raise HTTPException(
                     status_code=400,
                     detail="El email ya está registrado por otro usuario"
                 )
 
         # Verificar si el nuevo documento nacional ya existe
-        if 'national_document' in update_data:
-            cursor.execute(
-                """SELECT COUNT(*) FROM clientes 
-                   WHERE national_document = :doc AND id_client != :id""",
+        if update_data.get('national_document') is not None:
+            await cursor.execute(
+                statements.DOCUMENT_TAKEN,
                 {"doc": update_data['national_document'], "id": id}
             )
-            if cursor.fetchone()[0] > 0:
+            if (await cursor.fetchone())[0] > 0:
                 raise HTTPException(
                     status_code=400,
                     detail="El documento nacional ya esta registrado por otro usuario"
@@ -523,25 +696,15 @@ async def update_client(id: int, update_data: dict):
 
         # Actualizar tabla de clientes si hay campos
         if client_updates:
-            update_query = f"""
-                UPDATE clientes
-                SET {', '.join(client_updates)}, updated_at = SYSDATE
-                WHERE id_client = :id
-            """
-            cursor.execute(update_query, params)
+            await cursor.execute(statements.UPDATE_CLIENT, client_params)
 
         # Actualizar tabla de contacto
         if contact_updates:
-            update_query = f"""
-                UPDATE informacion_contacto_clientes
-                SET {', '.join(contact_updates)}, updated_at = SYSDATE
-                WHERE id_client = :id
-            """
-            cursor.execute(update_query, params)
+            await cursor.execute(statements.UPDATE_CONTACT, contact_params)
 
         # Confirmar cambios si hubo actualizaciones
         if client_updates or contact_updates:
-            connection.commit()
+            await connection.commit()
             return {"message": "Actualización exitosa"}
         else:
             raise HTTPException(
@@ -552,167 +715,269 @@ async def update_client(id: int, update_data: dict):
     except HTTPException:
         raise
     except Exception as e:
-        connection.rollback()
+        await connection.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error al actualizar el cliente: {str(e)}"
         )
     finally:
         cursor.close()
-        connection.close()
 
 # Eliminar usuario
 
 
 @app.delete("/users/{id}", status_code=200)
-async def delete_client(id: int):
-    # Conectar a la base de datos
-    connection = oracledb.connect(dsn)
+async def delete_client(id: int, connection: oracledb.AsyncConnection = Depends(get_connection), session_client: int = Depends(current_client)):
+    check_session_client(session_client, id)
+
     cursor = connection.cursor()
 
     try:
         # ver si el usuario existe
-        cursor.execute(
-            "SELECT COUNT(*) FROM clientes WHERE id_client = :id",
+        await cursor.execute(
+            statements.CLIENT_EXISTS,
             {"id": id}
         )
-        if cursor.fetchone()[0] == 0:
+        if (await cursor.fetchone())[0] == 0:
             raise HTTPException(
                 status_code=404,
                 detail="El usuario no existe"
             )
 
-        # Eliminar información de contacto primero
-        cursor.execute(
+        # Cerrar sus sesiones y eliminar información de contacto primero
+        await sessions.store.revoke_client(connection, id)
+        await cursor.execute(
             "DELETE FROM informacion_contacto_clientes WHERE id_client = :id",
             {"id": id}
         )
 
         # Eliminar el cliente
-        cursor.execute(
+        await cursor.execute(
             "DELETE FROM clientes WHERE id_client = :id",
             {"id": id}
         )
 
-        connection.commit()
+        await connection.commit()
 
         return {"message": "Usuario eliminado con exito"}
 
     except HTTPException:
         raise
     except Exception as e:
-        connection.rollback()
+        await connection.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error al eliminar el cliente: {str(e)}"
         )
     finally:
         cursor.close()
-        connection.close()
 
 
 # ======== Productos =========
 # Obtener lista de productos
 @app.get("/products", status_code=200)
-async def get_products():
-    # Conectar a la base de datos
-    connection = oracledb.connect(dsn)
-    cursor = connection.cursor()
+async def get_products(
+    request: Request,
+    response: Response,
+    limit: int = pagination.DEFAULT_PAGE_SIZE,
+    page_cursor: Optional[str] = Query(None, alias="cursor"),
+    location: Optional[int] = None
+):
+    limit = pagination.page_size(limit)
+    after = pagination.decode_cursor(page_cursor)
+    after_id = after.get("id") if after else None
+
+    # Las paginas del catalogo se sirven del cache mientras no cambien
+    key = ("products", limit, after_id, location)
+    cached = cache.catalog.get(key)
+
+    if cached is None:
+        generation = cache.catalog.generation
+        async with pooled_connection() as connection:
+            # Version de todo el catalogo, una fila
+            version = await catalog_version(connection)
+            response_data = await load_products(
+                connection, limit, after_id, location)
+
+        products = response_data["products"]
+        etag = catalog_etag(version, product_stock(products))
+        last_id = products[-1]['id_product'] if response_data["next_cursor"] else cache.NO_LIMIT
+        cached = (response_data, etag, None)
+        cache.catalog.set(
+            key, cached,
+            (after_id if after_id is not None else float("-inf"), last_id),
+            generation
+        )
 
-    try:
-        # Consulta para obtener los productos con su stock
-        cursor.execute("""
-            SELECT p.id_product, p.name, p.price, 
-                   COALESCE(SUM(i.quantity), 0) as stock
-            FROM productos p
-            LEFT JOIN inventario i ON p.id_product = i.id_product
-            WHERE p.active = 'TRUE'
-            GROUP BY p.id_product, p.name, p.price
-            ORDER BY p.id_product
-        """)
+    response_data, etag, last_modified = cached
+    if conditional.not_modified(request, etag, last_modified):
+        return conditional.not_modified_response(etag, last_modified)
 
-        columns = [col[0].lower() for col in cursor.description]
-        cursor.rowfactory = lambda *args: dict(zip(columns, args))
-        products = cursor.fetchall()
+    response.headers.update(conditional.headers(etag, last_modified))
+    return response_data
 
-        return {"products": products}
 
+def product_stock(products):
+    return [f"{product['id_product']}={product['stock']}" for product in products]
+
+
+async def load_products(connection, limit, after_id, location, category_id=None):
+    # Paginacion por llave (id_product) y filtros opcionales por sede y
+    # categoria
+    try:
+        # Consulta para obtener los productos con su stock
+        products = await repository.db.list_products(
+            connection, limit, after_id, location, category_id)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error al obtener los productos: {str(e)}"
         )
-    finally:
-        cursor.close()
-        connection.close()
 
-# Detalles de un producto
+    next_cursor = pagination.next_cursor(
+        products, limit, lambda row: {"id": row['id_product']})
 
+    return {"products": products, "next_cursor": next_cursor}
 
-@app.get("/products/{id}", response_model=ProductDetail, status_code=200)
-async def get_product_detail(id: int):
+# Buscar productos por nombre, descripcion, slug y sku. Se declara antes de
+# /products/{id} para que "search" no se lea como id
 
-    # Conectar a la base de datos
-    connection = oracledb.connect(dsn)
-    cursor = connection.cursor()
 
-    try:
-        # Consultar información del producto
-        cursor.execute(
-            """
-            SELECT 
-                id_product, sku, name, description, price, 
-                slug, category_id, active,
-                TO_CHAR(created_at, 'YYYY-MM-DD HH24:MI:SS'),
-                TO_CHAR(updated_at, 'YYYY-MM-DD HH24:MI:SS')
-            FROM productos
-            WHERE id_product = :id
-            """,
-            {"id": id}
+@app.get("/products/search", status_code=200)
+async def search_products(
+    request: Request,
+    response: Response,
+    q: str,
+    limit: int = pagination.DEFAULT_PAGE_SIZE,
+    page_cursor: Optional[str] = Query(None, alias="cursor"),
+    category: Optional[int] = None,
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None
+):
+    terms = repository.search_terms(q)
+    if not terms:
+        raise HTTPException(
+            status_code=400,
+            detail="La busqueda debe tener al menos una palabra"
         )
 
-        product_data = cursor.fetchone()
-
-        # Verificar si el producto existe
-        if not product_data:
+    limit = pagination.page_size(limit)
+    after = pagination.decode_cursor(page_cursor)
+    if after is not None:
+        if "score" not in after or "id" not in after:
             raise HTTPException(
-                status_code=404,
-                detail="Producto no encontrado"
+                status_code=400,
+                detail="Cursor de paginacion invalido"
             )
+        after = (after["score"], after["id"])
+
+    # Los resultados pueden incluir cualquier producto: el rango de la
+    # entrada es todo el catalogo y cualquier cambio la invalida
+    key = ("search", tuple(terms), limit, after, category, min_price, max_price)
+    cached = cache.catalog.get(key)
+
+    if cached is None:
+        generation = cache.catalog.generation
+        async with pooled_connection() as connection:
+            version = await catalog_version(connection)
+            try:
+                products = await repository.db.search_products(
+                    connection, terms, limit, after, category, min_price, max_price)
+            except Exception as e:
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Error al buscar productos: {str(e)}"
+                )
 
-        # respuesta
-        response_data = {
-            "id_product": product_data[0],
-            "sku": product_data[1],
-            "name": product_data[2],
-            "description": product_data[3],
-            "price": product_data[4],
-            "slug": product_data[5],
-            "category_id": product_data[6],
-            "active": product_data[7],
-            "created_at": product_data[8],
-            "updated_at": product_data[9]
-        }
+        next_cursor = pagination.next_cursor(
+            products, limit, lambda row: {"score": row["score"], "id": row["id_product"]})
+        etag = catalog_etag(version, product_stock(products))
+        cached = ({"products": products, "next_cursor": next_cursor}, etag, None)
+        cache.catalog.set(
+            key, cached, (float("-inf"), cache.NO_LIMIT), generation)
 
-        return response_data
+    response_data, etag, last_modified = cached
+    if conditional.not_modified(request, etag, last_modified):
+        return conditional.not_modified_response(etag, last_modified)
 
-    except HTTPException:
-        raise
+    response.headers.update(conditional.headers(etag, last_modified))
+    return response_data
+
+
+# Detalles de un producto
+
+
+@app.get("/products/{id}", response_model=ProductDetail, status_code=200)
+async def get_product_detail(id: int, request: Request, response: Response):
+    key = ("product", id)
+    cached = cache.catalog.get(key)
+
+    if cached is None:
+        generation = cache.catalog.generation
+        async with pooled_connection() as connection:
+            version = await row_version(
+                repository.db.product_version(connection, id), id, "product")
+
+            if version is None:
+                raise HTTPException(
+                    status_code=404,
+                    detail="Producto no encontrado"
+                )
+
+            etag, last_modified = version
+            if conditional.not_modified(request, etag, last_modified):
+                return conditional.not_modified_response(etag, last_modified)
+
+            response_data = await load_product_detail(connection, id)
+
+        cached = (response_data, etag, last_modified)
+        cache.catalog.set(key, cached, (id - 1, id), generation)
+
+    response_data, etag, last_modified = cached
+    if conditional.not_modified(request, etag, last_modified):
+        return conditional.not_modified_response(etag, last_modified)
+
+    response.headers.update(conditional.headers(etag, last_modified))
+    return response_data
+
+
+async def load_product_detail(connection, id):
+    try:
+        # Consultar información del producto
+        product_data = await repository.db.product_detail(connection, id)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error al obtener el producto: {str(e)}"
         )
-    finally:
-        cursor.close()
-        connection.close()
+
+    # Verificar si el producto existe
+    if not product_data:
+        raise HTTPException(
+            status_code=404,
+            detail="Producto no encontrado"
+        )
+
+    # respuesta
+    return {
+        "id_product": product_data[0],
+        "sku": product_data[1],
+        "name": product_data[2],
+        "description": product_data[3],
+        "price": product_data[4],
+        "slug": product_data[5],
+        "category_id": product_data[6],
+        "active": product_data[7],
+        "created_at": product_data[8],
+        "updated_at": product_data[9]
+    }
 
 
 # Crear producto
 
 
 @app.post("/products", status_code=201)
-async def create_product(product: ProductCreate):
+async def create_product(product: ProductCreate, connection: oracledb.AsyncConnection = Depends(get_connection)):
     # Validar campos requeridos
     if not all([product.sku, product.name, product.description, product.slug, product.category_id]):
         raise HTTPException(
@@ -727,54 +992,26 @@ async def create_product(product: ProductCreate):
             detail="El campo active debe ser 'TRUE' o 'FALSE'"
         )
 
-    # Conectar a la base de datos
-    connection = oracledb.connect(dsn)
     cursor = connection.cursor()
 
     try:
         # Verificar si el SKU ya existe
-        cursor.execute(
-            "SELECT COUNT(*) FROM productos WHERE sku = :sku",
+        await cursor.execute(
+            statements.SKU_EXISTS,
             {"sku": product.sku}
         )
-        if cursor.fetchone()[0] > 0:
+        if (await cursor.fetchone())[0] > 0:
             raise HTTPException(
                 status_code=409,
                 detail="El SKU ya está registrado"
             )
 
         # Obtener ID disponible para producto
-        cursor.execute(
-            "SELECT COALESCE(MAX(id_product), 0) + 1 FROM productos")
-        new_product_id = cursor.fetchone()[0]
+        new_product_id = await keys.next_id(connection, "productos")
 
         # Insertar nuevo producto
-        cursor.execute(
-            """
-            INSERT INTO productos (
-                id_product,
-                sku,
-                name,
-                description,
-                price,
-                slug,
-                category_id,
-                active,
-                created_at,
-                updated_at
-            ) VALUES (
-                :id,
-                :sku,
-                :name,
-                :description,
-                :price,
-                :slug,
-                :category_id,
-                :active,
-                SYSDATE,
-                SYSDATE
-            )
-            """,
+        await cursor.execute(
+            statements.INSERT_PRODUCT,
             {
                 "id": new_product_id,
                 "sku": product.sku,
@@ -788,39 +1025,24 @@ async def create_product(product: ProductCreate):
         )
 
         # Obtener ID disponible para inventario
-        cursor.execute(
-            "SELECT COALESCE(MAX(id_inventory), 0) + 1 FROM inventario")
-        new_inventory_id = cursor.fetchone()[0]
+        new_inventory_id = await keys.next_id(connection, "inventario")
 
         # Insertar registro en inventario
-        cursor.execute(
-            """
-            INSERT INTO inventario (
-                id_inventory,
-                id_product,
-                id_location,
-                quantity,
-                created_at,
-                updated_at
-            ) VALUES (
-                :id,
-                :product_id,
-                :id_location,
-                :quantity,
-                SYSDATE,
-                SYSDATE
-            )
-            """,
+        await cursor.execute(
+            statements.INSERT_INVENTORY,
             {
-                "id": new_inventory_id,
-                "product_id": new_product_id,
+                "new_id": new_inventory_id,
+                "id": new_product_id,
                 "id_location": product.id_location,
                 "quantity": product.quantity
             }
         )
 
+        await bump_catalog_version(cursor)
+
         # Commit the transaction
-        connection.commit()
+        await connection.commit()
+        cache.catalog.invalidate_products([new_product_id])
 
         # Respuesta con los datos del producto creado
         response_data = {
@@ -844,7 +1066,7 @@ async def create_product(product: ProductCreate):
         # Re-lanzar las excepciones HTTP
         raise
     except Exception as e:
-        connection.rollback()
+        await connection.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error creating product: {str(e)}"
@@ -852,33 +1074,68 @@ async def create_product(product: ProductCreate):
     finally:
 
         cursor.close()
-        connection.close()
 
 
-# Actualizar producto
-@app.put("/products/{id}", status_code=200)
-async def update_product(id: int, update_data: dict):
+# Carga masiva del catalogo (CSV o NDJSON), ver catalog_loader.py
 
-    # Conectar a la base de datos
-    connection = oracledb.connect(dsn)
-    cursor = connection.cursor()
 
-    try:
-        # Verificar si el producto existe
-        cursor.execute(
-            "SELECT COUNT(*) FROM productos WHERE id_product = :id",
-            {"id": id}
+@app.post("/products/bulk", status_code=200)
+async def load_products_bulk(request: Request):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type == "text/csv":
+        kind = "csv"
+    elif content_type in ["application/x-ndjson", "application/ndjson"]:
+        kind = "ndjson"
+    else:
+        raise HTTPException(
+            status_code=415,
+            detail="Se espera text/csv o application/x-ndjson"
         )
-        if cursor.fetchone()[0] == 0:
-            raise HTTPException(
-                status_code=404,
-                detail="Producto no encontrado"
-            )
 
-        if not update_data:
-            raise HTTPException(
-                status_code=400,
-                detail="Se debe proporcionar al menos un campo valido para actualizar"
+    # Cada bloque confirmado ya es visible: se invalida su parte del cache
+    # sin esperar al resto de la carga
+    def chunk_loaded(result):
+        if result["product_ids"]:
+            cache.catalog.invalidate_products(result["product_ids"])
+
+    try:
+        summary = await catalog_loader.load(kind, request.stream(), on_chunk=chunk_loaded)
+        return {"status": "success", **summary}
+
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error loading products: {str(e)}"
+        )
+
+
+# Actualizar producto
+@app.put("/products/{id}", status_code=200)
+async def update_product(id: int, update_data: dict, connection: oracledb.AsyncConnection = Depends(get_connection)):
+
+    cursor = connection.cursor()
+
+    try:
+        # Verificar si el producto existe
+        await cursor.execute(
+            statements.PRODUCT_EXISTS,
+            {"id": id}
+        )
+        if (await cursor.fetchone())[0] == 0:
+            raise HTTPException(
+                status_code=404,
+                detail="Producto no encontrado"
+            )
+
+        if not update_data:
+            raise HTTPException(
+                status_code=400,
+                detail="Se debe proporcionar al menos un campo valido para actualizar"
             )
 
         # Separar campos de producto e inventario
@@ -897,114 +1154,84 @@ async def update_product(id: int, update_data: dict):
             'quantity': 'quantity'
         }
 
-        product_updates = []
-        inventory_updates = []
-        params = {"id": id}
+        # Las sentencias tienen texto fijo: los campos que no se envian
+        # van como NULL y conservan su valor (NVL)
+        product_params = {"id": id}
+        inventory_params = {"id": id}
 
         for field, db_field in product_fields.items():
-            if field in update_data:
-                # Validar campo active
-                if field == 'active':
-                    if update_data[field].upper() not in ['TRUE', 'FALSE']:
-                        raise HTTPException(
-                            status_code=400,
-                            detail="El campo active debe ser 'TRUE' o 'FALSE'"
-                        )
-                    params[field] = update_data[field].upper()
-                else:
-                    params[field] = update_data[field]
-                product_updates.append(f"{db_field} = :{field}")
+            value = update_data.get(field)
+            # Validar campo active
+            if value is not None and field == 'active':
+                if value.upper() not in ['TRUE', 'FALSE']:
+                    raise HTTPException(
+                        status_code=400,
+                        detail="El campo active debe ser 'TRUE' o 'FALSE'"
+                    )
+                value = value.upper()
+            product_params[db_field] = value
 
         # inventario
         for field, db_field in inventory_fields.items():
-            if field in update_data:
-                inventory_updates.append(f"{db_field} = :{field}")
-                params[field] = update_data[field]
+            inventory_params[db_field] = update_data.get(field)
+
+        product_updates = any(
+            value is not None for field, value in product_params.items() if field != "id")
+        inventory_updates = any(
+            value is not None for field, value in inventory_params.items() if field != "id")
 
         # Verificar si el nuevo SKU ya exist
-        if 'sku' in update_data:
-            cursor.execute(
-                """SELECT COUNT(*) FROM productos 
-                   WHERE sku = :sku AND id_product != :id""",
+        if update_data.get('sku') is not None:
+            await cursor.execute(
+                statements.SKU_TAKEN,
                 {"sku": update_data['sku'], "id": id}
             )
-            if cursor.fetchone()[0] > 0:
+            if (await cursor.fetchone())[0] > 0:
                 raise HTTPException(
                     status_code=400,
                     detail="El SKU ya está registrado por otro producto"
                 )
 
-        # Actualizar tabla de productos
-        if product_updates:
-            update_query = f"""
-                UPDATE productos
-                SET {', '.join(product_updates)}, updated_at = SYSDATE
-                WHERE id_product = :id
-            """
-            cursor.execute(update_query, params)
-
+        # Inventario antes que productos: las ordenes bloquean inventario,
+        # stock_productos y la cola del resumen en ese orden, y el trigger de
+        # productos (011) lee stock_productos y despues bloquea
+        # resumen_categorias; con el mismo orden no hay deadlocks
         # Actualizar tabla de inventario
         if inventory_updates:
             # Verificar si ya existe un registro de inventario para este producto
-            cursor.execute(
-                "SELECT COUNT(*) FROM inventario WHERE id_product = :id",
+            await cursor.execute(
+                statements.PRODUCT_HAS_INVENTORY,
                 {"id": id}
             )
 
-            if cursor.fetchone()[0] > 0:
+            if (await cursor.fetchone())[0] > 0:
                 # Actualizar registro existente
-                update_query = f"""
-                    UPDATE inventario
-                    SET {', '.join(inventory_updates)}, updated_at = SYSDATE
-                    WHERE id_product = :id
-                """
+                await cursor.execute(
+                    statements.UPDATE_INVENTORY, inventory_params)
             else:
                 # Crear nuevo registro de inventario
-                cursor.execute(
-                    "SELECT COALESCE(MAX(id_inventory), 0) + 1 FROM inventario"
-                )
-                new_inventory_id = cursor.fetchone()[0]
-
-                update_query = f"""
-                    INSERT INTO inventario (
-                        id_inventory,
-                        id_product,
-                        {', '.join(inventory_fields.values())},
-                        created_at,
-                        updated_at
-                    ) VALUES (
-                        :new_id,
-                        :id,
-                        {', '.join(f':{f}' for f in inventory_fields.keys() if f in update_data)},
-                        SYSDATE,
-                        SYSDATE
-                    )
-                """
-                params["new_id"] = new_inventory_id
+                inventory_params["new_id"] = await keys.next_id(
+                    connection, "inventario")
+                await cursor.execute(
+                    statements.INSERT_INVENTORY, inventory_params)
 
-            cursor.execute(update_query, params)
+        # Actualizar tabla de productos
+        if product_updates:
+            await cursor.execute(statements.UPDATE_PRODUCT, product_params)
 
         # Confirmar cambios
         if product_updates or inventory_updates:
-            connection.commit()
+            await bump_catalog_version(cursor)
+            await connection.commit()
+            cache.catalog.invalidate_products([id])
 
             # Obtener los datos actualizados del producto
-            cursor.execute(
-                """
-                SELECT 
-                    p.id_product, p.sku, p.name, p.description, p.price, 
-                    p.slug, p.category_id, p.active,
-                    TO_CHAR(p.created_at, 'YYYY-MM-DD HH24:MI:SS'),
-                    TO_CHAR(p.updated_at, 'YYYY-MM-DD HH24:MI:SS'),
-                    i.id_location, i.quantity
-                FROM productos p
-                LEFT JOIN inventario i ON p.id_product = i.id_product
-                WHERE p.id_product = :id
-                """,
+            await cursor.execute(
+                statements.PRODUCT_WITH_INVENTORY,
                 {"id": id}
             )
 
-            updated_data = cursor.fetchone()
+            updated_data = await cursor.fetchone()
 
             response_data = {
                 "id_product": updated_data[0],
@@ -1032,107 +1259,218 @@ async def update_product(id: int, update_data: dict):
 
     except HTTPException:
         raise
+    except oracledb.IntegrityError as e:
+        # UPDATE_INVENTORY mueve el inventario a una sede donde el producto
+        # ya tiene otra fila (uq_inventory_product_location)
+        await connection.rollback()
+        if violated_constraint(e) != "uq_inventory_product_location":
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error al actualizar el producto: {str(e)}"
+            )
+        raise HTTPException(
+            status_code=409,
+            detail="El producto ya tiene inventario en esa sede"
+        )
     except Exception as e:
-        connection.rollback()
+        await connection.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error al actualizar el producto: {str(e)}"
         )
     finally:
         cursor.close()
-        connection.close()
 
 # Eliminar producto
 
 
 @app.delete("/products/{id}", status_code=200)
-async def delete_product(id: int):
+async def delete_product(id: int, connection: oracledb.AsyncConnection = Depends(get_connection)):
 
-    # Conectar a la base de datos
-    connection = oracledb.connect(dsn)
     cursor = connection.cursor()
 
     try:
         # Verificar si el producto existe
-        cursor.execute(
-            "SELECT COUNT(*) FROM productos WHERE id_product = :id",
+        await cursor.execute(
+            statements.PRODUCT_EXISTS,
             {"id": id}
         )
-        if cursor.fetchone()[0] == 0:
+        if (await cursor.fetchone())[0] == 0:
             raise HTTPException(
                 status_code=404,
                 detail="Producto no encontrado"
             )
 
         # Verificar si existen órdenes asociadas al producto
-        cursor.execute(
-            "SELECT COUNT(*) FROM ordenes_productos WHERE id_product = :id",
+        await cursor.execute(
+            statements.PRODUCT_HAS_ORDERS,
             {"id": id}
         )
-        if cursor.fetchone()[0] > 0:
+        if (await cursor.fetchone())[0] > 0:
             raise HTTPException(
                 status_code=400,
                 detail="No se puede eliminar el producto porque tiene ordenes asociadas"
             )
 
         # Verificar si existen movimientos asociados al producto
-        cursor.execute(
-            "SELECT COUNT(*) FROM movimientos_productos WHERE id_product = :id",
+        await cursor.execute(
+            statements.PRODUCT_HAS_MOVEMENTS,
             {"id": id}
         )
-        if cursor.fetchone()[0] > 0:
+        if (await cursor.fetchone())[0] > 0:
             raise HTTPException(
                 status_code=400,
                 detail="No se puede eliminar el producto porque tiene movimientos asociados"
             )
 
         # Verificar si existen imágenes asociadas al producto
-        cursor.execute(
-            "SELECT COUNT(*) FROM imagenes WHERE id_product = :id",
+        await cursor.execute(
+            statements.PRODUCT_HAS_IMAGES,
             {"id": id}
         )
-        if cursor.fetchone()[0] > 0:
+        if (await cursor.fetchone())[0] > 0:
             raise HTTPException(
                 status_code=400,
                 detail="No se puede eliminar el producto porque tiene imágenes asociadas"
             )
 
         # Eliminar registro de inventario primero
-        cursor.execute(
-            "DELETE FROM inventario WHERE id_product = :id",
+        await cursor.execute(
+            statements.DELETE_PRODUCT_INVENTORY,
             {"id": id}
         )
 
         # Eliminar el producto
-        cursor.execute(
-            "DELETE FROM productos WHERE id_product = :id",
+        await cursor.execute(
+            statements.DELETE_PRODUCT,
             {"id": id}
         )
 
-        connection.commit()
+        await bump_catalog_version(cursor)
+        await connection.commit()
+        cache.catalog.invalidate_products([id])
 
         return {"message": "Producto eliminado exitosamente"}
 
     except HTTPException:
         raise
     except Exception as e:
-        connection.rollback()
+        await connection.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error al eliminar el producto: {str(e)}"
         )
     finally:
         cursor.close()
-        connection.close()
+
+
+# ======== Categorias =========
+# Listar categorias con su resumen (productos activos, con stock y rango de
+# precios). La respuesta puede cambiar con cualquier producto: el rango de
+# la entrada del cache es todo el catalogo
+@app.get("/categories", status_code=200)
+async def get_categories(request: Request, response: Response):
+    key = ("categories",)
+    cached = cache.catalog.get(key)
+
+    if cached is None:
+        generation = cache.catalog.generation
+        async with pooled_connection() as connection:
+            version = await catalog_version(connection)
+            try:
+                categories = await repository.db.list_categories(connection)
+            except Exception as e:
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Error al obtener las categorias: {str(e)}"
+                )
+
+        etag = catalog_etag(version, [
+            f"{category['id_category']}={category['in_stock_products']}"
+            for category in categories])
+        cached = ({"categories": categories}, etag, None)
+        cache.catalog.set(
+            key, cached, (float("-inf"), cache.NO_LIMIT), generation)
+
+    response_data, etag, last_modified = cached
+    if conditional.not_modified(request, etag, last_modified):
+        return conditional.not_modified_response(etag, last_modified)
+
+    response.headers.update(conditional.headers(etag, last_modified))
+    return response_data
+
+
+# Productos activos de una categoria, paginados igual que /products
+@app.get("/categories/{id}/products", status_code=200)
+async def get_category_products(
+    id: int,
+    request: Request,
+    response: Response,
+    limit: int = pagination.DEFAULT_PAGE_SIZE,
+    page_cursor: Optional[str] = Query(None, alias="cursor")
+):
+    limit = pagination.page_size(limit)
+    after = pagination.decode_cursor(page_cursor)
+    after_id = after.get("id") if after else None
+
+    key = ("category_products", id, limit, after_id)
+    cached = cache.catalog.get(key)
+
+    if cached is None:
+        generation = cache.catalog.generation
+        async with pooled_connection() as connection:
+            version = await catalog_version(connection)
+            try:
+                category = await repository.db.category(connection, id)
+            except Exception as e:
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Error al obtener la categoria: {str(e)}"
+                )
+
+            if not category:
+                raise HTTPException(
+                    status_code=404,
+                    detail="Categoria no encontrada"
+                )
+
+            response_data = await load_products(
+                connection, limit, after_id, None, id)
+
+        response_data = {
+            "category": {"id_category": category[0], "name": category[1]},
+            **response_data
+        }
+        products = response_data["products"]
+        etag = catalog_etag(version, product_stock(products))
+        last_id = products[-1]['id_product'] if response_data["next_cursor"] else cache.NO_LIMIT
+        cached = (response_data, etag, None)
+        cache.catalog.set(
+            key, cached,
+            (after_id if after_id is not None else float("-inf"), last_id),
+            generation
+        )
+
+    response_data, etag, last_modified = cached
+    if conditional.not_modified(request, etag, last_modified):
+        return conditional.not_modified_response(etag, last_modified)
+
+    response.headers.update(conditional.headers(etag, last_modified))
+    return response_data
 
 
 # ======== Ordenes =========
-# NOTA:
-# tablas que necesitan datos
-# clientes, metodos_pago, productos
 
-@app.post("/orders", status_code=201)
-async def create_order(order_data: OrderCreate):
+def raise_batch_errors(cursor, table):
+    # Errores de un executemany con batcherrors=True
+    errors = cursor.getbatcherrors()
+    if errors:
+        details = "; ".join(
+            f"fila {error.offset}: {error.message}" for error in errors)
+        raise Exception(f"Error al escribir en {table}: {details}")
+
+
+def check_order_items(order_data):
     # Validar que haya al menos un producto en la orden
     if not order_data.items or len(order_data.items) == 0:
         raise HTTPException(
@@ -1148,213 +1486,213 @@ async def create_order(order_data: OrderCreate):
                 detail=f"La cantidad para el producto {item.id_product} debe ser mayor a 0"
             )
 
-    # Conectar a la base de datos
-    connection = oracledb.connect(dsn)
-    cursor = connection.cursor()
 
-    try:
-        # Verificar que el cliente existe
-        cursor.execute(
-            "SELECT COUNT(*) FROM clientes WHERE id_client = :id",
-            {"id": order_data.id_client}
-        )
-        if cursor.fetchone()[0] == 0:
+async def load_stock(connection, product_ids, location_ids):
+    # Precio, estado y stock de varios productos en varias sedes, una consulta.
+    # Devuelve {(id_product, id_location): [id_product, price, active, stock]}
+    rows = await repository.db.load_stock(connection, product_ids, location_ids)
+    return {
+        (row[0], row[1]): [row[0], row[2], row[3], row[4]]
+        for row in rows
+    }
+
+
+def build_order_lines(order_data, stock):
+    # Valida los productos de la orden contra el stock cargado con load_stock
+    # y lo descuenta, para que varias ordenes puedan validarse seguidas
+    requested = {}
+    for item in order_data.items:
+        requested[item.id_product] = requested.get(
+            item.id_product, 0) + item.quantity
+
+    products_info = []
+    total_amount = 0
+
+    for item in order_data.items:
+        product_data = stock.get((item.id_product, order_data.id_location))
+
+        if not product_data:
             raise HTTPException(
                 status_code=404,
-                detail="Cliente no encontrado"
+                detail=f"Producto {item.id_product} no encontrado"
             )
 
-        # Verificar que el método de pago existe y está asociado al cliente
-        cursor.execute(
-            """
-            SELECT COUNT(*) 
-            FROM metodos_pago_cliente
-            WHERE id_client = :id_client 
-            AND id_payment_method = :id_payment_method
-            """,
-            {
-                "id_client": order_data.id_client,
-                "id_payment_method": order_data.id_payment_method
-            }
-        )
-        if cursor.fetchone()[0] == 0:
+        if product_data[2] != 'TRUE':
             raise HTTPException(
                 status_code=400,
-                detail="El método de pago no está asociado a este cliente o no existe"
+                detail=f"Producto {item.id_product} no está activo"
             )
 
-        # Verificar disponibilidad de productos y obtener precios
-        products_info = []
-        total_amount = 0
-
-        for item in order_data.items:
-            cursor.execute(
-                """
-                SELECT p.id_product, p.price, p.active, 
-                       COALESCE(SUM(i.quantity), 0) as stock
-                FROM productos p
-                LEFT JOIN inventario i ON p.id_product = i.id_product
-                WHERE p.id_product = :id_product AND i.id_location = :id_location
-                GROUP BY p.id_product, p.price, p.active
-                """,
-                {
-                    "id_product": item.id_product,
-                    "id_location": order_data.id_location
-                }
+        if product_data[3] < requested[item.id_product]:
+            raise HTTPException(
+                status_code=400,
+                detail=f"No hay suficiente stock para el producto {item.id_product}"
             )
 
-            product_data = cursor.fetchone()
-
-            if not product_data:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Producto {item.id_product} no encontrado"
-                )
+        products_info.append({
+            "id_product": product_data[0],
+            "price": product_data[1],
+            "quantity": item.quantity,
+            "subtotal": product_data[1] * item.quantity
+        })
+
+        total_amount += product_data[1] * item.quantity
+
+    for id_product, quantity in requested.items():
+        stock[(id_product, order_data.id_location)][3] -= quantity
+
+    return {
+        "order_data": order_data,
+        "products_info": products_info,
+        "total_amount": total_amount,
+        "requested": requested
+    }
+
+
+async def write_orders(connection, cursor, orders):
+    # Escribe varias ordenes ya validadas con un executemany por tabla.
+    # No hace commit. Asigna "id_order" a cada orden.
+    order_ids = await keys.next_ids(connection, "ordenes", len(orders))
+    payment_ids = await keys.next_ids(connection, "pagos_ordenes", len(orders))
+    line_ids = iter(await keys.next_ids(
+        connection, "ordenes_productos",
+        sum(len(order["products_info"]) for order in orders)))
+
+    order_rows = []
+    line_rows = []
+    payment_rows = []
+    inventory = {}
+
+    for order, id_order, id_payment in zip(orders, order_ids, payment_ids):
+        order["id_order"] = id_order
+        order_data = order["order_data"]
+
+        order_rows.append({
+            "id": id_order,
+            "id_client": order_data.id_client,
+            "id_location": order_data.id_location
+        })
+
+        for product in order["products_info"]:
+            line_rows.append({
+                "id": next(line_ids),
+                "id_order": id_order,
+                "id_product": product["id_product"],
+                "quantity": product["quantity"],
+                "price": product["price"]
+            })
 
-            if product_data[2] != 'TRUE':
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Producto {item.id_product} no está activo"
-                )
+        for id_product, quantity in order["requested"].items():
+            key = (id_product, order_data.id_location)
+            inventory[key] = inventory.get(key, 0) + quantity
+
+        payment_rows.append({
+            "id": id_payment,
+            "id_order": id_order,
+            "id_payment_method": order_data.id_payment_method,
+            "total_amount": order["total_amount"]
+        })
+
+    # Crear las ordenes
+    await cursor.executemany(
+        statements.INSERT_ORDER,
+        order_rows,
+        batcherrors=True
+    )
+    raise_batch_errors(cursor, "ordenes")
+
+    # Insertar los productos de las ordenes
+    await cursor.executemany(
+        statements.INSERT_ORDER_LINE,
+        line_rows,
+        batcherrors=True
+    )
+    raise_batch_errors(cursor, "ordenes_productos")
+
+    # Crear registro de pago (CORRECCIÓN: sin caracteres especiales)
+    await cursor.executemany(
+        statements.INSERT_ORDER_PAYMENT,
+        payment_rows,
+        batcherrors=True
+    )
+    raise_batch_errors(cursor, "pagos_ordenes")
+
+    # Descontar el inventario al final, las filas de los productos mas
+    # pedidos quedan bloqueadas el menor tiempo posible hasta el commit.
+    # Lanza reservations.OutOfStock si otra orden se llevo el stock
+    await reservations.reserve(cursor, inventory)
 
-            if product_data[3] < item.quantity:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"No hay suficiente stock para el producto {item.id_product}"
-                )
 
-            products_info.append({
-                "id_product": product_data[0],
-                "price": product_data[1],
-                "quantity": item.quantity,
-                "subtotal": product_data[1] * item.quantity
-            })
+# NOTA:
+# tablas que necesitan datos
+# clientes, metodos_pago, productos
 
-            total_amount += product_data[1] * item.quantity
+@app.post("/orders", status_code=201)
+async def create_order(order_data: OrderCreate, connection: oracledb.AsyncConnection = Depends(get_connection)):
+    check_order_items(order_data)
 
-        # Obtener ID para la nueva orden
-        cursor.execute("SELECT COALESCE(MAX(id_order), 0) + 1 FROM ordenes")
-        new_order_id = cursor.fetchone()[0]
+    cursor = connection.cursor()
 
-        # Crear la orden
-        cursor.execute(
-            """
-            INSERT INTO ordenes (
-                id_order,
-                id_client,
-                id_location,
-                created_at,
-                updated_at
-            ) VALUES (
-                :id,
-                :id_client,
-                :id_location,
-                SYSDATE,
-                SYSDATE
+    try:
+        # Verificar que el cliente existe
+        await cursor.execute(
+            statements.CLIENT_EXISTS,
+            {"id": order_data.id_client}
+        )
+        if (await cursor.fetchone())[0] == 0:
+            raise HTTPException(
+                status_code=404,
+                detail="Cliente no encontrado"
             )
-            """,
+
+        # Verificar que el método de pago existe y está asociado al cliente
+        await cursor.execute(
+            statements.CLIENT_PAYMENT_METHOD,
             {
-                "id": new_order_id,
                 "id_client": order_data.id_client,
-                "id_location": order_data.id_location
+                "id_payment_method": order_data.id_payment_method
             }
         )
-
-        # Insertar los productos de la orden
-        for product in products_info:
-            cursor.execute(
-                "SELECT COALESCE(MAX(id_order_product), 0) + 1 FROM ordenes_productos"
-            )
-            new_order_product_id = cursor.fetchone()[0]
-
-            cursor.execute(
-                """
-                INSERT INTO ordenes_productos (
-                    id_order_product,
-                    id_order,
-                    id_product,
-                    quantity,
-                    price,
-                    created_at,
-                    updated_at
-                ) VALUES (
-                    :id,
-                    :id_order,
-                    :id_product,
-                    :quantity,
-                    :price,
-                    SYSDATE,
-                    SYSDATE
-                )
-                """,
-                {
-                    "id": new_order_product_id,
-                    "id_order": new_order_id,
-                    "id_product": product["id_product"],
-                    "quantity": product["quantity"],
-                    "price": product["price"]
-                }
+        if (await cursor.fetchone())[0] == 0:
+            raise HTTPException(
+                status_code=400,
+                detail="El método de pago no está asociado a este cliente o no existe"
             )
 
-            # Actualizar el inventario
-            cursor.execute(
-                """
-                UPDATE inventario
-                SET quantity = quantity - :quantity,
-                    updated_at = SYSDATE
-                WHERE id_product = :id_product 
-                AND id_location = :id_location
-                """,
-                {
-                    "quantity": product["quantity"],
-                    "id_product": product["id_product"],
-                    "id_location": order_data.id_location
-                }
+        async def place_order():
+            # Verificar disponibilidad de todos los productos en una sola consulta
+            stock = await load_stock(
+                connection,
+                [item.id_product for item in order_data.items],
+                [order_data.id_location]
             )
+            order = build_order_lines(order_data, stock)
 
-        # Crear registro de pago (CORRECCIÓN: sin caracteres especiales)
-        cursor.execute(
-            "SELECT COALESCE(MAX(id_order_payment), 0) + 1 FROM pagos_ordenes"
-        )
-        new_payment_id = cursor.fetchone()[0]
+            # Escribir la orden, sus productos, el inventario y el pago
+            await write_orders(connection, cursor, [order])
 
-        cursor.execute(
-            """
-            INSERT INTO pagos_ordenes (
-                id_order_payment,
-                id_order,
-                id_payment_method,
-                status,
-                total_amount,
-                created_at,
-                updated_at
-            ) VALUES (
-                :id,
-                :id_order,
-                :id_payment_method,
-                'PENDING',
-                :total_amount,
-                SYSDATE,
-                SYSDATE
-            )
-            """,
-            {
-                "id": new_payment_id,
-                "id_order": new_order_id,
-                "id_payment_method": order_data.id_payment_method,
-                "total_amount": total_amount
-            }
-        )
+            await connection.commit()
+            return order
 
-        connection.commit()
+        # Si el stock cambio entre la lectura y el descuento se vuelve a
+        # validar con el stock actual
+        try:
+            order = await reservations.run(connection, place_order)
+        except reservations.OutOfStock:
+            raise HTTPException(
+                status_code=409,
+                detail="El stock cambió mientras se procesaba la orden, intente de nuevo"
+            )
+        # El stock de los productos cambio
+        cache.catalog.invalidate_products(order["requested"].keys())
 
         response_data = {
             "status": "success",
             "message": "Order created successfully",
-            "id_order": new_order_id,
+            "id_order": order["id_order"],
             "orderStatus": "processing",
-            "total_amount": total_amount,
-            "items": products_info
+            "total_amount": order["total_amount"],
+            "items": order["products_info"]
         }
 
         return response_data
@@ -1362,196 +1700,373 @@ async def create_order(order_data: OrderCreate):
     except HTTPException:
         raise
     except Exception as e:
-        connection.rollback()
+        await connection.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error creating order: {str(e)}"
         )
     finally:
         cursor.close()
-        connection.close()
 
 # Tablas que se actualizan al crear orden:
 # ordenes, ordenes_productos, pagos_ordenes, inventario
 
 
-# Lista ordenes
-@app.get("/orders", status_code=200)
-async def get_orders():
+# Carga masiva de ordenes (importaciones de marketplaces)
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+BULK_MAX_ORDERS = int(os.getenv("BULK_MAX_ORDERS", "10000"))
+# Bytes maximos de una linea NDJSON (una orden)
+BULK_MAX_LINE_BYTES = int(os.getenv("BULK_MAX_LINE_BYTES", "65536"))
+NDJSON_TYPES = ["application/x-ndjson", "application/ndjson"]
+
+
+def line_too_long():
+    return HTTPException(
+        status_code=413,
+        detail=f"La linea supera el maximo de {BULK_MAX_LINE_BYTES} bytes"
+    )
+
+
+def too_many_orders():
+    return HTTPException(
+        status_code=413,
+        detail=f"Se permiten como maximo {BULK_MAX_ORDERS} ordenes por carga"
+    )
+
+
+async def read_bulk_payloads(request):
+    # Arreglo JSON o NDJSON (una orden por linea).
+    # Devuelve una lista de (dict, None) o (None, error) por orden; el error
+    # es un texto o una HTTPException (linea demasiado larga)
+    parsed = []
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in NDJSON_TYPES:
+        # Las lineas se cuentan mientras llega el cuerpo: una carga con mas
+        # de BULK_MAX_ORDERS ordenes se corta sin leer el resto. Una linea
+        # mas larga que BULK_MAX_LINE_BYTES no se guarda: se descarta hasta
+        # el siguiente salto de linea y esa orden responde 413
+        def append(entry):
+            if len(parsed) >= BULK_MAX_ORDERS:
+                raise too_many_orders()
+            parsed.append(entry)
+
+        def add(line):
+            if not line.strip():
+                return
+            if len(line) > BULK_MAX_LINE_BYTES:
+                append((None, line_too_long()))
+                return
+            try:
+                append((json.loads(line), None))
+            except ValueError as e:
+                append((None, f"JSON invalido: {str(e)}"))
+
+        buffer = b""
+        skipping = False
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if skipping:
+                    # Fin de la linea larga, ya se reporto
+                    skipping = False
+                    continue
+                add(line)
+            if not skipping and len(buffer) > BULK_MAX_LINE_BYTES:
+                append((None, line_too_long()))
+                skipping = True
+            if skipping:
+                buffer = b""
+        if not skipping:
+            add(buffer)
+        return parsed
+
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="El cuerpo debe ser un arreglo JSON o NDJSON"
+        )
+    if not isinstance(body, list):
+        raise HTTPException(
+            status_code=400,
+            detail="El cuerpo debe ser un arreglo JSON o NDJSON"
+        )
+    if len(body) > BULK_MAX_ORDERS:
+        raise too_many_orders()
+    return [(payload, None) for payload in body]
+
+
+async def load_order_references(connection, orders):
+    # Clientes existentes y metodos de pago asociados, una consulta cada uno
+    return await repository.db.order_references(
+        connection, {order_data.id_client for _, order_data in orders})
+
+
+@app.post("/orders/bulk", status_code=200)
+async def create_orders_bulk(request: Request, connection: oracledb.AsyncConnection = Depends(get_connection)):
+    payloads = await read_bulk_payloads(request)
+
+    results = [None] * len(payloads)
+    orders = []
+
+    # Validar el formato de cada orden, las invalidas no detienen la carga
+    for index, (payload, error) in enumerate(payloads):
+        if isinstance(error, HTTPException):
+            results[index] = {
+                "index": index,
+                "status": error.status_code,
+                "detail": error.detail
+            }
+            continue
+        if error is None:
+            try:
+                order_data = OrderCreate.model_validate(payload)
+                check_order_items(order_data)
+                orders.append((index, order_data))
+                continue
+            except ValidationError as e:
+                error = e.errors(include_url=False, include_context=False)
+            except HTTPException as e:
+                results[index] = {
+                    "index": index,
+                    "status": e.status_code,
+                    "detail": e.detail
+                }
+                continue
+        results[index] = {"index": index, "status": 422, "detail": error}
 
-    # Conectar a la base de datos
-    connection = oracledb.connect(dsn)
     cursor = connection.cursor()
 
     try:
-        # obtener las ordenes
-        cursor.execute("""
-            SELECT 
-                o.id_order,
-                o.id_client,
-                c.name || ' ' || c.lastname as client_name,
-                o.id_location,
-                TO_CHAR(o.created_at, 'YYYY-MM-DD HH24:MI:SS') as created_at,
-                TO_CHAR(o.updated_at, 'YYYY-MM-DD HH24:MI:SS') as updated_at,
-                po.status as payment_status,
-                pm.payment_method,
-                po.total_amount  -- Añadido este campo
-            FROM ordenes o
-            JOIN clientes c ON o.id_client = c.id_client
-            JOIN pagos_ordenes po ON o.id_order = po.id_order
-            JOIN metodos_pago pm ON po.id_payment_method = pm.id_payment_method
-            ORDER BY o.id_order DESC
-        """)
+        for start in range(0, len(orders), BULK_CHUNK_SIZE):
+            chunk = orders[start:start + BULK_CHUNK_SIZE]
+
+            async def place_chunk():
+                for index, _ in chunk:
+                    results[index] = None
+
+                clients, payment_methods = await load_order_references(
+                    connection, chunk)
+                stock = await load_stock(
+                    connection,
+                    [item.id_product for _, order_data in chunk for item in order_data.items],
+                    [order_data.id_location for _, order_data in chunk]
+                )
 
-        columns = [col[0].lower() for col in cursor.description]
-        cursor.rowfactory = lambda *args: dict(zip(columns, args))
-        orders = cursor.fetchall()
+                # Mismas validaciones que create_order, en el orden de la carga
+                accepted = []
+                for index, order_data in chunk:
+                    try:
+                        if order_data.id_client not in clients:
+                            raise HTTPException(
+                                status_code=404,
+                                detail="Cliente no encontrado"
+                            )
+                        if (order_data.id_client, order_data.id_payment_method) not in payment_methods:
+                            raise HTTPException(
+                                status_code=400,
+                                detail="El método de pago no está asociado a este cliente o no existe"
+                            )
+                        accepted.append((index, build_order_lines(order_data, stock)))
+                    except HTTPException as e:
+                        results[index] = {
+                            "index": index,
+                            "status": e.status_code,
+                            "detail": e.detail
+                        }
+
+                # Una transaccion por bloque
+                if accepted:
+                    await write_orders(
+                        connection, cursor, [order for _, order in accepted])
+                    await connection.commit()
+                return accepted
+
+            # Si otra orden se llevo el stock, el bloque se vuelve a validar
+            # completo y las ordenes que ya no alcanzan se rechazan
+            try:
+                accepted = await reservations.run(connection, place_chunk)
+            except Exception as e:
+                await connection.rollback()
+                status = 409 if isinstance(e, reservations.OutOfStock) else 500
+                for index, _ in chunk:
+                    if results[index] is None:
+                        results[index] = {
+                            "index": index,
+                            "status": status,
+                            "detail": f"Error creating order: {str(e)}"
+                        }
+                continue
+
+            cache.catalog.invalidate_products(
+                {id_product for _, order in accepted for id_product in order["requested"]})
+
+            for index, order in accepted:
+                results[index] = {
+                    "index": index,
+                    "status": 201,
+                    "id_order": order["id_order"],
+                    "total_amount": order["total_amount"]
+                }
 
-        # Para cada orden, obtener sus productos
-        for order in orders:
-            cursor.execute("""
-                SELECT 
-                    op.id_product,
-                    p.name as product_name,
-                    op.quantity,
-                    op.price,
-                    (op.quantity * op.price) as subtotal
-                FROM ordenes_productos op
-                JOIN productos p ON op.id_product = p.id_product
-                WHERE op.id_order = :order_id
-            """, {"order_id": order['id_order']})
-
-            product_columns = [col[0].lower() for col in cursor.description]
-            cursor.rowfactory = lambda *args: dict(zip(product_columns, args))
-            order['products'] = cursor.fetchall()
-
-        return {"orders": orders}
+        created = sum(1 for result in results if result["status"] == 201)
+
+        return {
+            "status": "success",
+            "received": len(results),
+            "created": created,
+            "failed": len(results) - created,
+            "results": results
+        }
 
+    except HTTPException:
+        raise
     except Exception as e:
+        await connection.rollback()
         raise HTTPException(
             status_code=500,
-            detail=f"Error al obtener las órdenes: {str(e)}"
+            detail=f"Error en la carga masiva de ordenes: {str(e)}"
         )
     finally:
         cursor.close()
-        connection.close()
 
-# Detalles orden
 
+def order_filters(client, status, location, date_from, date_to, date_column):
+    # Filtros comunes de /orders y /payments (alias o = ordenes, po = pagos_ordenes)
+    conditions = []
+    params = {}
 
-@app.get("/orders/{id}", status_code=200)
-async def get_order_detail(id: int):
-    # Conectar a la base de datos
-    connection = oracledb.connect(dsn)
-    cursor = connection.cursor()
-
-    try:
-        # Consulta para obtener la información básica de la orden (modificada para incluir total_amount)
-        cursor.execute("""
-            SELECT 
-                o.id_order,
-                o.id_client,
-                c.name || ' ' || c.lastname as client_name,
-                c.national_document as client_document,
-                o.id_location,
-                s.name as location_name,
-                TO_CHAR(o.created_at, 'YYYY-MM-DD HH24:MI:SS') as created_at,
-                TO_CHAR(o.updated_at, 'YYYY-MM-DD HH24:MI:SS') as updated_at,
-                po.status as payment_status,
-                pm.payment_method,
-                pm.id_payment_method,
-                po.total_amount,  -- Añadido este campo
-                COALESCE(oe.status, 'NOT_SHIPPED') as shipping_status,
-                COALESCE(oe.company, '') as shipping_company,
-                COALESCE(TO_CHAR(oe.delivered_at, 'YYYY-MM-DD HH24:MI:SS'), '') as delivered_at
-            FROM ordenes o
-            JOIN clientes c ON o.id_client = c.id_client
-            JOIN pagos_ordenes po ON o.id_order = po.id_order
-            JOIN metodos_pago pm ON po.id_payment_method = pm.id_payment_method
-            LEFT JOIN ordenes_entregadas oe ON o.id_order = oe.id_order
-            LEFT JOIN sedes s ON o.id_location = s.id_site
-            WHERE o.id_order = :order_id
-        """, {"order_id": id})
-
-        columns = [col[0].lower() for col in cursor.description]
-        cursor.rowfactory = lambda *args: dict(zip(columns, args))
-        order = cursor.fetchone()
+    if client is not None:
+        conditions.append("o.id_client = :client")
+        params["client"] = client
 
-        # Verificar si la orden existe
-        if not order:
+    if status is not None:
+        valid_statuses = ['PAID', 'PENDING', 'FAILED']
+        if status.upper() not in valid_statuses:
             raise HTTPException(
-                status_code=404,
-                detail=f"Orden con ID {id} no encontrada"
+                status_code=400,
+                detail=f"Estado inválido. Debe ser uno de: {', '.join(valid_statuses)}"
             )
+        conditions.append("po.status = :status")
+        params["status"] = status.upper()
 
-        # Consulta para obtener los productos de la orden (de la tabla ordenes_productos)
-        cursor.execute("""
-            SELECT 
-                op.id_order_product,
-                op.id_product,
-                p.name as product_name,
-                p.description as product_description,
-                p.sku as product_sku,
-                op.quantity,
-                op.price as unit_price,
-                (op.quantity * op.price) as subtotal,
-                TO_CHAR(op.created_at, 'YYYY-MM-DD HH24:MI:SS') as added_at,
-                TO_CHAR(op.updated_at, 'YYYY-MM-DD HH24:MI:SS') as updated_at
-            FROM ordenes_productos op
-            JOIN productos p ON op.id_product = p.id_product
-            WHERE op.id_order = :order_id
-            ORDER BY op.id_order_product
-        """, {"order_id": id})
-
-        product_columns = [col[0].lower() for col in cursor.description]
-        cursor.rowfactory = lambda *args: dict(zip(product_columns, args))
-        order_products = cursor.fetchall()
-
-        calculated_total = sum(product['subtotal']
-                               for product in order_products)
-
-        # Construir la respuesta
-        response = {
-            "order_id": order['id_order'],
-            "client": {
-                "id": order['id_client'],
-                "name": order['client_name'],
-                "document": order['client_document']
-            },
-            "location": {
-                "id": order['id_location'],
-                "name": order.get('location_name', '')
-            },
-            "created_at": order['created_at'],
-            "updated_at": order['updated_at'],
-            "payment": {
-                "method": order['payment_method'],
-                "method_id": order['id_payment_method'],
-                "status": order['payment_status'],
-                "total_amount": order['total_amount'],
-                "calculated_total": calculated_total  # Opcional: para verificación
-            },
-            "products": order_products
-        }
+    if location is not None:
+        conditions.append("o.id_location = :location")
+        params["location"] = location
+
+    if pagination.parse_date(date_from, "date_from"):
+        conditions.append(f"{date_column} >= {repository.db.day('date_from')}")
+        params["date_from"] = date_from
+
+    if pagination.parse_date(date_to, "date_to"):
+        conditions.append(
+            f"{date_column} < {repository.db.next_day('date_to')}")
+        params["date_to"] = date_to
+
+    return conditions, params
+
+
+def group_order_products(order_products):
+    # Agrupar las lineas (con columna id_order) por orden
+    products_by_order = {}
+    for product in order_products:
+        id_order = product.pop('id_order')
+        products_by_order.setdefault(id_order, []).append(product)
+    return products_by_order
+
+
+# Lista ordenes
+@app.get("/orders", status_code=200)
+async def get_orders(
+    limit: int = pagination.DEFAULT_PAGE_SIZE,
+    page_cursor: Optional[str] = Query(None, alias="cursor"),
+    client: Optional[int] = None,
+    status: Optional[str] = None,
+    location: Optional[int] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    connection: oracledb.AsyncConnection = Depends(get_connection)
+):
+    limit = pagination.page_size(limit)
+    after = pagination.decode_cursor(page_cursor)
+    conditions, params = order_filters(
+        client, status, location, date_from, date_to, "o.created_at")
+    params["page_size"] = limit + 1
+
+    # Paginacion por llave, de la orden mas reciente a la mas antigua
+    if after:
+        conditions.append("o.id_order < :after_id")
+        params["after_id"] = after.get("id")
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    try:
+        # obtener las ordenes
+        orders = await repository.db.list_orders(connection, where, params)
+
+        next_cursor = pagination.next_cursor(
+            orders, limit, lambda row: {"id": row['id_order']})
+
+        if not orders:
+            return {"orders": orders, "next_cursor": next_cursor}
 
-        return response
+        # Productos de las ordenes de la pagina en una sola consulta,
+        # se agrupan por id_order en python
+        order_products = await repository.db.order_lines(
+            connection, [order['id_order'] for order in orders])
+
+        products_by_order = group_order_products(order_products)
+        for order in orders:
+            order['products'] = products_by_order.get(order['id_order'], [])
+
+        return {"orders": orders, "next_cursor": next_cursor}
 
     except HTTPException:
         raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al obtener las órdenes: {str(e)}"
+        )
+
+# Detalles orden
+
+
+@app.get("/orders/{id}", status_code=200)
+async def get_order_detail(id: int, request: Request, response: Response, connection: oracledb.AsyncConnection = Depends(get_connection)):
+    # Una consulta: version de la orden (cabecera, pago, entrega y cliente)
+    # y el documento JSON de la respuesta con sus productos
+    try:
+        row = await repository.db.order_detail(connection, id)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error al obtener los detalles de la orden: {str(e)}"
         )
-    finally:
-        cursor.close()
-        connection.close()
+
+    # Verificar si la orden existe
+    if not row:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Orden con ID {id} no encontrada"
+        )
+
+    etag = conditional.make_etag("order", id, row[0], row[1])
+    last_modified = conditional.parse_db_date(row[0])
+    if conditional.not_modified(request, etag, last_modified):
+        return conditional.not_modified_response(etag, last_modified)
+
+    response.headers.update(conditional.headers(etag, last_modified))
+    return json.loads(row[2])
 
 # update order status
 
 
 @app.put("/orders/{id}", status_code=200)
-async def update_order_status(id: int, status_data: OrderUpdateStatus):
+async def update_order_status(id: int, status_data: OrderUpdateStatus, connection: oracledb.AsyncConnection = Depends(get_connection)):
 
     # Validar que el estado
     valid_statuses = ['PAID', 'PENDING', 'FAILED']
@@ -1561,24 +2076,22 @@ async def update_order_status(id: int, status_data: OrderUpdateStatus):
             detail=f"Estado inválido. Debe ser uno de: {', '.join(valid_statuses)}"
         )
 
-    # Conectar a la base de datos
-    connection = oracledb.connect(dsn)
     cursor = connection.cursor()
 
     try:
         # Verificar si la orden existe
-        cursor.execute(
+        await cursor.execute(
             "SELECT COUNT(*) FROM ordenes WHERE id_order = :id",
             {"id": id}
         )
-        if cursor.fetchone()[0] == 0:
+        if (await cursor.fetchone())[0] == 0:
             raise HTTPException(
                 status_code=404,
                 detail="Orden no encontrada"
             )
 
         # Actualizar el estado en pagos_ordenes
-        cursor.execute(
+        await cursor.execute(
             """
             UPDATE pagos_ordenes
             SET status = :status,
@@ -1591,7 +2104,7 @@ async def update_order_status(id: int, status_data: OrderUpdateStatus):
             }
         )
 
-        connection.commit()
+        await connection.commit()
 
         return {
             "status": "success",
@@ -1601,14 +2114,13 @@ async def update_order_status(id: int, status_data: OrderUpdateStatus):
     except HTTPException:
         raise
     except Exception as e:
-        connection.rollback()
+        await connection.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error al actualizar el estado de la orden: {str(e)}"
         )
     finally:
         cursor.close()
-        connection.close()
 
 # ======== Gestion de pagos =========
 
@@ -1616,7 +2128,7 @@ async def update_order_status(id: int, status_data: OrderUpdateStatus):
 
 
 @app.post("/payments", status_code=201)
-async def create_payment(payment_data: PaymentCreate):
+async def create_payment(payment_data: PaymentCreate, connection: oracledb.AsyncConnection = Depends(get_connection)):
 
     # Validar el monto
     if payment_data.amount <= 0:
@@ -1625,81 +2137,50 @@ async def create_payment(payment_data: PaymentCreate):
             detail="El monto del pago debe ser mayor a 0"
         )
 
-    # Conectar a la base de datos
-    connection = oracledb.connect(dsn)
     cursor = connection.cursor()
 
     try:
-        # verificar que la orden exista
-        cursor.execute(
-            "SELECT COUNT(*) FROM ordenes WHERE id_order = :order_id",
-            {"order_id": payment_data.orderId}
+        # Orden, método de pago, asociación con el cliente y estado del
+        # pago en una sola consulta
+        await cursor.execute(
+            statements.PAYMENT_LOOKUP,
+            {
+                "order_id": payment_data.orderId,
+                "method": payment_data.method
+            }
         )
-        if cursor.fetchone()[0] == 0:
+        payment_info = await cursor.fetchone()
+
+        # verificar que la orden exista
+        if not payment_info:
             raise HTTPException(
                 status_code=404,
                 detail=f"Orden con ID {payment_data.orderId} no encontrada"
             )
 
-        # verificar que el método de pago existe
-        cursor.execute(
-            """
-            SELECT id_payment_method 
-            FROM metodos_pago 
-            WHERE LOWER(payment_method) = LOWER(:method)
-            """,
-            {"method": payment_data.method}
-        )
-        method_data = cursor.fetchone()
+        client_id, method_id, method_linked, current_status, order_amount = payment_info
 
-        if not method_data:
+        # verificar que el método de pago existe
+        if method_id is None:
             raise HTTPException(
                 status_code=400,
                 detail=f"Método de pago '{payment_data.method}' no válido"
             )
 
-        method_id = method_data[0]
-
         # metodo de pago está asociado al cliente de la orden
-        cursor.execute(
-            """
-            SELECT COUNT(*) 
-            FROM metodos_pago_cliente mpc
-            JOIN ordenes o ON mpc.id_client = o.id_client
-            WHERE o.id_order = :order_id 
-            AND mpc.id_payment_method = :method_id
-            """,
-            {
-                "order_id": payment_data.orderId,
-                "method_id": method_id
-            }
-        )
-        if cursor.fetchone()[0] == 0:
+        if method_linked == 0:
             raise HTTPException(
                 status_code=400,
                 detail="El método de pago no está asociado al cliente de esta orden"
             )
 
         # Verificar el estado actual del pago
-        cursor.execute(
-            """
-            SELECT status, total_amount 
-            FROM pagos_ordenes 
-            WHERE id_order = :order_id
-            """,
-            {"order_id": payment_data.orderId}
-        )
-        payment_info = cursor.fetchone()
-
-        if not payment_info:
+        if current_status is None:
             raise HTTPException(
                 status_code=404,
                 detail="No se encontró información de pago para esta orden"
             )
 
-        current_status = payment_info[0]
-        order_amount = payment_info[1]
-
         if current_status == 'PAID':
             raise HTTPException(
                 status_code=400,
@@ -1713,53 +2194,19 @@ async def create_payment(payment_data: PaymentCreate):
                 detail=f"El monto del pago (${payment_data.amount:.2f}) no coincide con el total de la orden (${order_amount:.2f})"
             )
 
-        #  Actualizar el estado del pago
-        cursor.execute(
-            """
-            UPDATE pagos_ordenes
-            SET 
-                status = 'PAID',
-                updated_at = SYSDATE
-            WHERE id_order = :order_id
-            """,
-            {"order_id": payment_data.orderId}
-        )
-
         # Crear registro en la tabla pagos
-        cursor.execute("SELECT COALESCE(MAX(id_payments), 0) + 1 FROM pagos")
-        new_payment_id = cursor.fetchone()[0]
-
-        # Obtener el ID del cliente asociado a la orden
-        cursor.execute(
-            "SELECT id_client FROM ordenes WHERE id_order = :order_id",
-            {"order_id": payment_data.orderId}
-        )
-        client_id = cursor.fetchone()[0]
-
-        cursor.execute(
-            """
-            INSERT INTO pagos (
-                id_payments,
-                id_client,
-                id_payment_method,
-                created_at,
-                updated_at
-            ) VALUES (
-                :id,
-                :client_id,
-                :method_id,
-                SYSDATE,
-                SYSDATE
+        new_payment_id = await keys.next_id(connection, "pagos")
+
+        # Actualizar el estado del pago, registrar el pago y confirmar (en
+        # Oracle en un solo round-trip). Si otra petición la pagó primero no
+        # se escribe nada
+        paid = await repository.db.pay_order(
+            connection, payment_data.orderId, new_payment_id, client_id, method_id)
+        if not paid:
+            raise HTTPException(
+                status_code=400,
+                detail="Esta orden ya ha sido pagada completamente"
             )
-            """,
-            {
-                "id": new_payment_id,
-                "client_id": client_id,
-                "method_id": method_id
-            }
-        )
-
-        connection.commit()
 
         # Respuesta con los detalles del pago
         return {
@@ -1777,60 +2224,183 @@ async def create_payment(payment_data: PaymentCreate):
     except HTTPException:
         raise
     except Exception as e:
-        connection.rollback()
+        await connection.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error al registrar el pago: {str(e)}"
         )
     finally:
         cursor.close()
-        connection.close()
 
 # Consulta de pagos
 
-# Añadir al final del archivo api.py, antes de las últimas líneas
-
 
 @app.get("/payments", status_code=200)
-async def get_payments():
-
-    # Conectar a la base de datos
-    connection = oracledb.connect(dsn)
-    cursor = connection.cursor()
+async def get_payments(
+    limit: int = pagination.DEFAULT_PAGE_SIZE,
+    page_cursor: Optional[str] = Query(None, alias="cursor"),
+    client: Optional[int] = None,
+    status: Optional[str] = None,
+    location: Optional[int] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    connection: oracledb.AsyncConnection = Depends(get_connection)
+):
+    limit = pagination.page_size(limit)
+    after = pagination.decode_cursor(page_cursor)
+    conditions, params = order_filters(
+        client, status, location, date_from, date_to, "po.created_at")
+    params["page_size"] = limit + 1
+
+    # Paginacion por llave (created_at, id_order_payment), mas recientes primero
+    if after:
+        after_date = repository.db.timestamp("after_date")
+        conditions.append(f"""(po.created_at < {after_date}
+                OR (po.created_at = {after_date}
+                    AND po.id_order_payment < :after_id))""")
+        params["after_date"] = after.get("created_at")
+        params["after_id"] = after.get("id")
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
 
     try:
         # Consulta para obtener los pagos con información relacionada
-        cursor.execute("""
-            SELECT 
-                po.id_order_payment,
-                po.id_order,
-                c.id_client,
-                c.name || ' ' || c.lastname as client_name,
-                c.national_document,
-                pm.payment_method,
-                po.total_amount,
-                po.status as payment_status,
-                TO_CHAR(po.created_at, 'YYYY-MM-DD HH24:MI:SS') as payment_date,
-                TO_CHAR(po.updated_at, 'YYYY-MM-DD HH24:MI:SS') as last_update
-            FROM pagos_ordenes po
-            JOIN ordenes o ON po.id_order = o.id_order
-            JOIN clientes c ON o.id_client = c.id_client
-            JOIN metodos_pago pm ON po.id_payment_method = pm.id_payment_method
-            ORDER BY po.created_at DESC
-        """)
+        payments = await repository.db.list_payments(connection, where, params)
 
-        # Obtener nombres de columnas y configurar rowfactory
-        columns = [col[0].lower() for col in cursor.description]
-        cursor.rowfactory = lambda *args: dict(zip(columns, args))
-        payments = cursor.fetchall()
+        next_cursor = pagination.next_cursor(
+            payments, limit,
+            lambda row: {"created_at": row['payment_date'], "id": row['id_order_payment']})
 
-        return {"payments": payments}
+        return {"payments": payments, "next_cursor": next_cursor}
 
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error al obtener los pagos: {str(e)}"
         )
-    finally:
-        cursor.close()
-        connection.close()
+
+
+# ======== Exportacion =========
+# Exporta ordenes (una fila por producto de la orden) y pagos en NDJSON o CSV
+
+
+class ExportResponse(StreamingResponse):
+    # El finally de export.stream_query solo corre si el generador llego a
+    # empezar. Si el cliente se desconecta antes del primer bloque (Starlette
+    # tampoco corre las background tasks en ese caso) la conexion se
+    # devuelve aqui; release puede llamarse mas de una vez
+
+    def __init__(self, content, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+            await self.release()
+
+
+async def export_response(sql, params, export_format, filename):
+    if export_format not in export.MEDIA_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail="El formato debe ser 'ndjson' o 'csv'"
+        )
+
+    # La conexion se toma antes de empezar la respuesta: si el pool esta
+    # agotado el cliente recibe 503 y no un stream cortado. La devuelve el
+    # generador cuando termina
+    scope = AsyncExitStack()
+    connection = await scope.enter_async_context(pooled_connection())
+
+    try:
+        return ExportResponse(
+            export.stream_query(connection, sql, params, export_format, scope.aclose),
+            scope.aclose,
+            media_type=export.MEDIA_TYPES[export_format],
+            headers={
+                "Content-Disposition": f'attachment; filename="{filename}.{export_format}"'
+            }
+        )
+    except Exception:
+        await scope.aclose()
+        raise
+
+
+@app.get("/export/orders", status_code=200)
+async def export_orders(
+    format: str = "ndjson",
+    client: Optional[int] = None,
+    status: Optional[str] = None,
+    location: Optional[int] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+):
+    conditions, params = order_filters(
+        client, status, location, date_from, date_to, "o.created_at")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    sql = f"""
+        SELECT /* full_scan_ok: exporta la tabla completa */
+            o.id_order,
+            o.id_client,
+            c.name || ' ' || c.lastname as client_name,
+            o.id_location,
+            TO_CHAR(o.created_at, 'YYYY-MM-DD HH24:MI:SS') as created_at,
+            po.status as payment_status,
+            pm.payment_method,
+            po.total_amount,
+            op.id_product,
+            p.name as product_name,
+            op.quantity,
+            op.price,
+            (op.quantity * op.price) as subtotal
+        FROM ordenes o
+        JOIN clientes c ON o.id_client = c.id_client
+        JOIN pagos_ordenes po ON o.id_order = po.id_order
+        JOIN metodos_pago pm ON po.id_payment_method = pm.id_payment_method
+        JOIN ordenes_productos op ON o.id_order = op.id_order
+        JOIN productos p ON op.id_product = p.id_product
+        {where}
+        ORDER BY o.id_order DESC, op.id_order_product
+    """
+
+    return await export_response(sql, params, format.lower(), "orders")
+
+
+@app.get("/export/payments", status_code=200)
+async def export_payments(
+    format: str = "ndjson",
+    client: Optional[int] = None,
+    status: Optional[str] = None,
+    location: Optional[int] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+):
+    conditions, params = order_filters(
+        client, status, location, date_from, date_to, "po.created_at")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    sql = f"""
+        SELECT /* full_scan_ok: exporta la tabla completa */
+            po.id_order_payment,
+            po.id_order,
+            c.id_client,
+            c.name || ' ' || c.lastname as client_name,
+            c.national_document,
+            pm.payment_method,
+            po.total_amount,
+            po.status as payment_status,
+            TO_CHAR(po.created_at, 'YYYY-MM-DD HH24:MI:SS') as payment_date,
+            TO_CHAR(po.updated_at, 'YYYY-MM-DD HH24:MI:SS') as last_update
+        FROM pagos_ordenes po
+        JOIN ordenes o ON po.id_order = o.id_order
+        JOIN clientes c ON o.id_client = c.id_client
+        JOIN metodos_pago pm ON po.id_payment_method = pm.id_payment_method
+        {where}
+        ORDER BY po.created_at DESC, po.id_order_payment DESC
+    """
+
+    return await export_response(sql, params, format.lower(), "payments")
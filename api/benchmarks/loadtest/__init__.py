@@ -0,0 +1,16 @@
+"""Pruebas de carga de la api con datos sinteticos.
+
+    seed     siembra clientes, productos, inventario por sede, ordenes y pagos
+             a la escala pedida (Oracle o sqlite) y guarda un manifiesto con
+             los ids que usa la carga
+    cleanup  borra los datos sembrados
+    run      lanza una mezcla de login, catalogo, crear orden, pagar y listar
+             ordenes y reporta peticiones por segundo, percentiles de latencia
+             y round-trips a la base por endpoint (JSON)
+    compare  compara dos reportes
+
+Uso (desde la carpeta api, requiere httpx):
+    python -m benchmarks.loadtest seed --scale small
+    python -m benchmarks.loadtest run --seconds 60 --concurrency 50
+    python -m benchmarks.loadtest compare antes.json despues.json
+"""
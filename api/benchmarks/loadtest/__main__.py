@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import datetime
+import os
+import httpx
+import repository
+import sqlite_repository
+from . import __doc__ as usage
+from . import report
+from . import seed
+from . import workload
+
+DEFAULT_MANIFEST = "loadtest_seed.json"
+
+
+def open_target(args):
+    if args.backend == "sqlite" and args.sqlite_path == ":memory:":
+        raise SystemExit(
+            "Con sqlite se necesita un archivo (--sqlite-path o SQLITE_PATH) "
+            "que compartan la siembra y la api")
+    return seed.create_target(args.backend, args.sqlite_path)
+
+
+def command_seed(args):
+    scale = dict(seed.SCALES[args.scale])
+    for name in scale:
+        if getattr(args, name) is not None:
+            scale[name] = getattr(args, name)
+
+    target = open_target(args)
+    started = datetime.datetime.now()
+    manifest = seed.seed(
+        target, lines_per_order=args.lines_per_order, paid_ratio=args.paid_ratio,
+        random_seed=args.random_seed, **scale)
+    target.connection.close()
+    manifest["scale"] = scale
+    manifest["backend"] = args.backend
+    seed.write_manifest(manifest, args.manifest)
+
+    elapsed = (datetime.datetime.now() - started).total_seconds()
+    print(", ".join(f"{count} {name}" for name, count in scale.items())
+          + f" en {elapsed:.1f}s, manifiesto en {args.manifest}")
+
+
+def command_cleanup(args):
+    target = open_target(args)
+    seed.cleanup(target)
+    target.connection.close()
+    print("datos de la prueba de carga borrados")
+
+
+async def drive(args, manifest, mix):
+    load = workload.Workload(manifest)
+    limits = httpx.Limits(max_connections=args.concurrency)
+
+    if not args.in_process:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60, limits=limits) as client:
+            return await workload.run(client, load, mix, args.concurrency,
+                                      args.seconds, args.warmup, args.random_seed)
+
+    # La api en el mismo proceso, sin red ni uvicorn: mide solo handlers,
+    # serializacion y la base (DB_BACKEND)
+    import api
+    transport = httpx.ASGITransport(app=api.app)
+    async with api.lifespan(api.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://api",
+                                     timeout=60, limits=limits) as client:
+            return await workload.run(client, load, mix, args.concurrency,
+                                      args.seconds, args.warmup, args.random_seed)
+
+
+def command_run(args):
+    manifest = report.load(args.manifest)
+    mix = workload.parse_mix(args.mix) if args.mix else workload.DEFAULT_MIX
+
+    started_at = datetime.datetime.now().isoformat(timespec="seconds")
+    samples, elapsed = asyncio.run(drive(args, manifest, mix))
+    summary = report.summarize(samples, elapsed)
+    report.print_summary(summary)
+
+    output = args.output or datetime.datetime.now().strftime("loadtest_%Y%m%d_%H%M%S.json")
+    report.save({
+        "label": args.label,
+        "started_at": started_at,
+        "config": {
+            "target": "in-process" if args.in_process else args.url,
+            "backend": os.getenv("DB_BACKEND", "oracle") if args.in_process else None,
+            "concurrency": args.concurrency,
+            "seconds": args.seconds,
+            "warmup": args.warmup,
+            "mix": mix,
+            "seed_scale": manifest.get("scale"),
+            "seed_backend": manifest.get("backend")
+        },
+        "elapsed_seconds": elapsed,
+        **summary
+    }, output)
+    print(f"reporte en {output}")
+
+    failed = report.failed_operations(summary)
+    if failed:
+        raise SystemExit(
+            "Todas las peticiones fallaron en: " + ", ".join(
+                f"{operation} ({summary['endpoints'][operation]['route']})"
+                for operation in failed))
+
+
+def command_compare(args):
+    report.compare(report.load(args.before), report.load(args.after))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.loadtest", description=usage,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def database_options(command):
+        command.add_argument("--backend", choices=["oracle", "sqlite"],
+                             default=repository.DB_BACKEND)
+        command.add_argument("--sqlite-path", default=sqlite_repository.SQLITE_PATH)
+
+    seed_command = commands.add_parser("seed", help="sembrar datos sinteticos")
+    database_options(seed_command)
+    seed_command.add_argument("--scale", choices=list(seed.SCALES), default="small")
+    seed_command.add_argument("--clients", type=int, default=None)
+    seed_command.add_argument("--products", type=int, default=None)
+    seed_command.add_argument("--locations", type=int, default=None)
+    seed_command.add_argument("--orders", type=int, default=None)
+    seed_command.add_argument("--lines-per-order", type=int, default=3)
+    seed_command.add_argument("--paid-ratio", type=float, default=0.5)
+    seed_command.add_argument("--random-seed", type=int, default=1)
+    seed_command.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    seed_command.set_defaults(handler=command_seed)
+
+    cleanup_command = commands.add_parser("cleanup", help="borrar los datos sembrados")
+    database_options(cleanup_command)
+    cleanup_command.set_defaults(handler=command_cleanup)
+
+    run_command = commands.add_parser("run", help="lanzar la carga")
+    run_command.add_argument("--url", default="http://localhost:8000")
+    run_command.add_argument("--in-process", action="store_true",
+                             help="cargar la api en este proceso (usa DB_BACKEND)")
+    run_command.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    run_command.add_argument("--mix", default=None,
+                             help="pesos, por ejemplo login=10,list_products=40")
+    run_command.add_argument("--concurrency", type=int, default=50)
+    run_command.add_argument("--seconds", type=float, default=30)
+    run_command.add_argument("--warmup", type=float, default=5)
+    run_command.add_argument("--random-seed", type=int, default=1)
+    run_command.add_argument("--label", default=None)
+    run_command.add_argument("--output", default=None)
+    run_command.set_defaults(handler=command_run)
+
+    compare_command = commands.add_parser("compare", help="comparar dos reportes")
+    compare_command.add_argument("before")
+    compare_command.add_argument("after")
+    compare_command.set_defaults(handler=command_compare)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
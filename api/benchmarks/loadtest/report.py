@@ -0,0 +1,107 @@
+import collections
+import json
+import math
+from .workload import ROUTES
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(values, p):
+    # Percentil por rango mas cercano de una lista ordenada
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def mean(values):
+    return sum(values) / len(values) if values else None
+
+
+def summarize(samples, elapsed):
+    # Resumen por operacion y total: peticiones, RPS, errores por codigo,
+    # latencia (ms) y round-trips y tiempo en la base por peticion (del
+    # header Server-Timing de la api)
+    by_operation = collections.defaultdict(list)
+    for sample in samples:
+        by_operation[sample.operation].append(sample)
+
+    def stats(group):
+        latencies = sorted(sample.seconds * 1000 for sample in group)
+        statuses = collections.Counter(sample.status for sample in group)
+        round_trips = [s.round_trips for s in group if s.round_trips is not None]
+        db_ms = [s.db_ms for s in group if s.db_ms is not None]
+        return {
+            "requests": len(group),
+            "rps": len(group) / elapsed if elapsed else 0,
+            "errors": sum(count for status, count in statuses.items() if status >= 400),
+            "statuses": {str(status): count for status, count in sorted(statuses.items())},
+            "latency_ms": {
+                **{f"p{p}": percentile(latencies, p) for p in PERCENTILES},
+                "mean": mean(latencies),
+                "max": latencies[-1] if latencies else None
+            },
+            "round_trips": mean(round_trips),
+            "db_ms": mean(db_ms)
+        }
+
+    endpoints = {}
+    for operation, group in sorted(by_operation.items()):
+        endpoints[operation] = {"route": ROUTES[operation], **stats(group)}
+    return {"endpoints": endpoints, "total": stats(samples)}
+
+
+def failed_operations(summary):
+    # Operaciones en las que todas las peticiones fallaron: la ruta no
+    # funciona con esta api o estos datos y sus numeros no miden nada
+    return [
+        operation for operation, stats in summary["endpoints"].items()
+        if stats["requests"] and stats["errors"] == stats["requests"]
+    ]
+
+
+def format_number(value, digits=1):
+    return "-" if value is None else f"{value:.{digits}f}"
+
+
+def print_summary(summary):
+    print(f"{'operacion':<15} {'peticiones':>10} {'rps':>8} {'errores':>8} "
+          f"{'p50':>8} {'p95':>8} {'p99':>8} {'rt':>6} {'db ms':>7}")
+    rows = list(summary["endpoints"].items()) + [("total", summary["total"])]
+    for name, stats in rows:
+        latency = stats["latency_ms"]
+        print(f"{name:<15} {stats['requests']:>10} {stats['rps']:>8.1f} "
+              f"{stats['errors']:>8} {format_number(latency['p50']):>8} "
+              f"{format_number(latency['p95']):>8} {format_number(latency['p99']):>8} "
+              f"{format_number(stats['round_trips']):>6} {format_number(stats['db_ms']):>7}")
+
+
+def save(result, path):
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(before, after):
+    # Cambio de RPS y latencia p95 por operacion entre dos reportes
+    def change(old, new):
+        if old is None or new is None or old == 0:
+            return "-"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    print(f"{'operacion':<15} {'rps antes':>10} {'rps despues':>12} {'cambio':>8} "
+          f"{'p95 antes':>10} {'p95 despues':>12} {'cambio':>8}")
+    names = sorted(set(before["endpoints"]) | set(after["endpoints"])) + ["total"]
+    for name in names:
+        old = before["total"] if name == "total" else before["endpoints"].get(name)
+        new = after["total"] if name == "total" else after["endpoints"].get(name)
+        old_rps = old["rps"] if old else None
+        new_rps = new["rps"] if new else None
+        old_p95 = old["latency_ms"]["p95"] if old else None
+        new_p95 = new["latency_ms"]["p95"] if new else None
+        print(f"{name:<15} {format_number(old_rps):>10} {format_number(new_rps):>12} "
+              f"{change(old_rps, new_rps):>8} {format_number(old_p95):>10} "
+              f"{format_number(new_p95):>12} {change(old_p95, new_p95):>8}")
@@ -0,0 +1,297 @@
+import json
+import random
+import re
+import oracledb
+import keys
+import passwords
+import repository
+import sqlite_repository
+
+# Marcas de los datos sembrados, cleanup borra solo lo que las tiene
+DOCUMENT_PREFIX = "LT"
+SKU_PREFIX = "LT-"
+LOCATION_PREFIX = "LT sede"
+METHOD = "LOADTEST"
+# Todos los clientes comparten la contraseña (y el hash, bcrypt una sola vez)
+PASSWORD = "loadtest-Contraseña1"
+
+# Unidades de cada fila de inventario, suficiente para no agotar el stock
+STOCK = 1_000_000
+BATCH_SIZE = 5000
+
+SCALES = {
+    "small": {"clients": 200, "products": 500, "locations": 3, "orders": 2000},
+    "medium": {"clients": 5000, "products": 10000, "locations": 10, "orders": 50000},
+    "large": {"clients": 50000, "products": 100000, "locations": 25, "orders": 500000}
+}
+
+NAMES = ["Ana", "Luis", "Maria", "Jose", "Sofia", "Carlos", "Lucia", "Pedro"]
+LASTNAMES = ["Lopez", "Garcia", "Perez", "Martinez", "Ramirez", "Castillo"]
+
+
+class OracleTarget:
+    # Las tablas con secuencia reservan sus ids como keys.py, asi la api no
+    # vuelve a entregarlos
+
+    def __init__(self):
+        self.connection = oracledb.connect(repository.dsn)
+
+    def reserve_ids(self, table, count):
+        if table in keys.SEQUENCES:
+            cursor = self.connection.cursor()
+            ids = keys.reserve_ids(cursor, table, count)
+            cursor.close()
+            return ids
+        return max_ids(self.connection, table, count)
+
+    def has_table(self, name):
+        cursor = self.connection.cursor()
+        cursor.execute(
+            "SELECT COUNT(*) FROM user_tables WHERE table_name = UPPER(:name)",
+            {"name": name})
+        found = cursor.fetchone()[0] > 0
+        cursor.close()
+        return found
+
+    def begin(self):
+        pass
+
+    def executemany(self, sql, rows):
+        cursor = self.connection.cursor()
+        for start in range(0, len(rows), BATCH_SIZE):
+            cursor.executemany(sql, rows[start:start + BATCH_SIZE])
+        cursor.close()
+
+
+class SqliteTarget:
+    def __init__(self, path):
+        self.connection = sqlite_repository.connect(path)
+
+    def reserve_ids(self, table, count):
+        return max_ids(self.connection, table, count)
+
+    def has_table(self, name):
+        cursor = self.connection.cursor()
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = :name",
+            {"name": name})
+        found = cursor.fetchone()[0] > 0
+        cursor.close()
+        return found
+
+    def begin(self):
+        # La conexion esta en autocommit: sin transaccion cada fila seria
+        # un commit
+        self.connection.execute("BEGIN")
+
+    def executemany(self, sql, rows):
+        # Los parametros posicionales de Oracle (:1, :2) pasan a ?
+        self.connection.executemany(re.sub(r":\d+", "?", sql), rows)
+
+
+# Llave primaria de cada tabla sembrada
+PRIMARY_KEYS = {
+    "sedes": "id_site",
+    "metodos_pago": "id_payment_method",
+    "clientes": "id_client",
+    "informacion_contacto_clientes": "id_inf_client",
+    "metodos_pago_cliente": "id_client_payment_methods",
+    "productos": "id_product",
+    "inventario": "id_inventory",
+    "ordenes": "id_order",
+    "ordenes_productos": "id_order_product",
+    "pagos_ordenes": "id_order_payment",
+    "pagos": "id_payments"
+}
+
+
+def max_ids(connection, table, count):
+    # Tablas sin secuencia: ids despues del maximo actual
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT COALESCE(MAX({PRIMARY_KEYS[table]}), 0) + 1 FROM {table}")
+    start = cursor.fetchone()[0]
+    cursor.close()
+    return list(range(start, start + count))
+
+
+def create_target(backend, sqlite_path=None):
+    if backend == "oracle":
+        return OracleTarget()
+    if backend == "sqlite":
+        return SqliteTarget(sqlite_path)
+    raise ValueError(f"backend invalido: {backend}")
+
+
+def insert(target, sql, rows):
+    if rows:
+        target.executemany(sql, rows)
+
+
+def seed(target, clients, products, locations, orders, lines_per_order=3,
+         paid_ratio=0.5, inactive_ratio=0.05, random_seed=1):
+    # Devuelve el manifiesto con los ids que necesita la carga
+    rng = random.Random(random_seed)
+    cleanup(target)
+    target.begin()
+
+    location_ids = target.reserve_ids("sedes", locations)
+    insert(target, "INSERT INTO sedes (id_site, name) VALUES (:1, :2)",
+           [(id, f"{LOCATION_PREFIX} {n}") for n, id in enumerate(location_ids, 1)])
+
+    method_id = target.reserve_ids("metodos_pago", 1)[0]
+    insert(target,
+           "INSERT INTO metodos_pago (id_payment_method, payment_method) VALUES (:1, :2)",
+           [(method_id, METHOD)])
+
+    # Clientes con su contacto y el metodo de pago asociado
+    password_hash = passwords.pwd_context.hash(PASSWORD)
+    client_ids = target.reserve_ids("clientes", clients)
+    documents = [f"{DOCUMENT_PREFIX}{n:07d}" for n in range(1, clients + 1)]
+    insert(target,
+           """INSERT INTO clientes (id_client, national_document, name, lastname, password)
+              VALUES (:1, :2, :3, :4, :5)""",
+           [(id, doc, rng.choice(NAMES), rng.choice(LASTNAMES), password_hash)
+            for id, doc in zip(client_ids, documents)])
+    contact_ids = target.reserve_ids("informacion_contacto_clientes", clients)
+    insert(target,
+           """INSERT INTO informacion_contacto_clientes
+                  (id_inf_client, id_client, phone, email, active, confirmed_email)
+              VALUES (:1, :2, :3, :4, 'TRUE', 'TRUE')""",
+           [(id, client, f"5{n:07d}", f"lt{n}@loadtest.local")
+            for n, (id, client) in enumerate(zip(contact_ids, client_ids), 1)])
+    link_ids = target.reserve_ids("metodos_pago_cliente", clients)
+    insert(target,
+           """INSERT INTO metodos_pago_cliente
+                  (id_client_payment_methods, id_client, id_payment_method)
+              VALUES (:1, :2, :3)""",
+           [(id, client, method_id) for id, client in zip(link_ids, client_ids)])
+
+    # Productos, cada uno con inventario en algunas sedes
+    product_ids = target.reserve_ids("productos", products)
+    prices = {id: rng.randint(10, 5000) for id in product_ids}
+    active = {id: rng.random() >= inactive_ratio for id in product_ids}
+    insert(target,
+           """INSERT INTO productos
+                  (id_product, sku, name, description, price, slug, category_id, active)
+              VALUES (:1, :2, :3, :4, :5, :6, :7, :8)""",
+           [(id, f"{SKU_PREFIX}{n:07d}", f"Producto {n}",
+             f"Producto sintetico {n} para pruebas de carga", prices[id],
+             f"lt-producto-{n}", rng.randint(1, 10), "TRUE" if active[id] else "FALSE")
+            for n, id in enumerate(product_ids, 1)])
+
+    stocked = {location: [] for location in location_ids}
+    inventory = []
+    for id in product_ids:
+        for location in rng.sample(location_ids, rng.randint(1, len(location_ids))):
+            inventory.append((id, location))
+            if active[id]:
+                stocked[location].append(id)
+    inventory_ids = target.reserve_ids("inventario", len(inventory))
+    insert(target,
+           """INSERT INTO inventario (id_inventory, id_product, id_location, quantity)
+              VALUES (:1, :2, :3, :4)""",
+           [(id, product, location, STOCK)
+            for id, (product, location) in zip(inventory_ids, inventory)])
+
+    # Historial de ordenes con sus lineas y pagos, pagadas o pendientes
+    locations_with_stock = [location for location in location_ids if stocked[location]]
+    order_ids = target.reserve_ids("ordenes", orders)
+    order_rows, line_rows, payment_rows, paid_rows, pending = [], [], [], [], []
+    for id in order_ids:
+        client = rng.choice(client_ids)
+        location = rng.choice(locations_with_stock)
+        items = rng.sample(stocked[location], min(lines_per_order, len(stocked[location])))
+        lines = [(product, rng.randint(1, 3)) for product in items]
+        total = sum(prices[product] * quantity for product, quantity in lines)
+        status = "PAID" if rng.random() < paid_ratio else "PENDING"
+        order_rows.append((id, client, location))
+        line_rows.extend((id, product, quantity, prices[product]) for product, quantity in lines)
+        payment_rows.append((id, method_id, status, total))
+        if status == "PAID":
+            paid_rows.append((client, method_id))
+        else:
+            pending.append([id, total])
+
+    insert(target,
+           "INSERT INTO ordenes (id_order, id_client, id_location) VALUES (:1, :2, :3)",
+           order_rows)
+    line_ids = target.reserve_ids("ordenes_productos", len(line_rows))
+    insert(target,
+           """INSERT INTO ordenes_productos (id_order_product, id_order, id_product, quantity, price)
+              VALUES (:1, :2, :3, :4, :5)""",
+           [(id, *row) for id, row in zip(line_ids, line_rows)])
+    order_payment_ids = target.reserve_ids("pagos_ordenes", len(payment_rows))
+    insert(target,
+           """INSERT INTO pagos_ordenes
+                  (id_order_payment, id_order, id_payment_method, status, total_amount)
+              VALUES (:1, :2, :3, :4, :5)""",
+           [(id, *row) for id, row in zip(order_payment_ids, payment_rows)])
+    payment_ids = target.reserve_ids("pagos", len(paid_rows))
+    insert(target,
+           "INSERT INTO pagos (id_payments, id_client, id_payment_method) VALUES (:1, :2, :3)",
+           [(id, *row) for id, row in zip(payment_ids, paid_rows)])
+
+    bump_catalog(target)
+    target.connection.commit()
+
+    return {
+        "password": PASSWORD,
+        "method": METHOD,
+        "method_id": method_id,
+        "clients": [[id, doc] for id, doc in zip(client_ids, documents)],
+        "locations": location_ids,
+        # Productos activos con inventario en cada sede (llaves de JSON: texto)
+        "stock": {str(location): ids for location, ids in stocked.items() if ids},
+        "pending_orders": pending
+    }
+
+
+def bump_catalog(target):
+    # Cambia el ETag de GET /products; el cache en memoria de la api vence
+    # con CATALOG_CACHE_TTL
+    cursor = target.connection.cursor()
+    cursor.execute(
+        "UPDATE catalogo_version SET version = version + 1 WHERE id_catalog = 1")
+    cursor.close()
+
+
+def cleanup(target):
+    # Borra los datos sembrados y lo que la carga creo con ellos (ordenes,
+    # pagos y sesiones de los clientes sembrados)
+    clients = f"SELECT id_client FROM clientes WHERE national_document LIKE '{DOCUMENT_PREFIX}%'"
+    orders = f"SELECT id_order FROM ordenes WHERE id_client IN ({clients})"
+    products = f"SELECT id_product FROM productos WHERE sku LIKE '{SKU_PREFIX}%'"
+    statements = [
+        f"DELETE FROM ordenes_productos WHERE id_order IN ({orders})",
+        f"DELETE FROM pagos_ordenes WHERE id_order IN ({orders})",
+        f"DELETE FROM ordenes_entregadas WHERE id_order IN ({orders})",
+        f"DELETE FROM productos_devolucion WHERE id_order IN ({orders})",
+        f"DELETE FROM ordenes WHERE id_client IN ({clients})",
+        f"DELETE FROM pagos WHERE id_client IN ({clients})",
+        f"DELETE FROM metodos_pago_cliente WHERE id_client IN ({clients})",
+        f"DELETE FROM informacion_contacto_clientes WHERE id_client IN ({clients})",
+        f"DELETE FROM direcciones WHERE id_client IN ({clients})"
+    ]
+    # La tabla sesiones solo existe con la migracion 006
+    if target.has_table("sesiones"):
+        statements.append(f"DELETE FROM sesiones WHERE id_client IN ({clients})")
+    statements += [
+        f"DELETE FROM clientes WHERE id_client IN ({clients})",
+        f"DELETE FROM inventario WHERE id_product IN ({products})",
+        f"DELETE FROM productos WHERE id_product IN ({products})",
+        f"DELETE FROM metodos_pago WHERE payment_method = '{METHOD}'",
+        f"DELETE FROM sedes WHERE name LIKE '{LOCATION_PREFIX} %'"
+    ]
+
+    target.begin()
+    cursor = target.connection.cursor()
+    for sql in statements:
+        cursor.execute(sql)
+    cursor.close()
+    bump_catalog(target)
+    target.connection.commit()
+
+
+def write_manifest(manifest, path):
+    with open(path, "w") as f:
+        json.dump(manifest, f)
@@ -0,0 +1,142 @@
+import asyncio
+import collections
+import random
+import re
+import time
+
+# Peso de cada operacion en la mezcla por defecto
+DEFAULT_MIX = {
+    "login": 10,
+    "list_products": 40,
+    "create_order": 15,
+    "pay_order": 10,
+    "list_orders": 25
+}
+
+# Ruta de cada operacion, para el reporte
+ROUTES = {
+    "login": "POST /users/login",
+    "list_products": "GET /products",
+    "create_order": "POST /orders",
+    "pay_order": "POST /payments",
+    "list_orders": "GET /orders"
+}
+
+SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) round-trips')
+
+
+def parse_mix(text):
+    # "login=10,list_products=40" -> {"login": 10, "list_products": 40}
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ROUTES:
+            raise ValueError(f"Operacion desconocida: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+class Sample:
+    __slots__ = ("operation", "status", "seconds", "round_trips", "db_ms")
+
+    def __init__(self, operation, status, seconds, round_trips, db_ms):
+        self.operation = operation
+        self.status = status
+        self.seconds = seconds
+        self.round_trips = round_trips
+        self.db_ms = db_ms
+
+
+class Workload:
+    # Operaciones de la mezcla sobre los datos del manifiesto. Las ordenes
+    # que se crean quedan pendientes y pay_order las paga despues
+
+    def __init__(self, manifest):
+        self.password = manifest["password"]
+        self.method = manifest["method"]
+        self.method_id = manifest["method_id"]
+        self.clients = manifest["clients"]
+        self.stock = {int(location): ids for location, ids in manifest["stock"].items()}
+        self.locations = list(self.stock)
+        self.pending = collections.deque(manifest["pending_orders"])
+
+    async def login(self, client, rng):
+        _, document = rng.choice(self.clients)
+        return await client.post("/users/login", json={
+            "national_document": document, "password": self.password})
+
+    async def list_products(self, client, rng):
+        params = {"limit": rng.choice([20, 50])}
+        if rng.random() < 0.3:
+            params["location"] = rng.choice(self.locations)
+        return await client.get("/products", params=params)
+
+    async def create_order(self, client, rng):
+        id_client, _ = rng.choice(self.clients)
+        location = rng.choice(self.locations)
+        stocked = self.stock[location]
+        products = rng.sample(stocked, min(rng.randint(1, 3), len(stocked)))
+        response = await client.post("/orders", json={
+            "id_client": id_client,
+            "id_location": location,
+            "id_payment_method": self.method_id,
+            "items": [{"id_product": id, "quantity": rng.randint(1, 3)} for id in products]
+        })
+        if response.status_code == 201:
+            body = response.json()
+            self.pending.append([body["id_order"], body["total_amount"]])
+        return response
+
+    async def pay_order(self, client, rng):
+        if not self.pending:
+            # No hay ordenes pendientes: run crea una en su lugar
+            return None
+        id_order, total = self.pending.popleft()
+        return await client.post("/payments", json={
+            "orderId": id_order, "amount": total, "method": self.method})
+
+    async def list_orders(self, client, rng):
+        params = {"limit": 20}
+        choice = rng.random()
+        if choice < 0.5:
+            params["client"] = rng.choice(self.clients)[0]
+        elif choice < 0.75:
+            params["status"] = rng.choice(["PAID", "PENDING"])
+        return await client.get("/orders", params=params)
+
+
+async def run(client, workload, mix, concurrency, seconds, warmup, random_seed=1):
+    # Usuarios virtuales en lazo cerrado: cada uno hace una operacion tras
+    # otra hasta el final. Las muestras del calentamiento no se guardan
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples = []
+    start = time.perf_counter()
+    measure_from = start + warmup
+    deadline = measure_from + seconds
+
+    async def user(index):
+        rng = random.Random(random_seed + index)
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                return
+            operation = rng.choices(names, weights)[0]
+            response = await getattr(workload, operation)(client, rng)
+            if response is None and operation == "pay_order":
+                operation = "create_order"
+                now = time.perf_counter()
+                response = await workload.create_order(client, rng)
+            elapsed = time.perf_counter() - now
+            if now < measure_from:
+                continue
+            match = SERVER_TIMING_DB.search(response.headers.get("server-timing", ""))
+            samples.append(Sample(
+                operation, response.status_code, elapsed,
+                int(match.group(2)) if match else None,
+                float(match.group(1)) if match else None
+            ))
+
+    await asyncio.gather(*(user(i) for i in range(concurrency)))
+    return samples, time.perf_counter() - measure_from
@@ -0,0 +1,63 @@
+"""Benchmark de la verificacion de contraseñas del login por costo de bcrypt.
+
+Para cada costo genera un hash y verifica la contraseña en un pool de hilos
+(como passwords.py) durante el tiempo indicado. Reporta logins por segundo
+en total y por nucleo, y la latencia media de una verificacion. No usa la
+base de datos: mide el techo que pone bcrypt al endpoint de login.
+
+Uso (desde la carpeta api):
+    python benchmarks/login_throughput.py --rounds 8 10 12 --seconds 5
+    python benchmarks/login_throughput.py --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import passwords  # noqa: E402
+
+PASSWORD = "benchmark-Contraseña1"
+
+
+def run(rounds, workers, seconds):
+    context = passwords.make_context(rounds)
+    hashed = context.hash(PASSWORD)
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+        count = 0
+        while time.perf_counter() < deadline:
+            context.verify(PASSWORD, hashed)
+            count += 1
+        return count
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        total = sum(executor.map(lambda _: worker(), range(workers)))
+    elapsed = time.perf_counter() - start
+    return total, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, nargs="+", default=[8, 10, 12])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="hilos (por defecto, uno por nucleo)")
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.workers} hilos, {args.seconds:.0f}s por costo")
+    print(f"{'costo':>6} {'logins':>8} {'logins/s':>10} {'por nucleo':>11} {'ms':>8}")
+    for rounds in args.rounds:
+        total, elapsed = run(rounds, args.workers, args.seconds)
+        rate = total / elapsed
+        latency = elapsed * args.workers / total * 1000 if total else 0
+        print(f"{rounds:>6} {total:>8} {rate:>10.1f} "
+              f"{rate / args.workers:>11.1f} {latency:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
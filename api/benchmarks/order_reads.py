@@ -0,0 +1,187 @@
+"""Benchmark de las lecturas de GET /orders/:id y POST /payments.
+
+Compara las consultas anteriores (cabecera + productos para el detalle,
+cinco busquedas separadas para el pago) con las consultas unicas de
+statements.py (ORDER_DETAIL con JSON_OBJECT/JSON_ARRAYAGG y PAYMENT_LOOKUP).
+Reporta round-trips por llamada y milisegundos promedio. Solo lee, usa una
+orden existente (por defecto la mas reciente con pago).
+
+Uso (desde la carpeta api):
+    python benchmarks/order_reads.py --iterations 500
+    python benchmarks/order_reads.py --order 1234
+"""
+import argparse
+import os
+import sys
+import time
+import oracledb
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import statements  # noqa: E402
+
+dsn = 'system/bases1@localhost:1521/XE'
+
+# Version anterior del detalle: cabecera y productos por separado
+OLD_ORDER_HEADER = """
+    SELECT
+        o.id_order,
+        o.id_client,
+        c.name || ' ' || c.lastname as client_name,
+        c.national_document as client_document,
+        o.id_location,
+        s.name as location_name,
+        TO_CHAR(o.created_at, 'YYYY-MM-DD HH24:MI:SS') as created_at,
+        TO_CHAR(o.updated_at, 'YYYY-MM-DD HH24:MI:SS') as updated_at,
+        po.status as payment_status,
+        pm.payment_method,
+        pm.id_payment_method,
+        po.total_amount
+    FROM ordenes o
+    JOIN clientes c ON o.id_client = c.id_client
+    JOIN pagos_ordenes po ON o.id_order = po.id_order
+    JOIN metodos_pago pm ON po.id_payment_method = pm.id_payment_method
+    LEFT JOIN ordenes_entregadas oe ON o.id_order = oe.id_order
+    LEFT JOIN sedes s ON o.id_location = s.id_site
+    WHERE o.id_order = :order_id
+"""
+
+OLD_ORDER_LINES = """
+    SELECT
+        op.id_order_product,
+        op.id_product,
+        p.name as product_name,
+        p.description as product_description,
+        p.sku as product_sku,
+        op.quantity,
+        op.price as unit_price,
+        (op.quantity * op.price) as subtotal,
+        TO_CHAR(op.created_at, 'YYYY-MM-DD HH24:MI:SS') as added_at,
+        TO_CHAR(op.updated_at, 'YYYY-MM-DD HH24:MI:SS') as updated_at
+    FROM ordenes_productos op
+    JOIN productos p ON op.id_product = p.id_product
+    WHERE op.id_order = :order_id
+    ORDER BY op.id_order_product
+"""
+
+# Version anterior de las validaciones de create_payment
+OLD_PAYMENT_LOOKUPS = [
+    ("SELECT COUNT(*) FROM ordenes WHERE id_order = :order_id",
+     ["order_id"]),
+    ("""SELECT id_payment_method FROM metodos_pago
+        WHERE LOWER(payment_method) = LOWER(:method)""",
+     ["method"]),
+    ("""SELECT COUNT(*)
+        FROM metodos_pago_cliente mpc
+        JOIN ordenes o ON mpc.id_client = o.id_client
+        WHERE o.id_order = :order_id
+        AND mpc.id_payment_method = :method_id""",
+     ["order_id", "method_id"]),
+    ("SELECT status, total_amount FROM pagos_ordenes WHERE id_order = :order_id",
+     ["order_id"]),
+    ("SELECT id_client FROM ordenes WHERE id_order = :order_id",
+     ["order_id"])
+]
+
+
+def round_trips(connection):
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT s.value
+        FROM v$mystat s
+        JOIN v$statname n ON s.statistic# = n.statistic#
+        WHERE n.name = 'SQL*Net roundtrips to/from client'
+    """)
+    value = cursor.fetchone()[0]
+    cursor.close()
+    return value
+
+
+def pick_order(connection, order_id):
+    cursor = connection.cursor()
+    cursor.execute(
+        """
+        SELECT o.id_order, pm.payment_method, pm.id_payment_method
+        FROM ordenes o
+        JOIN pagos_ordenes po ON o.id_order = po.id_order
+        JOIN metodos_pago pm ON po.id_payment_method = pm.id_payment_method
+        WHERE o.id_order = NVL(:id, o.id_order)
+        ORDER BY o.id_order DESC
+        FETCH FIRST 1 ROWS ONLY
+        """,
+        {"id": order_id}
+    )
+    row = cursor.fetchone()
+    cursor.close()
+    if row is None:
+        raise SystemExit("No hay ordenes con pago para el benchmark")
+    return row
+
+
+def old_detail(cursor, order):
+    cursor.execute(OLD_ORDER_HEADER, {"order_id": order[0]})
+    cursor.fetchone()
+    cursor.execute(OLD_ORDER_LINES, {"order_id": order[0]})
+    cursor.fetchall()
+
+
+def new_detail(cursor, order):
+    cursor.execute(statements.ORDER_DETAIL, {"id": order[0]}, fetch_lobs=False)
+    cursor.fetchone()
+
+
+def old_payment(cursor, order):
+    values = {"order_id": order[0], "method": order[1], "method_id": order[2]}
+    for sql, names in OLD_PAYMENT_LOOKUPS:
+        cursor.execute(sql, {name: values[name] for name in names})
+        cursor.fetchone()
+
+
+def new_payment(cursor, order):
+    cursor.execute(statements.PAYMENT_LOOKUP,
+                   {"order_id": order[0], "method": order[1]})
+    cursor.fetchone()
+
+
+def measure(connection, strategy, order, iterations):
+    cursor = connection.cursor()
+    # Calentar el cache de sentencias
+    strategy(cursor, order)
+
+    before = round_trips(connection)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        strategy(cursor, order)
+    elapsed = time.perf_counter() - start
+    # -1: la consulta a v$mystat tambien cuenta como round-trip
+    trips = round_trips(connection) - before - 1
+    cursor.close()
+    return trips / iterations, elapsed / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--order", type=int, default=None)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    connection = oracledb.connect(dsn)
+    order = pick_order(connection, args.order)
+    print(f"orden {order[0]}, {args.iterations} iteraciones")
+
+    print(f"{'lectura':>10} {'version':>8} {'round-trips':>12} {'ms':>8}")
+    cases = [
+        ("detalle", "anterior", old_detail),
+        ("detalle", "nueva", new_detail),
+        ("pago", "anterior", old_payment),
+        ("pago", "nueva", new_payment)
+    ]
+    for name, version, strategy in cases:
+        trips, ms = measure(connection, strategy, order, args.iterations)
+        print(f"{name:>10} {version:>8} {trips:>12.1f} {ms:>8.2f}")
+
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""Benchmark de GET /orders: consulta por orden (N+1) contra una sola consulta.
+
+Siembra ordenes sinteticas para un cliente de prueba hasta llegar a cada
+tamaño pedido y mide, para las dos estrategias, la latencia y los round-trips
+a Oracle (estadistica 'SQL*Net roundtrips to/from client' de la sesion).
+
+Uso (desde la carpeta api):
+    python benchmarks/orders_n_plus_one.py --sizes 1000 10000 100000
+    python benchmarks/orders_n_plus_one.py --cleanup
+"""
+import argparse
+import os
+import sys
+import time
+import oracledb
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import keys  # noqa: E402
+
+dsn = 'system/bases1@localhost:1521/XE'
+
+LINES_PER_ORDER = 3
+BATCH_SIZE = 5000
+
+BENCH_DOCUMENT = 'BENCH0001'
+BENCH_SKU = 'BENCH-0001'
+BENCH_METHOD = 'BENCHMARK'
+
+ORDERS_QUERY = """
+    SELECT
+        o.id_order,
+        o.id_client,
+        c.name || ' ' || c.lastname as client_name,
+        o.id_location,
+        TO_CHAR(o.created_at, 'YYYY-MM-DD HH24:MI:SS') as created_at,
+        TO_CHAR(o.updated_at, 'YYYY-MM-DD HH24:MI:SS') as updated_at,
+        po.status as payment_status,
+        pm.payment_method,
+        po.total_amount
+    FROM ordenes o
+    JOIN clientes c ON o.id_client = c.id_client
+    JOIN pagos_ordenes po ON o.id_order = po.id_order
+    JOIN metodos_pago pm ON po.id_payment_method = pm.id_payment_method
+    ORDER BY o.id_order DESC
+"""
+
+# Version anterior: una consulta por orden
+LINES_BY_ORDER_QUERY = """
+    SELECT
+        op.id_product,
+        p.name as product_name,
+        op.quantity,
+        op.price,
+        (op.quantity * op.price) as subtotal
+    FROM ordenes_productos op
+    JOIN productos p ON op.id_product = p.id_product
+    WHERE op.id_order = :order_id
+"""
+
+# Version nueva: todas las lineas en una consulta
+ALL_LINES_QUERY = """
+    SELECT
+        op.id_order,
+        op.id_product,
+        p.name as product_name,
+        op.quantity,
+        op.price,
+        (op.quantity * op.price) as subtotal
+    FROM ordenes_productos op
+    JOIN productos p ON op.id_product = p.id_product
+    ORDER BY op.id_order, op.id_order_product
+"""
+
+
+def round_trips(connection):
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT s.value
+        FROM v$mystat s
+        JOIN v$statname n ON s.statistic# = n.statistic#
+        WHERE n.name = 'SQL*Net roundtrips to/from client'
+    """)
+    value = cursor.fetchone()[0]
+    cursor.close()
+    return value
+
+
+def fixture(connection):
+    # Cliente, producto y metodo de pago usados por las ordenes sinteticas
+    cursor = connection.cursor()
+
+    cursor.execute(
+        "SELECT id_client FROM clientes WHERE national_document = :doc",
+        {"doc": BENCH_DOCUMENT}
+    )
+    row = cursor.fetchone()
+    if row:
+        id_client = row[0]
+        cursor.execute(
+            "SELECT id_product FROM productos WHERE sku = :sku", {"sku": BENCH_SKU})
+        id_product = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT id_payment_method FROM metodos_pago WHERE payment_method = :m",
+            {"m": BENCH_METHOD}
+        )
+        id_method = cursor.fetchone()[0]
+        cursor.close()
+        return id_client, id_product, id_method
+
+    id_client = keys.reserve_ids(cursor, "clientes", 1)[0]
+    id_product = keys.reserve_ids(cursor, "productos", 1)[0]
+    cursor.execute(
+        "SELECT COALESCE(MAX(id_payment_method), 0) + 1 FROM metodos_pago")
+    id_method = cursor.fetchone()[0]
+
+    cursor.execute(
+        """INSERT INTO clientes (id_client, national_document, name, lastname, password)
+           VALUES (:id, :doc, 'Bench', 'Orders', 'x')""",
+        {"id": id_client, "doc": BENCH_DOCUMENT}
+    )
+    cursor.execute(
+        """INSERT INTO productos (id_product, sku, name, description, price, slug, category_id, active)
+           VALUES (:id, :sku, 'Bench product', 'Producto de benchmark', 10, 'bench-product', 1, 'TRUE')""",
+        {"id": id_product, "sku": BENCH_SKU}
+    )
+    cursor.execute(
+        "INSERT INTO metodos_pago (id_payment_method, payment_method) VALUES (:id, :m)",
+        {"id": id_method, "m": BENCH_METHOD}
+    )
+    connection.commit()
+    cursor.close()
+    return id_client, id_product, id_method
+
+
+def seed(connection, target, id_client, id_product, id_method):
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT COUNT(*) FROM ordenes WHERE id_client = :id", {"id": id_client})
+    existing = cursor.fetchone()[0]
+
+    missing = target - existing
+    while missing > 0:
+        batch = min(missing, BATCH_SIZE)
+        order_ids = keys.reserve_ids(cursor, "ordenes", batch)
+        payment_ids = keys.reserve_ids(cursor, "pagos_ordenes", batch)
+        line_ids = keys.reserve_ids(cursor, "ordenes_productos",
+                               batch * LINES_PER_ORDER)
+
+        cursor.executemany(
+            "INSERT INTO ordenes (id_order, id_client, id_location) VALUES (:1, :2, 1)",
+            [(id_order, id_client) for id_order in order_ids]
+        )
+        cursor.executemany(
+            """INSERT INTO pagos_ordenes (id_order_payment, id_order, id_payment_method, status, total_amount)
+               VALUES (:1, :2, :3, 'PENDING', :4)""",
+            [(payment_id, id_order, id_method, 10 * LINES_PER_ORDER)
+             for payment_id, id_order in zip(payment_ids, order_ids)]
+        )
+        cursor.executemany(
+            """INSERT INTO ordenes_productos (id_order_product, id_order, id_product, quantity, price)
+               VALUES (:1, :2, :3, 1, 10)""",
+            [(line_ids[i], order_ids[i // LINES_PER_ORDER], id_product)
+             for i in range(batch * LINES_PER_ORDER)]
+        )
+        connection.commit()
+        missing -= batch
+
+    cursor.close()
+
+
+def fetch_orders(cursor):
+    cursor.arraysize = 1000
+    cursor.execute(ORDERS_QUERY)
+    columns = [col[0].lower() for col in cursor.description]
+    cursor.rowfactory = lambda *args: dict(zip(columns, args))
+    return cursor.fetchall()
+
+
+def n_plus_one(connection):
+    cursor = connection.cursor()
+    orders = fetch_orders(cursor)
+    for order in orders:
+        cursor.execute(LINES_BY_ORDER_QUERY, {"order_id": order['id_order']})
+        product_columns = [col[0].lower() for col in cursor.description]
+        cursor.rowfactory = lambda *args: dict(zip(product_columns, args))
+        order['products'] = cursor.fetchall()
+    cursor.close()
+    return orders
+
+
+def single_query(connection):
+    cursor = connection.cursor()
+    orders = fetch_orders(cursor)
+    cursor.execute(ALL_LINES_QUERY)
+    product_columns = [col[0].lower() for col in cursor.description]
+    cursor.rowfactory = lambda *args: dict(zip(product_columns, args))
+
+    products_by_order = {}
+    for product in cursor.fetchall():
+        products_by_order.setdefault(product.pop('id_order'), []).append(product)
+    for order in orders:
+        order['products'] = products_by_order.get(order['id_order'], [])
+    cursor.close()
+    return orders
+
+
+def measure(connection, strategy):
+    before = round_trips(connection)
+    start = time.perf_counter()
+    orders = strategy(connection)
+    elapsed = time.perf_counter() - start
+    # -1: la consulta a v$mystat tambien cuenta como round-trip
+    trips = round_trips(connection) - before - 1
+    return len(orders), trips, elapsed
+
+
+def cleanup(connection):
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT id_client FROM clientes WHERE national_document = :doc",
+        {"doc": BENCH_DOCUMENT}
+    )
+    row = cursor.fetchone()
+    if row:
+        params = {"id": row[0]}
+        orders = "SELECT id_order FROM ordenes WHERE id_client = :id"
+        cursor.execute(
+            f"DELETE FROM ordenes_productos WHERE id_order IN ({orders})", params)
+        cursor.execute(
+            f"DELETE FROM pagos_ordenes WHERE id_order IN ({orders})", params)
+        cursor.execute("DELETE FROM ordenes WHERE id_client = :id", params)
+        cursor.execute("DELETE FROM clientes WHERE id_client = :id", params)
+        cursor.execute("DELETE FROM productos WHERE sku = :sku",
+                       {"sku": BENCH_SKU})
+        cursor.execute("DELETE FROM metodos_pago WHERE payment_method = :m",
+                       {"m": BENCH_METHOD})
+        connection.commit()
+    cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1000, 10000, 100000])
+    parser.add_argument("--skip-n-plus-one-above", type=int, default=None,
+                        help="no correr la version N+1 por encima de este tamaño")
+    parser.add_argument("--cleanup", action="store_true",
+                        help="borrar los datos sinteticos y salir")
+    args = parser.parse_args()
+
+    connection = oracledb.connect(dsn)
+
+    if args.cleanup:
+        cleanup(connection)
+        connection.close()
+        return
+
+    id_client, id_product, id_method = fixture(connection)
+
+    print(f"{'ordenes':>10} {'estrategia':>12} {'round-trips':>12} {'segundos':>10}")
+    for size in sorted(args.sizes):
+        seed(connection, size, id_client, id_product, id_method)
+        strategies = [("single", single_query)]
+        if args.skip_n_plus_one_above is None or size <= args.skip_n_plus_one_above:
+            strategies.insert(0, ("n+1", n_plus_one))
+        for name, strategy in strategies:
+            count, trips, elapsed = measure(connection, strategy)
+            print(f"{count:>10} {name:>12} {trips:>12} {elapsed:>10.3f}")
+
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""Prueba de concurrencia de POST /orders: muchas ordenes al mismo SKU.
+
+Prepara un producto con un stock fijo en una sede, lanza en paralelo mas
+ordenes de las que alcanza el stock contra la api en ejecucion y revisa que
+no se haya vendido de mas:
+
+  - ordenes creadas (201) <= stock inicial
+  - stock final = stock inicial - unidades vendidas, y nunca negativo
+  - las lineas de orden guardadas coinciden con las respuestas 201
+  - el resumen stock_sedes coincide con inventario
+
+Con --product-updates N se envian ademas N cambios de precio del producto
+(PUT /products/{id}) mezclados con las ordenes, que bloquean el resumen de
+categorias (migraciones 009 y 011). Se revisa tambien que:
+
+  - ninguna peticion responda 500 (por ejemplo un deadlock, ORA-00060)
+  - resumen_categorias, despues de plegar su cola, coincide con un recalculo
+    de la categoria
+
+Termina con codigo 1 si alguna comprobacion falla. Requiere httpx
+(pip install httpx).
+
+Uso (desde la carpeta api, con la api corriendo):
+    python benchmarks/oversell_stress.py --stock 100 --orders 500 --concurrency 200
+    python benchmarks/oversell_stress.py --stock 100 --orders 500 --product-updates 200
+    python benchmarks/oversell_stress.py --cleanup
+"""
+import argparse
+import asyncio
+import collections
+import os
+import sys
+import time
+import httpx
+import oracledb
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import keys  # noqa: E402
+
+dsn = 'system/bases1@localhost:1521/XE'
+
+STRESS_DOCUMENT = 'STRESS0001'
+STRESS_SKU = 'STRESS-0001'
+STRESS_METHOD = 'STRESS'
+STRESS_CATEGORY = 1
+
+
+def fixture(connection, stock):
+    # Cliente con metodo de pago y un producto con `stock` unidades en una
+    # sede. Los datos de una corrida anterior se borran antes de crearlos.
+    cleanup(connection)
+    cursor = connection.cursor()
+
+    cursor.execute("SELECT MIN(id_site) FROM sedes")
+    id_location = cursor.fetchone()[0]
+    if id_location is None:
+        raise SystemExit("Se necesita al menos una sede")
+
+    id_client = keys.reserve_ids(cursor, "clientes", 1)[0]
+    id_product = keys.reserve_ids(cursor, "productos", 1)[0]
+    id_inventory = keys.reserve_ids(cursor, "inventario", 1)[0]
+    cursor.execute(
+        "SELECT COALESCE(MAX(id_payment_method), 0) + 1 FROM metodos_pago")
+    id_method = cursor.fetchone()[0]
+    cursor.execute(
+        "SELECT COALESCE(MAX(id_client_payment_methods), 0) + 1 FROM metodos_pago_cliente")
+    id_client_method = cursor.fetchone()[0]
+
+    cursor.execute(
+        """INSERT INTO clientes (id_client, national_document, name, lastname, password)
+           VALUES (:id, :doc, 'Stress', 'Orders', 'x')""",
+        {"id": id_client, "doc": STRESS_DOCUMENT}
+    )
+    cursor.execute(
+        """INSERT INTO productos (id_product, sku, name, description, price, slug, category_id, active)
+           VALUES (:id, :sku, 'Stress product', 'Producto de prueba de concurrencia', 10, 'stress-product', :category, 'TRUE')""",
+        {"id": id_product, "sku": STRESS_SKU, "category": STRESS_CATEGORY}
+    )
+    cursor.execute(
+        """INSERT INTO inventario (id_inventory, id_product, id_location, quantity)
+           VALUES (:id, :id_product, :id_location, :quantity)""",
+        {"id": id_inventory, "id_product": id_product,
+         "id_location": id_location, "quantity": stock}
+    )
+    cursor.execute(
+        "INSERT INTO metodos_pago (id_payment_method, payment_method) VALUES (:id, :m)",
+        {"id": id_method, "m": STRESS_METHOD}
+    )
+    cursor.execute(
+        """INSERT INTO metodos_pago_cliente (id_client_payment_methods, id_client, id_payment_method)
+           VALUES (:id, :id_client, :id_method)""",
+        {"id": id_client_method, "id_client": id_client, "id_method": id_method}
+    )
+    connection.commit()
+    cursor.close()
+    return id_client, id_product, id_location, id_method
+
+
+async def fire(url, orders, concurrency, payload, id_product, product_updates):
+    # Todas las peticiones se lanzan a la vez, el semaforo limita cuantas
+    # conexiones HTTP quedan abiertas al mismo tiempo. Los cambios de precio
+    # se intercalan con las ordenes
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        async def one():
+            async with semaphore:
+                response = await client.post("/orders", json=payload)
+                return response.status_code, response.json()
+
+        async def update(i):
+            async with semaphore:
+                response = await client.put(
+                    f"/products/{id_product}", json={"price": 10 + i % 5})
+                return response.status_code, response.json()
+
+        # Un cambio de precio cada `step` ordenes
+        step = max(1, orders // max(1, product_updates))
+        requests = []
+        for i in range(max(orders, product_updates * step)):
+            if i < orders:
+                requests.append(("order", one()))
+            if i % step == 0 and i // step < product_updates:
+                requests.append(("update", update(i // step)))
+        results = await asyncio.gather(*(request for _, request in requests))
+
+    kinds = [kind for kind, _ in requests]
+    order_results = [r for kind, r in zip(kinds, results) if kind == "order"]
+    update_results = [r for kind, r in zip(kinds, results) if kind == "update"]
+    return order_results, update_results
+
+
+def verify(connection, stock, id_client, id_product, id_location, quantity, results):
+    cursor = connection.cursor()
+    created = [body["id_order"] for status, body in results if status == 201]
+    sold = len(created) * quantity
+    failures = []
+
+    cursor.execute(
+        """SELECT COALESCE(SUM(quantity), 0) FROM inventario
+           WHERE id_product = :id_product AND id_location = :id_location""",
+        {"id_product": id_product, "id_location": id_location}
+    )
+    final = cursor.fetchone()[0]
+
+    cursor.execute(
+        """SELECT COUNT(DISTINCT o.id_order), COALESCE(SUM(op.quantity), 0)
+           FROM ordenes o
+           JOIN ordenes_productos op ON o.id_order = op.id_order
+           WHERE o.id_client = :id_client AND op.id_product = :id_product""",
+        {"id_client": id_client, "id_product": id_product}
+    )
+    stored_orders, stored_units = cursor.fetchone()
+
+    cursor.execute(
+        """SELECT quantity FROM stock_sedes
+           WHERE id_product = :id_product AND id_location = :id_location""",
+        {"id_product": id_product, "id_location": id_location}
+    )
+    row = cursor.fetchone()
+    summary = row[0] if row else None
+    cursor.close()
+
+    if sold > stock:
+        failures.append(f"se vendieron {sold} unidades con stock {stock}")
+    if final < 0:
+        failures.append(f"stock final negativo: {final}")
+    if final != stock - sold:
+        failures.append(f"stock final {final}, se esperaba {stock - sold}")
+    if stored_orders != len(created) or stored_units != sold:
+        failures.append(
+            f"{stored_orders} ordenes / {stored_units} unidades guardadas, "
+            f"{len(created)} / {sold} respondidas")
+    if summary != final:
+        failures.append(f"stock_sedes tiene {summary}, inventario {final}")
+    if stock >= quantity and not created:
+        failures.append("no se creo ninguna orden")
+
+    return final, failures
+
+
+def verify_categories(connection):
+    # Pliega la cola del resumen (lo mismo que hace el job cada minuto) y lo
+    # compara con un recalculo de la categoria del producto de prueba
+    cursor = connection.cursor()
+    cursor.callproc("plegar_resumen_categorias")
+    cursor.execute(
+        """SELECT active_products, in_stock_products, min_price, max_price
+           FROM resumen_categorias WHERE id_category = :id""",
+        {"id": STRESS_CATEGORY}
+    )
+    summary = cursor.fetchone()
+    cursor.execute(
+        """SELECT COUNT(*), COUNT(CASE WHEN s.quantity > 0 THEN 1 END),
+                  MIN(p.price), MAX(p.price)
+           FROM productos p
+           LEFT JOIN stock_productos s ON p.id_product = s.id_product
+           WHERE p.category_id = :id AND p.active = 'TRUE'""",
+        {"id": STRESS_CATEGORY}
+    )
+    expected = cursor.fetchone()
+    cursor.close()
+
+    if summary != expected:
+        return [f"resumen_categorias tiene {summary}, recalculo {expected}"]
+    return []
+
+
+def cleanup(connection):
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT id_client FROM clientes WHERE national_document = :doc",
+        {"doc": STRESS_DOCUMENT}
+    )
+    row = cursor.fetchone()
+    if row:
+        params = {"id": row[0]}
+        orders = "SELECT id_order FROM ordenes WHERE id_client = :id"
+        cursor.execute(
+            f"DELETE FROM ordenes_productos WHERE id_order IN ({orders})", params)
+        cursor.execute(
+            f"DELETE FROM pagos_ordenes WHERE id_order IN ({orders})", params)
+        cursor.execute("DELETE FROM ordenes WHERE id_client = :id", params)
+        cursor.execute(
+            "DELETE FROM metodos_pago_cliente WHERE id_client = :id", params)
+        cursor.execute("DELETE FROM clientes WHERE id_client = :id", params)
+    cursor.execute(
+        """DELETE FROM inventario WHERE id_product IN (
+               SELECT id_product FROM productos WHERE sku = :sku)""",
+        {"sku": STRESS_SKU}
+    )
+    cursor.execute("DELETE FROM productos WHERE sku = :sku", {"sku": STRESS_SKU})
+    cursor.execute("DELETE FROM metodos_pago WHERE payment_method = :m",
+                   {"m": STRESS_METHOD})
+    connection.commit()
+    cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--stock", type=int, default=100)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--quantity", type=int, default=1,
+                        help="unidades por orden")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--product-updates", type=int, default=0,
+                        help="cambios de precio del producto durante las ordenes")
+    parser.add_argument("--cleanup", action="store_true",
+                        help="borrar los datos de prueba y salir")
+    args = parser.parse_args()
+
+    connection = oracledb.connect(dsn)
+
+    if args.cleanup:
+        cleanup(connection)
+        connection.close()
+        return
+
+    id_client, id_product, id_location, id_method = fixture(
+        connection, args.stock)
+    payload = {
+        "id_client": id_client,
+        "id_location": id_location,
+        "id_payment_method": id_method,
+        "items": [{"id_product": id_product, "quantity": args.quantity}]
+    }
+
+    start = time.perf_counter()
+    results, updates = asyncio.run(
+        fire(args.url, args.orders, args.concurrency, payload,
+             id_product, args.product_updates))
+    elapsed = time.perf_counter() - start
+
+    statuses = collections.Counter(status for status, _ in results)
+    update_statuses = collections.Counter(status for status, _ in updates)
+    final, failures = verify(connection, args.stock, id_client, id_product,
+                             id_location, args.quantity, results)
+    if statuses[500]:
+        failures.append(f"{statuses[500]} ordenes respondieron 500")
+    if args.product_updates:
+        if update_statuses[200] != args.product_updates:
+            failures.append(
+                f"{args.product_updates - update_statuses[200]} cambios de producto fallaron")
+        failures.extend(verify_categories(connection))
+    connection.close()
+
+    print(f"{args.orders} ordenes en {elapsed:.2f}s ({args.orders / elapsed:.0f}/s)")
+    print("respuestas: " + ", ".join(
+        f"{status}={count}" for status, count in sorted(statuses.items())))
+    if args.product_updates:
+        print("cambios de producto: " + ", ".join(
+            f"{status}={count}" for status, count in sorted(update_statuses.items())))
+    print(f"stock inicial {args.stock}, final {final}")
+
+    for failure in failures:
+        print(f"FALLA    {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK       sin sobreventa")
+
+
+if __name__ == "__main__":
+    main()
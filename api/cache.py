@@ -0,0 +1,84 @@
+import os
+import time
+from collections import OrderedDict
+
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "1024"))
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "30"))
+
+# Rango de id_product que cubre una pagina de /products: (despues_de, hasta].
+# La ultima pagina no tiene limite superior.
+NO_LIMIT = float("inf")
+
+
+class TTLCache:
+    # Cache LRU con expiracion. Cada entrada guarda el rango de productos
+    # que contiene para poder invalidar solo lo que cambia.
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        # Cambia en cada invalidacion. Una lectura que empezo antes de una
+        # invalidacion no guarda su resultado (podria ser viejo).
+        self.generation = 0
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0
+        }
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+
+        value, product_range, expires_at = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            self.stats["expirations"] += 1
+            self.stats["misses"] += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return value
+
+    def set(self, key, value, product_range, generation):
+        if generation != self.generation:
+            return
+        self.entries[key] = (value, product_range,
+                             time.monotonic() + self.ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def invalidate_products(self, product_ids):
+        # Borra las entradas cuyo rango contiene alguno de los productos
+        self.generation += 1
+        product_ids = list(product_ids)
+        stale = [
+            key for key, (_, (after, last), _) in self.entries.items()
+            if any(after < id_product <= last for id_product in product_ids)
+        ]
+        for key in stale:
+            del self.entries[key]
+        self.stats["invalidations"] += len(stale)
+
+    def clear(self):
+        self.generation += 1
+        self.entries.clear()
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl
+        }
+
+
+catalog = TTLCache(CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL)
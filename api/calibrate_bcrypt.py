@@ -0,0 +1,61 @@
+"""Elige el costo de bcrypt (PASSWORD_ROUNDS) para este equipo.
+
+Mide cuanto tarda una verificacion con cada costo y recomienda el mayor cuyo
+tiempo (mediana) no pasa del objetivo. Cada costo extra duplica el tiempo,
+asi que la medicion se detiene en el primer costo que supera el objetivo.
+Correr en el mismo tipo de equipo donde corre la api.
+
+Uso (desde la carpeta api):
+    python calibrate_bcrypt.py --target-ms 100
+    python calibrate_bcrypt.py --target-ms 250 --samples 9
+"""
+import argparse
+import statistics
+import time
+import passwords
+
+MIN_ROUNDS = 4
+MAX_ROUNDS = 16
+PASSWORD = "calibracion-Contraseña1"
+
+
+def verify_time(rounds, samples):
+    # Mediana en milisegundos de verificar un hash de ese costo
+    context = passwords.make_context(rounds)
+    hashed = context.hash(PASSWORD)
+    times = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        context.verify(PASSWORD, hashed)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target-ms", type=float, default=100,
+                        help="tiempo maximo de una verificacion")
+    parser.add_argument("--samples", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'costo':>6} {'ms':>10}")
+    chosen = None
+    for rounds in range(MIN_ROUNDS, MAX_ROUNDS + 1):
+        elapsed = verify_time(rounds, args.samples)
+        print(f"{rounds:>6} {elapsed:>10.1f}")
+        if elapsed > args.target_ms:
+            break
+        chosen = rounds
+
+    if chosen is None:
+        print(f"Ningun costo cumple {args.target_ms} ms, use PASSWORD_ROUNDS={MIN_ROUNDS}")
+        return
+
+    print(f"PASSWORD_ROUNDS={chosen}")
+    if chosen < passwords.PASSWORD_ROUNDS:
+        print(f"Menor que el costo actual ({passwords.PASSWORD_ROUNDS}): para "
+              f"bajar tambien los hashes existentes use PASSWORD_MAX_ROUNDS={chosen}")
+
+
+if __name__ == "__main__":
+    main()
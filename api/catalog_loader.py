@@ -0,0 +1,399 @@
+"""Carga masiva del catalogo (productos, inventario e imagenes) desde CSV o NDJSON.
+
+El archivo se lee por partes y se corta en bloques de CATALOG_CHUNK_SIZE
+filas. Cada bloque se procesa en un proceso de un pool (CATALOG_WORKERS),
+con su propia conexion: valida las filas, resuelve las categorias por nombre
+con una consulta y escribe productos, inventario e imagenes con executemany
+en una transaccion. Las filas con error (SKU repetido, categoria que no
+existe, campos invalidos) se reportan y no detienen la carga.
+
+CSV: encabezado con sku, name, description, price, slug, category_id o
+category (nombre), active (opcional, TRUE por defecto), inventory
+("sede:cantidad|sede:cantidad") e images ("url|url").
+NDJSON: un producto por linea con los mismos campos; inventory es una lista
+de {"id_location", "quantity"} e images una lista de urls.
+
+Uso (desde la carpeta api):
+    python catalog_loader.py catalogo.csv --workers 4
+    python catalog_loader.py catalogo.ndjson --chunk-size 2000
+"""
+import argparse
+import asyncio
+import codecs
+import csv
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import oracledb
+import keys
+import repository
+import statements
+
+# Filas por bloque (una transaccion y un executemany por tabla)
+CATALOG_CHUNK_SIZE = int(os.getenv("CATALOG_CHUNK_SIZE", "1000"))
+# Procesos que escriben bloques en paralelo
+CATALOG_WORKERS = int(os.getenv("CATALOG_WORKERS", str(os.cpu_count() or 1)))
+# Errores que se incluyen en el reporte (el conteo incluye todos)
+CATALOG_MAX_ERRORS = int(os.getenv("CATALOG_MAX_ERRORS", "1000"))
+
+REQUIRED_FIELDS = ["sku", "name", "description", "price", "slug"]
+
+READ_SIZE = 1 << 20
+
+
+class Splitter:
+    # Corta el texto en registros completos: uno por linea, salvo los saltos
+    # de linea dentro de comillas en CSV (las comillas escapadas van
+    # dobladas, asi que la paridad indica si el campo sigue abierto)
+
+    def __init__(self, quoted):
+        self.quoted = quoted
+        self.buffer = ""
+        self.pending = []
+        self.open = False
+
+    def feed(self, text):
+        lines = (self.buffer + text).split("\n")
+        self.buffer = lines.pop()
+        records = []
+        for line in lines:
+            self.pending.append(line)
+            if self.quoted and line.count('"') % 2:
+                self.open = not self.open
+            if not self.open:
+                records.append("\n".join(self.pending))
+                self.pending = []
+        return records
+
+    def finish(self):
+        records = self.feed("\n") if self.buffer else []
+        if self.pending:
+            records.append("\n".join(self.pending))
+            self.pending = []
+        return records
+
+
+def parse_header(record):
+    header = [name.strip().lower() for name in next(csv.reader([record]))]
+    missing = [name for name in REQUIRED_FIELDS if name not in header]
+    if "category_id" not in header and "category" not in header:
+        missing.append("category_id o category")
+    if missing:
+        raise ValueError(f"Faltan columnas en el encabezado: {', '.join(missing)}")
+    return header
+
+
+def parse_record(kind, header, record):
+    # Registro de texto -> diccionario con los campos del producto
+    if kind == "ndjson":
+        raw = json.loads(record)
+        if not isinstance(raw, dict):
+            raise ValueError("Cada linea debe ser un objeto JSON")
+        return raw
+
+    raw = dict(zip(header, next(csv.reader([record]))))
+    inventory = []
+    for pair in (raw.get("inventory") or "").split("|"):
+        if pair.strip():
+            location, _, quantity = pair.partition(":")
+            inventory.append({"id_location": location, "quantity": quantity or 0})
+    raw["inventory"] = inventory
+    raw["images"] = [url.strip() for url in (raw.get("images") or "").split("|") if url.strip()]
+    return raw
+
+
+def normalize(raw):
+    # Producto listo para insertar; ValueError con el motivo si no es valido
+    missing = [name for name in REQUIRED_FIELDS if raw.get(name) in (None, "")]
+    if raw.get("category_id") in (None, "") and not raw.get("category"):
+        missing.append("category_id o category")
+    if missing:
+        raise ValueError(f"Faltan campos requeridos: {', '.join(missing)}")
+
+    active = str(raw.get("active") or "TRUE").upper()
+    if active not in ["TRUE", "FALSE"]:
+        raise ValueError("El campo active debe ser 'TRUE' o 'FALSE'")
+
+    try:
+        product = {
+            "sku": str(raw["sku"]),
+            "name": str(raw["name"]),
+            "description": str(raw["description"]),
+            "price": int(raw["price"]),
+            "slug": str(raw["slug"]),
+            "category_id": int(raw["category_id"]) if raw.get("category_id") not in (None, "") else None,
+            "active": active
+        }
+        inventory = [(int(item["id_location"]), int(item["quantity"]))
+                     for item in raw.get("inventory") or []]
+    except (TypeError, KeyError, ValueError) as e:
+        raise ValueError(f"Valor invalido: {str(e)}")
+
+    images = raw.get("images") or []
+    if not isinstance(images, list):
+        raise ValueError("images debe ser una lista de urls")
+
+    return {
+        "product": product,
+        "category": None if product["category_id"] is not None else str(raw["category"]).strip().lower(),
+        "inventory": inventory,
+        "images": [str(url) for url in images]
+    }
+
+
+# ---- Trabajo de cada proceso ----
+
+# Conexion y categorias conocidas del proceso, se reutilizan entre bloques
+_connection = None
+_categories = {}
+
+
+def worker_connection():
+    global _connection
+    if _connection is None:
+        _connection = oracledb.connect(repository.dsn)
+    return _connection
+
+
+def resolve_categories(connection, cursor, names):
+    # Las que el proceso no conoce se buscan todas en una consulta
+    unknown = [name for name in names if name not in _categories]
+    if unknown:
+        values = connection.gettype("SYS.ODCIVARCHAR2LIST").newobject()
+        values.extend(unknown)
+        cursor.execute(statements.CATEGORIES_BY_NAME, {"names": values})
+        for id_category, name in cursor.fetchall():
+            _categories[name] = id_category
+
+
+def batch_errors(cursor, duplicate=None):
+    # offset -> mensaje de los errores de un executemany con batcherrors.
+    # duplicate: mensaje para las llaves unicas repetidas (ORA-00001)
+    errors = {}
+    for error in cursor.getbatcherrors():
+        message = error.message
+        if duplicate and "ORA-00001" in message:
+            message = duplicate
+        errors[error.offset] = message
+    return errors
+
+
+def load_chunk(kind, header, first_row, records):
+    # Escribe un bloque en una transaccion. Devuelve los conteos, los
+    # errores por fila y los ids de los productos creados
+    result = {"rows": len(records), "products": 0, "inventory": 0, "images": 0,
+              "errors": [], "product_ids": []}
+
+    valid = []
+    for number, record in enumerate(records, first_row):
+        try:
+            valid.append((number, normalize(parse_record(kind, header, record))))
+        except ValueError as e:
+            result["errors"].append({"row": number, "detail": str(e)})
+
+    connection = worker_connection()
+    cursor = connection.cursor()
+    try:
+        resolve_categories(connection, cursor, {
+            row["category"] for _, row in valid if row["category"] is not None})
+        rows = []
+        for number, row in valid:
+            if row["category"] is not None:
+                if row["category"] not in _categories:
+                    result["errors"].append(
+                        {"row": number, "detail": f"Categoria no encontrada: {row['category']}"})
+                    continue
+                row["product"]["category_id"] = _categories[row["category"]]
+            rows.append((number, row))
+
+        # Productos: los que fallan (SKU repetido, valores muy largos) no
+        # llevan inventario ni imagenes
+        product_ids = keys.reserve_ids(cursor, "productos", len(rows))
+        cursor.executemany(
+            statements.INSERT_PRODUCT,
+            [{"id": id, **row["product"]} for id, (_, row) in zip(product_ids, rows)],
+            batcherrors=True
+        )
+        failed = batch_errors(cursor, "El SKU ya está registrado")
+        created = []
+        for offset, (id, (number, row)) in enumerate(zip(product_ids, rows)):
+            if offset in failed:
+                result["errors"].append({"row": number, "detail": failed[offset]})
+            else:
+                created.append((id, number, row))
+
+        inventory = [(number, {"id": id, "id_location": location, "quantity": quantity})
+                     for id, number, row in created for location, quantity in row["inventory"]]
+        images = [(number, {"id": id, "image": url})
+                  for id, number, row in created for url in row["images"]]
+
+        for table, name, sql, lines, duplicate in [
+                ("inventario", "inventory", statements.INSERT_INVENTORY, inventory,
+                 "la sede aparece mas de una vez para el producto"),
+                ("imagenes", "images", statements.INSERT_IMAGE, images, None)]:
+            if not lines:
+                continue
+            ids = keys.reserve_ids(cursor, table, len(lines))
+            cursor.executemany(
+                sql,
+                [{"new_id": new_id, **params} for new_id, (_, params) in zip(ids, lines)],
+                batcherrors=True
+            )
+            errors = batch_errors(cursor, duplicate)
+            for offset, message in errors.items():
+                result["errors"].append(
+                    {"row": lines[offset][0], "detail": f"{table}: {message}"})
+            result[name] = len(lines) - len(errors)
+
+        if created:
+            cursor.execute(statements.BUMP_CATALOG_VERSION)
+        connection.commit()
+        result["products"] = len(created)
+        result["product_ids"] = [id for id, _, _ in created]
+    except Exception as e:
+        connection.rollback()
+        result.update(products=0, inventory=0, images=0, product_ids=[])
+        result["errors"] = [{
+            "row": first_row,
+            "detail": f"Error en el bloque de {len(records)} filas: {str(e)}"
+        }]
+    finally:
+        cursor.close()
+
+    result["errors"].sort(key=lambda error: error["row"])
+    return result
+
+
+# ---- Proceso principal ----
+
+_executor = None
+
+
+def executor():
+    # Pool de procesos de la api, se crea en la primera carga. spawn: los
+    # procesos no heredan el event loop ni las conexiones del proceso padre
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=CATALOG_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def load(kind, blocks, chunk_size=CATALOG_CHUNK_SIZE, pool=None,
+               workers=CATALOG_WORKERS, on_chunk=None):
+    # blocks: iterador asincrono de bytes (el cuerpo de la peticion o el
+    # archivo). Como maximo dos bloques por proceso esperan en el pool, asi
+    # la memoria no depende del tamaño del archivo
+    loop = asyncio.get_running_loop()
+    pool = pool or executor()
+    splitter = Splitter(quoted=kind == "csv")
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    summary = {"rows": 0, "products": 0, "inventory": 0, "images": 0,
+               "failed": 0, "errors": []}
+    header = None
+    row = 0
+    chunk = []
+    running = set()
+    started_at = time.perf_counter()
+
+    def collect(done):
+        for future in done:
+            result = future.result()
+            for name in ["rows", "products", "inventory", "images"]:
+                summary[name] += result[name]
+            summary["failed"] += result["rows"] - result["products"]
+            room = CATALOG_MAX_ERRORS - len(summary["errors"])
+            summary["errors"].extend(result["errors"][:max(0, room)])
+            if on_chunk is not None:
+                on_chunk(result)
+
+    async def submit():
+        nonlocal chunk, running
+        if len(running) >= 2 * workers:
+            done, running = await asyncio.wait(
+                running, return_when=asyncio.FIRST_COMPLETED)
+            collect(done)
+        running.add(loop.run_in_executor(
+            pool, load_chunk, kind, header, row - len(chunk) + 1, chunk))
+        chunk = []
+
+    async def records():
+        async for block in blocks:
+            for record in splitter.feed(decoder.decode(block)):
+                yield record
+        for record in splitter.feed(decoder.decode(b"", final=True)) + splitter.finish():
+            yield record
+
+    async for record in records():
+        if not record.strip():
+            continue
+        if kind == "csv" and header is None:
+            header = parse_header(record)
+            continue
+        row += 1
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            await submit()
+
+    if chunk:
+        await submit()
+    if running:
+        collect((await asyncio.wait(running))[0])
+
+    seconds = time.perf_counter() - started_at
+    summary["seconds"] = round(seconds, 3)
+    summary["rows_per_second"] = round(summary["rows"] / seconds, 1) if seconds else 0
+    summary["errors"].sort(key=lambda error: error["row"])
+    return summary
+
+
+def detect_kind(path):
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+async def read_file(path):
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(READ_SIZE)
+            if not block:
+                return
+            yield block
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "ndjson"], default=None,
+                        help="por defecto segun la extension del archivo")
+    parser.add_argument("--workers", type=int, default=CATALOG_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=CATALOG_CHUNK_SIZE)
+    parser.add_argument("--show-errors", type=int, default=20)
+    args = parser.parse_args()
+
+    kind = args.format or detect_kind(args.path)
+    with ProcessPoolExecutor(max_workers=args.workers,
+                             mp_context=multiprocessing.get_context("spawn")) as pool:
+        summary = asyncio.run(load(kind, read_file(args.path), args.chunk_size,
+                                   pool, args.workers))
+
+    print(f"{summary['rows']} filas en {summary['seconds']:.1f}s "
+          f"({summary['rows_per_second']:.0f} filas/s, {args.workers} procesos)")
+    print(f"productos {summary['products']}, inventario {summary['inventory']}, "
+          f"imagenes {summary['images']}, filas con error {summary['failed']}")
+    for error in summary["errors"][:args.show_errors]:
+        print(f"fila {error['row']}: {error['detail']}")
+
+
+if __name__ == "__main__":
+    main()
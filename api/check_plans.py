@@ -0,0 +1,179 @@
+"""Revisa con EXPLAIN PLAN cada sentencia SQL de la api y falla si alguna
+hace un full scan de una tabla del esquema.
+
+Las sentencias se extraen de los literales de texto (incluidos f-strings) de
+los modulos indicados. En los f-strings cada expresion se reemplaza por un
+valor de ejemplo de SAMPLES. Una sentencia puede permitir el full scan con el
+comentario /* full_scan_ok */ (por ejemplo las exportaciones de tablas
+completas). Las tablas de SMALL_TABLES siempre se permiten.
+
+Con una base vacia el optimizador elige full scan en todo; --assume-rows
+asigna estadisticas falsas a las tablas mientras corre la revision y despues
+restaura las originales.
+
+Uso (desde la carpeta api):
+    python check_plans.py
+    python check_plans.py --assume-rows 1000000 api.py statements.py
+"""
+import argparse
+import ast
+import os
+import re
+import sys
+import oracledb
+
+dsn = 'system/bases1@localhost:1521/XE'
+
+DEFAULT_FILES = ["api.py", "keys.py", "statements.py", "repository.py"]
+
+SQL_START = re.compile(r"\s*(SELECT|INSERT|UPDATE|DELETE|WITH|MERGE)\b", re.IGNORECASE)
+
+FULL_SCAN_OK = "/* full_scan_ok"
+
+# Tablas de catalogo con pocas filas (y el resumen, una fila por categoria,
+# con su cola que se vacia cada minuto), un full scan es lo mas barato
+SMALL_TABLES = {"METODOS_PAGO", "SEDES", "CATEGORIAS", "DEPARTAMENTOS",
+                "RESUMEN_CATEGORIAS", "RESUMEN_CATEGORIAS_STOCK"}
+
+# Valor de ejemplo para cada expresion de los f-strings
+SAMPLES = {
+    "sequence": "seq_clientes",
+    "SEQUENCES[table]": "seq_clientes",
+    "stock_join": "LEFT JOIN stock_productos s ON p.id_product = s.id_product",
+    "' AND '.join(conditions)": "1 = 1",
+    "where": "",
+    "top": "",
+}
+
+STATS_TABLE = "PLAN_CHECK_STATS"
+
+
+def render(node):
+    # Texto del literal, con los valores de ejemplo en los f-strings
+    if isinstance(node, ast.Constant):
+        return node.value
+    parts = []
+    for value in node.values:
+        if isinstance(value, ast.Constant):
+            parts.append(value.value)
+        else:
+            parts.append(SAMPLES.get(ast.unparse(value.value), ""))
+    return "".join(parts)
+
+
+def extract_statements(path):
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+
+    # Las partes de un f-string tambien son Constant, no se revisan solas
+    inner = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.JoinedStr):
+            inner.update(id(value) for value in node.values)
+
+    statements = []
+    for node in ast.walk(tree):
+        if id(node) in inner:
+            continue
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            text = node.value
+        elif isinstance(node, ast.JoinedStr):
+            text = render(node)
+        else:
+            continue
+        if SQL_START.match(text):
+            statements.append((f"{os.path.basename(path)}:{node.lineno}", text))
+    return sorted(statements, key=lambda s: int(s[0].split(":")[1]))
+
+
+def assume_rows(cursor, rows):
+    # Guardar las estadisticas actuales y asignar numrows falsos
+    cursor.execute(
+        "BEGIN DBMS_STATS.CREATE_STAT_TABLE(USER, :t); END;", {"t": STATS_TABLE})
+    cursor.execute(
+        "BEGIN DBMS_STATS.EXPORT_SCHEMA_STATS(USER, :t); END;", {"t": STATS_TABLE})
+    cursor.execute(
+        "SELECT table_name FROM user_tables WHERE table_name <> :t", {"t": STATS_TABLE})
+    for (table,) in cursor.fetchall():
+        cursor.execute(
+            """BEGIN
+                   DBMS_STATS.SET_TABLE_STATS(USER, :tab, numrows => :n,
+                       numblks => :b, no_invalidate => FALSE);
+               END;""",
+            {"tab": table, "n": rows, "b": max(1, rows // 50)}
+        )
+
+
+def restore_stats(cursor):
+    cursor.execute("BEGIN DBMS_STATS.DELETE_SCHEMA_STATS(USER); END;")
+    cursor.execute(
+        "BEGIN DBMS_STATS.IMPORT_SCHEMA_STATS(USER, :t); END;", {"t": STATS_TABLE})
+    cursor.execute(
+        "BEGIN DBMS_STATS.DROP_STAT_TABLE(USER, :t); END;", {"t": STATS_TABLE})
+
+
+def full_scans(cursor, statement_id, sql):
+    cursor.execute(f"EXPLAIN PLAN SET STATEMENT_ID = '{statement_id}' FOR {sql}")
+    cursor.execute(
+        """
+        SELECT object_name
+        FROM plan_table
+        WHERE statement_id = :id
+        AND operation = 'TABLE ACCESS'
+        AND options LIKE '%FULL%'
+        AND object_owner = USER
+        """,
+        {"id": statement_id}
+    )
+    tables = [row[0] for row in cursor.fetchall()]
+    cursor.execute("DELETE FROM plan_table WHERE statement_id = :id",
+                   {"id": statement_id})
+    return [table for table in tables if table not in SMALL_TABLES]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", default=DEFAULT_FILES)
+    parser.add_argument("--assume-rows", type=int, default=None,
+                        help="numero de filas falso para todas las tablas")
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    statements = []
+    for name in args.files:
+        statements.extend(extract_statements(os.path.join(here, name)))
+
+    connection = oracledb.connect(dsn)
+    cursor = connection.cursor()
+    failures = 0
+
+    try:
+        if args.assume_rows:
+            assume_rows(cursor, args.assume_rows)
+
+        for number, (location, sql) in enumerate(statements):
+            try:
+                tables = full_scans(cursor, f"check_{number}", sql)
+            except oracledb.Error as e:
+                failures += 1
+                print(f"ERROR    {location}: {str(e).splitlines()[0]}")
+                continue
+
+            if tables and FULL_SCAN_OK not in sql:
+                failures += 1
+                print(f"FULL     {location}: {', '.join(tables)}")
+            else:
+                print(f"OK       {location}")
+    finally:
+        if args.assume_rows:
+            restore_stats(cursor)
+        connection.rollback()
+        cursor.close()
+        connection.close()
+
+    print(f"{len(statements)} sentencias, {failures} con problemas")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import hashlib
+from datetime import datetime
+from datetime import timezone
+from email.utils import format_datetime
+from email.utils import parsedate_to_datetime
+from fastapi import Response
+
+# Las fechas de la base (SYSDATE) se consideran UTC
+
+
+def make_etag(*parts):
+    # ETag a partir de la version de la fila (updated_at y ORA_ROWSCN)
+    raw = ":".join(str(part) for part in parts)
+    return '"' + hashlib.sha1(raw.encode()).hexdigest()[:20] + '"'
+
+
+def parse_db_date(value):
+    # 'YYYY-MM-DD HH24:MI:SS' -> datetime en UTC
+    if value is None:
+        return None
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+
+
+def headers(etag, last_modified):
+    result = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        result["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return result
+
+
+def not_modified(request, etag, last_modified):
+    # If-None-Match tiene prioridad sobre If-Modified-Since
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified <= since
+
+    return False
+
+
+def not_modified_response(etag, last_modified):
+    return Response(status_code=304, headers=headers(etag, last_modified))
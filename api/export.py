@@ -0,0 +1,52 @@
+import csv
+import io
+import json
+import os
+
+# Filas por round-trip al exportar (arraysize y prefetchrows del cursor)
+EXPORT_ARRAYSIZE = int(os.getenv("EXPORT_ARRAYSIZE", "5000"))
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv"
+}
+
+
+def _ndjson_lines(columns, rows):
+    return "".join(
+        json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in rows
+    )
+
+
+def _csv_lines(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+async def stream_query(connection, sql, params, export_format, release):
+    # Generador para StreamingResponse: se lee y se escribe un bloque
+    # de filas a la vez, la memoria no depende del tamaño de la tabla.
+    # Corre despues de que el endpoint retorna: la conexion la toma el
+    # endpoint y release la devuelve al pool al terminar el stream.
+    cursor = connection.cursor()
+    try:
+        cursor.arraysize = EXPORT_ARRAYSIZE
+        cursor.prefetchrows = EXPORT_ARRAYSIZE
+        await cursor.execute(sql, params)
+        columns = [col[0].lower() for col in cursor.description]
+
+        if export_format == "csv":
+            yield _csv_lines([columns])
+
+        while True:
+            rows = await cursor.fetchmany()
+            if not rows:
+                break
+            if export_format == "csv":
+                yield _csv_lines(rows)
+            else:
+                yield _ndjson_lines(columns, rows)
+    finally:
+        cursor.close()
+        await release()
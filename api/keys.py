@@ -0,0 +1,79 @@
+import asyncio
+import repository
+
+# Debe coincidir con el INCREMENT BY de las secuencias en console.sql:
+# cada NEXTVAL reserva un bloque de ids que se reparte en memoria
+KEY_BLOCK_SIZE = 20
+
+# tabla -> secuencia que genera su llave primaria
+SEQUENCES = {
+    "clientes": "seq_clientes",
+    "informacion_contacto_clientes": "seq_informacion_contacto_clientes",
+    "productos": "seq_productos",
+    "inventario": "seq_inventario",
+    "ordenes": "seq_ordenes",
+    "ordenes_productos": "seq_ordenes_productos",
+    "pagos_ordenes": "seq_pagos_ordenes",
+    "pagos": "seq_pagos",
+    # migracion 007
+    "imagenes": "seq_imagenes"
+}
+
+
+class KeyAllocator:
+    # Reparte ids de un bloque reservado con una sola llamada a la base
+    # (un NEXTVAL en Oracle, repository.db.reserve_key_block)
+
+    def __init__(self, table, sequence, block_size=KEY_BLOCK_SIZE):
+        self.table = table
+        self.sequence = sequence
+        self.block_size = block_size
+        self._next = 0
+        self._last = -1
+        self._lock = asyncio.Lock()
+
+    async def _reserve_block(self, connection):
+        start = await repository.db.reserve_key_block(
+            connection, self.table, self.sequence, self.block_size)
+        self._next = start
+        self._last = start + self.block_size - 1
+
+    async def next_ids(self, connection, count):
+        ids = []
+        async with self._lock:
+            while len(ids) < count:
+                if self._next > self._last:
+                    await self._reserve_block(connection)
+                take = min(count - len(ids), self._last - self._next + 1)
+                ids.extend(range(self._next, self._next + take))
+                self._next += take
+        return ids
+
+    async def next_id(self, connection):
+        return (await self.next_ids(connection, 1))[0]
+
+
+allocators = {table: KeyAllocator(table, seq) for table, seq in SEQUENCES.items()}
+
+
+async def next_id(connection, table):
+    return await allocators[table].next_id(connection)
+
+
+async def next_ids(connection, table, count):
+    return await allocators[table].next_ids(connection, count)
+
+
+def reserve_ids(cursor, table, count):
+    # Para scripts y procesos con una conexion sincrona (cargas masivas):
+    # count ids de la secuencia de la tabla en un solo round-trip, un bloque
+    # por cada NEXTVAL
+    if count == 0:
+        return []
+    blocks = -(-count // KEY_BLOCK_SIZE)
+    cursor.execute(
+        f"SELECT {SEQUENCES[table]}.NEXTVAL FROM dual CONNECT BY LEVEL <= :blocks",
+        {"blocks": blocks}
+    )
+    starts = [row[0] for row in cursor.fetchall()]
+    return [start + i for start in starts for i in range(KEY_BLOCK_SIZE)][:count]
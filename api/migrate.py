@@ -0,0 +1,115 @@
+"""Aplica las migraciones de la carpeta migrations/ que aun no se han aplicado.
+
+Cada archivo NNN_descripcion.sql es una version. Las versiones aplicadas se
+guardan en la tabla schema_migrations.
+
+Uso (desde la carpeta api):
+    python migrate.py            # aplicar las pendientes
+    python migrate.py --status   # ver que versiones faltan
+"""
+import argparse
+import os
+import oracledb
+
+dsn = 'system/bases1@localhost:1521/XE'
+
+MIGRATIONS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "migrations")
+
+
+def split_statements(sql):
+    # Sentencias terminadas en ';' y bloques PL/SQL terminados en '/'
+    statements = []
+    current = []
+    in_block = False
+
+    for line in sql.splitlines():
+        stripped = line.strip()
+        if not current and (not stripped or stripped.startswith("--")):
+            continue
+
+        if not current and stripped.upper().startswith(("DECLARE", "BEGIN", "CREATE OR REPLACE")):
+            in_block = True
+
+        if in_block:
+            if stripped == "/":
+                statements.append("\n".join(current))
+                current = []
+                in_block = False
+            else:
+                current.append(line)
+            continue
+
+        current.append(line)
+        if stripped.endswith(";"):
+            statements.append("\n".join(current).rstrip().rstrip(";"))
+            current = []
+
+    if current:
+        statements.append("\n".join(current))
+    return statements
+
+
+def migration_files():
+    return sorted(
+        name for name in os.listdir(MIGRATIONS_DIR) if name.endswith(".sql"))
+
+
+def applied_versions(cursor):
+    cursor.execute("""
+        SELECT COUNT(*) FROM user_tables WHERE table_name = 'SCHEMA_MIGRATIONS'
+    """)
+    if cursor.fetchone()[0] == 0:
+        cursor.execute("""
+            CREATE TABLE schema_migrations (
+                version VARCHAR2(100) NOT NULL,
+                CONSTRAINT pk_schema_migrations PRIMARY KEY (version),
+                applied_at DATE DEFAULT SYSDATE
+            )
+        """)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--status", action="store_true",
+                        help="solo mostrar las versiones pendientes")
+    args = parser.parse_args()
+
+    connection = oracledb.connect(dsn)
+    cursor = connection.cursor()
+
+    try:
+        applied = applied_versions(cursor)
+        pending = [name for name in migration_files()
+                   if name[:-4] not in applied]
+
+        if args.status or not pending:
+            for name in migration_files():
+                state = "pendiente" if name in pending else "aplicada"
+                print(f"{name[:-4]}: {state}")
+            return
+
+        for name in pending:
+            with open(os.path.join(MIGRATIONS_DIR, name)) as f:
+                statements = split_statements(f.read())
+
+            print(f"Aplicando {name} ({len(statements)} sentencias)")
+            # DDL hace commit implicito: si una sentencia falla la version
+            # queda sin registrar y se debe corregir a mano antes de reintentar
+            for statement in statements:
+                cursor.execute(statement)
+
+            cursor.execute(
+                "INSERT INTO schema_migrations (version) VALUES (:version)",
+                {"version": name[:-4]}
+            )
+            connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
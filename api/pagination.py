@@ -0,0 +1,56 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def page_size(limit):
+    # Limitar el tamaño de pagina entre 1 y MAX_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(values):
+    # El cursor es opaco para el cliente: json en base64
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(values, dict):
+            raise ValueError
+        return values
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="Cursor de paginacion invalido"
+        )
+
+
+def parse_date(value, field):
+    # Fechas de los filtros en formato YYYY-MM-DD
+    if value is None:
+        return None
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El campo {field} debe tener el formato YYYY-MM-DD"
+        )
+    return value
+
+
+def next_cursor(rows, limit, key):
+    # Se piden limit + 1 filas: si sobra una, hay otra pagina
+    if len(rows) <= limit:
+        return None
+    del rows[limit:]
+    return encode_cursor(key(rows[-1]))
@@ -0,0 +1,123 @@
+"""Reporte de parses por sentencia a partir de v$sql.
+
+Para cada sentencia del registro (statements.py) muestra ejecuciones, parse
+calls, hard parses (loads) y cursores hijos. Con el cache de sentencias del
+driver una sentencia se parsea una vez por conexion, asi que despues de
+calentar la api parse_calls / executions debe quedar cerca de 0. Tambien
+lista las demas sentencias del esquema con mas parse calls, donde aparecen
+los textos armados en cada peticion.
+
+Falla (codigo 1) si alguna sentencia del registro con al menos
+--min-executions ejecuciones supera --max-ratio.
+
+Uso (desde la carpeta api, con la api corriendo o despues de una carga):
+    python parse_report.py
+    python parse_report.py --top 20 --max-ratio 0.05
+"""
+import argparse
+import sys
+import oracledb
+import statements
+
+dsn = 'system/bases1@localhost:1521/XE'
+
+# Comentario para no contar las consultas del propio reporte
+REPORT_MARKER = "/* parse_report */"
+
+
+def normalize(sql):
+    return " ".join(sql.split())
+
+
+def load_cursors(cursor):
+    # Totales por sql_id (sumando los cursores hijos). sql_fulltext es un
+    # CLOB y no admite MAX/GROUP BY: se suman con funciones analiticas y se
+    # toma el texto del primer cursor hijo
+    cursor.execute(f"""
+        SELECT {REPORT_MARKER}
+            sql_id, sql_fulltext, executions, parse_calls, loads, children
+        FROM (
+            SELECT
+                sql_id,
+                sql_fulltext,
+                SUM(executions) OVER (PARTITION BY sql_id) as executions,
+                SUM(parse_calls) OVER (PARTITION BY sql_id) as parse_calls,
+                SUM(loads) OVER (PARTITION BY sql_id) as loads,
+                COUNT(*) OVER (PARTITION BY sql_id) as children,
+                ROW_NUMBER() OVER (PARTITION BY sql_id ORDER BY child_number) as child
+            FROM v$sql
+            WHERE parsing_schema_name = USER
+            AND command_type IN (2, 3, 6, 7)
+            AND sql_text NOT LIKE '%parse_report%'
+        )
+        WHERE child = 1
+    """)
+    return cursor.fetchall()
+
+
+def ratio(parses, executions):
+    return parses / executions if executions else 0.0
+
+
+def print_row(name, executions, parses, loads, children):
+    print(f"{name[:40]:<40} {executions:>10} {parses:>10} {loads:>7} "
+          f"{children:>7} {ratio(parses, executions):>7.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=10,
+                        help="sentencias fuera del registro a mostrar")
+    parser.add_argument("--max-ratio", type=float, default=0.1,
+                        help="parse_calls / executions maximo permitido")
+    parser.add_argument("--min-executions", type=int, default=100,
+                        help="ejecuciones minimas para evaluar una sentencia")
+    args = parser.parse_args()
+
+    # sql_fulltext es un CLOB, se lee como texto
+    oracledb.defaults.fetch_lobs = False
+    connection = oracledb.connect(dsn)
+    cursor = connection.cursor()
+
+    try:
+        rows = load_cursors(cursor)
+    finally:
+        cursor.close()
+        connection.close()
+
+    names = {normalize(sql): name for name, sql in statements.STATEMENTS.items()}
+    registered = {name: [0, 0, 0, 0] for name in statements.STATEMENTS}
+    others = []
+
+    for sql_id, text, executions, parses, loads, children in rows:
+        name = names.get(normalize(text or ""))
+        if name is None:
+            others.append((sql_id, text, executions, parses, loads, children))
+            continue
+        totals = registered[name]
+        for i, value in enumerate((executions, parses, loads, children)):
+            totals[i] += value
+
+    header = f"{'sentencia':<40} {'ejecuciones':>10} {'parses':>10} {'hard':>7} {'hijos':>7} {'ratio':>7}"
+    print(header)
+    failures = 0
+    for name, (executions, parses, loads, children) in sorted(registered.items()):
+        print_row(name, executions, parses, loads, children)
+        if executions >= args.min_executions and ratio(parses, executions) > args.max_ratio:
+            failures += 1
+
+    print()
+    print(f"Otras sentencias con mas parse calls (top {args.top})")
+    print(header)
+    others.sort(key=lambda row: row[3], reverse=True)
+    for sql_id, text, executions, parses, loads, children in others[:args.top]:
+        print_row(f"{sql_id} {normalize(text or '')}",
+                  executions, parses, loads, children)
+
+    print()
+    print(f"{failures} sentencias del registro superan la razon {args.max_ratio}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from passlib.context import CryptContext
+import telemetry
+
+# Politica de hash: costo de bcrypt para los hashes nuevos (calibrar con
+# calibrate_bcrypt.py) y rango de costos aceptado para los guardados. Un
+# hash fuera del rango se vuelve a generar en el siguiente login exitoso.
+PASSWORD_ROUNDS = int(os.getenv("PASSWORD_ROUNDS", "10"))
+PASSWORD_MIN_ROUNDS = int(os.getenv("PASSWORD_MIN_ROUNDS", str(PASSWORD_ROUNDS)))
+# Vacio = sin maximo. Con un maximo, bajar PASSWORD_ROUNDS tambien baja el
+# costo de los hashes existentes (mas logins por segundo)
+PASSWORD_MAX_ROUNDS = os.getenv("PASSWORD_MAX_ROUNDS")
+
+
+def make_context(rounds, min_rounds=None, max_rounds=None):
+    settings = {
+        "schemes": ["bcrypt"],
+        "deprecated": "auto",
+        "bcrypt__rounds": rounds,
+        "bcrypt__min_rounds": min(rounds, min_rounds or rounds)
+    }
+    if max_rounds:
+        settings["bcrypt__max_rounds"] = max(rounds, int(max_rounds))
+    return CryptContext(**settings)
+
+
+# Configuración para el hashing de las contraseñas
+pwd_context = make_context(
+    PASSWORD_ROUNDS, PASSWORD_MIN_ROUNDS, PASSWORD_MAX_ROUNDS)
+
+# bcrypt libera el GIL, por eso basta con un pool de hilos
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 2)))
+# Peticiones que pueden esperar en cola antes de responder 503
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", "32"))
+
+_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_WORKERS,
+    thread_name_prefix="bcrypt"
+)
+
+# Trabajos en el pool (en cola o corriendo). Se descuenta cuando el trabajo
+# termina, desde el hilo que lo ejecuto, por eso lleva lock
+_pending = 0
+_pending_lock = threading.Lock()
+
+stats = {
+    "hash_count": 0,
+    "hash_seconds": 0.0,
+    "verify_count": 0,
+    "verify_seconds": 0.0,
+    "rehash_count": 0,
+    "queue_wait_seconds": 0.0,
+    "max_queue_wait_seconds": 0.0,
+    "rejected": 0
+}
+
+
+def _release(future):
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+async def _run(kind, func, *args):
+    global _pending
+
+    with _pending_lock:
+        if _pending >= PASSWORD_WORKERS + PASSWORD_QUEUE_LIMIT:
+            stats["rejected"] += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Servidor ocupado, intente de nuevo mas tarde"
+            )
+        _pending += 1
+
+    queued_at = time.perf_counter()
+
+    def job():
+        started_at = time.perf_counter()
+        result = func(*args)
+        return result, started_at - queued_at, time.perf_counter() - started_at
+
+    # Si la peticion se cancela mientras el hash corre, el hilo sigue ocupado:
+    # el contador baja cuando termina el trabajo, no cuando deja de esperarse
+    try:
+        future = _executor.submit(job)
+    except BaseException:
+        _release(None)
+        raise
+    future.add_done_callback(_release)
+    result, wait, elapsed = await asyncio.wrap_future(future)
+
+    stats[f"{kind}_count"] += 1
+    stats[f"{kind}_seconds"] += elapsed
+    stats["queue_wait_seconds"] += wait
+    stats["max_queue_wait_seconds"] = max(stats["max_queue_wait_seconds"], wait)
+    telemetry.record("bcrypt_seconds", wait + elapsed)
+
+    return result
+
+
+async def hash_password(password):
+    # Generar el hash fuera del event loop
+    return await _run("hash", pwd_context.hash, password)
+
+
+async def verify_password(password, hashed):
+    # Verificar la contraseña fuera del event loop
+    return await _run("verify", pwd_context.verify, password, hashed)
+
+
+async def verify_and_update(password, hashed):
+    # Verifica y, si el hash guardado no cumple la politica actual, genera
+    # uno nuevo en el mismo trabajo. Devuelve (valida, nuevo_hash o None)
+    valid, new_hash = await _run(
+        "verify", pwd_context.verify_and_update, password, hashed)
+    if new_hash is not None:
+        stats["rehash_count"] += 1
+    return valid, new_hash
+
+
+def get_stats():
+    return {
+        **stats,
+        "rounds": PASSWORD_ROUNDS,
+        "min_rounds": pwd_context.to_dict().get("bcrypt__min_rounds"),
+        "workers": PASSWORD_WORKERS,
+        "queue_limit": PASSWORD_QUEUE_LIMIT,
+        "in_flight": _pending
+    }
+
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
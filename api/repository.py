@@ -0,0 +1,468 @@
+import os
+import re
+import oracledb
+import statements
+
+# Capa de acceso a datos de las lecturas mas usadas (catalogo, detalle de
+# producto, cliente, login y detalle de orden) y de lo que depende del
+# dialecto en las ordenes y pagos (listas de ids, stock, paginas, llaves).
+# Los endpoints arman la respuesta HTTP; el repositorio solo ejecuta las
+# consultas y devuelve filas.
+#
+# oracle: la base del proyecto, pool asincrono de python-oracledb
+# sqlite: base embebida con el esquema de console.sql (sqlite_repository.py),
+#         para medir la api (handlers, serializacion, concurrencia) sin Oracle
+DB_BACKEND = os.getenv("DB_BACKEND", "oracle")
+
+# conectar a la base de datos
+dsn = 'system/bases1@localhost:1521/XE'
+
+# Configuración del pool de conexiones (se puede cambiar con variables de entorno)
+POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+POOL_INCREMENT = int(os.getenv("DB_POOL_INCREMENT", "1"))
+# Sentencias que cada conexion mantiene preparadas. Debe alcanzar para todos
+# los textos que usa la api (unos 60 fijos mas las variantes de los filtros
+# de los listados), si no el cache LRU las desaloja y se vuelven a parsear
+POOL_STMT_CACHE_SIZE = int(os.getenv("DB_STMT_CACHE_SIZE", "100"))
+# 0 = hacer ping en cada acquire, negativo = nunca
+POOL_PING_INTERVAL = int(os.getenv("DB_POOL_PING_INTERVAL", "60"))
+# milisegundos que se espera por una conexion libre antes de fallar
+POOL_WAIT_TIMEOUT = int(os.getenv("DB_POOL_WAIT_TIMEOUT", "5000"))
+
+# Busqueda de productos: como maximo SEARCH_MAX_TERMS palabras; el ultimo
+# termino se busca como prefijo si tiene al menos SEARCH_PREFIX_MIN letras
+# (el PREFIX_MIN_LENGTH del indice de la migracion 008)
+SEARCH_MAX_TERMS = 8
+SEARCH_PREFIX_MIN = 3
+
+SEARCH_WORD = re.compile(r"[^\W_]+")
+
+
+def search_terms(text):
+    # Palabras de la busqueda en minusculas, sin signos ni repetidos
+    terms = []
+    for word in SEARCH_WORD.findall(text.lower()):
+        if word not in terms:
+            terms.append(word)
+    return terms[:SEARCH_MAX_TERMS]
+
+
+class Repository:
+    # Consultas comunes a los dos backends, cada subclase pone el texto SQL
+    # de su dialecto. Todos los metodos reciben la conexion de la peticion
+    # (pooled_connection en api.py), asi la transaccion la sigue manejando
+    # el endpoint.
+
+    name = None
+    # (metodo, ruta) que responde el backend, None = todas. Las demas usan
+    # SQL de Oracle en api.py
+    routes = None
+    CATALOG_VERSION = None
+    PRODUCT_VERSION = None
+    PRODUCT_DETAIL = None
+    CLIENT_VERSION = None
+    CLIENT_DETAIL = None
+    CLIENT_CREDENTIALS = None
+    REHASH_PASSWORD = None
+    ORDER_DETAIL = None
+    CATEGORIES = None
+    CATEGORY = None
+    LOAD_STOCK = None
+    ORDER_CLIENTS = None
+    ORDER_PAYMENT_METHODS = None
+    ORDER_LINES = None
+
+    def create_pool(self):
+        raise NotImplementedError
+
+    def supports(self, method, path):
+        return self.routes is None or (method, path) in self.routes
+
+    async def reserve_key_block(self, connection, table, sequence, size):
+        # Primer id de un bloque de size ids para la tabla (keys.py)
+        raise NotImplementedError
+
+    async def number_list(self, connection, values):
+        # Lista de ids como un solo parametro de las consultas IN
+        raise NotImplementedError
+
+    def day(self, name):
+        # Expresion de fecha para un parametro 'YYYY-MM-DD'
+        raise NotImplementedError
+
+    def next_day(self, name):
+        # El dia siguiente al del parametro 'YYYY-MM-DD'
+        raise NotImplementedError
+
+    def timestamp(self, name):
+        # Expresion de fecha para un parametro 'YYYY-MM-DD HH24:MI:SS'
+        raise NotImplementedError
+
+    def orders_query(self, where):
+        # Pagina de ordenes, de la mas reciente a la mas antigua
+        raise NotImplementedError
+
+    def payments_query(self, where):
+        # Pagina de pagos por (created_at, id_order_payment) descendente
+        raise NotImplementedError
+
+    async def pay_order(self, connection, order_id, id, client_id, method_id):
+        # Marca el pago de la orden como PAID, registra el pago en pagos y
+        # hace commit. False si otra peticion ya la pago (no escribe nada)
+        raise NotImplementedError
+
+    def products_query(self, conditions, location):
+        # Pagina de productos con su stock (total o de la sede)
+        raise NotImplementedError
+
+    def search_expression(self, terms):
+        # Terminos de search_terms -> consulta del motor de texto
+        raise NotImplementedError
+
+    def search_query(self, conditions, after):
+        # Pagina de resultados de la busqueda con su stock, por relevancia
+        raise NotImplementedError
+
+    async def _fetchone(self, connection, sql, params, **options):
+        cursor = connection.cursor()
+        try:
+            await cursor.execute(sql, params, **options)
+            return await cursor.fetchone()
+        finally:
+            cursor.close()
+
+    async def _fetchall(self, connection, sql, params):
+        cursor = connection.cursor()
+        try:
+            await cursor.execute(sql, params)
+            return await cursor.fetchall()
+        finally:
+            cursor.close()
+
+    async def _fetchdicts(self, connection, sql, params, arraysize=None):
+        # Filas como diccionarios con los nombres de columna en minusculas
+        cursor = connection.cursor()
+        try:
+            if arraysize is not None:
+                cursor.arraysize = arraysize
+            await cursor.execute(sql, params)
+            columns = [col[0].lower() for col in cursor.description]
+            return [dict(zip(columns, row)) for row in await cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    async def catalog_version(self, connection):
+        # (updated_at, version) de todo el catalogo
+        return await self._fetchone(connection, self.CATALOG_VERSION, {"id": 1})
+
+    async def product_version(self, connection, id):
+        return await self._fetchone(connection, self.PRODUCT_VERSION, {"id": id})
+
+    async def list_products(self, connection, limit, after_id, location,
+                            category_id=None):
+        # Hasta limit + 1 productos activos despues de after_id, como
+        # diccionarios id_product, name, price, stock
+        conditions = ["p.active = 'TRUE'"]
+        params = {"page_size": limit + 1}
+
+        if category_id is not None:
+            conditions.append("p.category_id = :category_id")
+            params["category_id"] = category_id
+
+        if after_id is not None:
+            conditions.append("p.id_product > :after_id")
+            params["after_id"] = after_id
+
+        if location is not None:
+            params["location"] = location
+
+        return await self._fetchdicts(
+            connection, self.products_query(conditions, location), params)
+
+    async def search_products(self, connection, terms, limit, after,
+                              category_id, min_price, max_price):
+        # Hasta limit + 1 productos activos con todos los terminos, como
+        # diccionarios id_product, sku, name, price, category_id, stock y
+        # score. Orden: score descendente y despues id_product; after es el
+        # (score, id_product) de la ultima fila de la pagina anterior
+        conditions = ["p.active = 'TRUE'"]
+        params = {"query": self.search_expression(terms), "page_size": limit + 1}
+
+        if category_id is not None:
+            conditions.append("p.category_id = :category_id")
+            params["category_id"] = category_id
+        if min_price is not None:
+            conditions.append("p.price >= :min_price")
+            params["min_price"] = min_price
+        if max_price is not None:
+            conditions.append("p.price <= :max_price")
+            params["max_price"] = max_price
+        if after is not None:
+            params["after_score"], params["after_id"] = after
+
+        return await self._fetchdicts(
+            connection, self.search_query(conditions, after), params)
+
+    async def product_detail(self, connection, id):
+        return await self._fetchone(connection, self.PRODUCT_DETAIL, {"id": id})
+
+    async def list_categories(self, connection):
+        # Todas las categorias con id_category, name, active_products,
+        # in_stock_products, min_price y max_price
+        return await self._fetchdicts(connection, self.CATEGORIES, {})
+
+    async def category(self, connection, id):
+        # (id_categories, name) o None
+        return await self._fetchone(connection, self.CATEGORY, {"id": id})
+
+    async def client_version(self, connection, id):
+        return await self._fetchone(connection, self.CLIENT_VERSION, {"id": id})
+
+    async def client_detail(self, connection, id):
+        return await self._fetchone(connection, self.CLIENT_DETAIL, {"id": id})
+
+    async def client_credentials(self, connection, national_document):
+        # (id_client, hash de la contraseña) o None
+        return await self._fetchone(
+            connection, self.CLIENT_CREDENTIALS, {"doc": national_document})
+
+    async def rehash_password(self, connection, id, old_hash, new_hash):
+        cursor = connection.cursor()
+        try:
+            await cursor.execute(
+                self.REHASH_PASSWORD,
+                {"new_hash": new_hash, "id": id, "old_hash": old_hash}
+            )
+        finally:
+            cursor.close()
+
+    async def order_detail(self, connection, id):
+        # (updated_at, version, documento JSON de la respuesta) o None
+        return await self._fetchone(
+            connection, self.ORDER_DETAIL, {"id": id}, fetch_lobs=False)
+
+    async def load_stock(self, connection, product_ids, location_ids):
+        # Filas (id_product, id_location, price, active, stock) de los
+        # productos en las sedes que los tienen
+        return await self._fetchall(connection, self.LOAD_STOCK, {
+            "product_ids": await self.number_list(connection, set(product_ids)),
+            "location_ids": await self.number_list(connection, set(location_ids))
+        })
+
+    async def order_references(self, connection, client_ids):
+        # Clientes que existen y sus (id_client, id_payment_method)
+        params = {"client_ids": await self.number_list(connection, client_ids)}
+        clients = await self._fetchall(connection, self.ORDER_CLIENTS, params)
+        methods = await self._fetchall(connection, self.ORDER_PAYMENT_METHODS, params)
+        return {row[0] for row in clients}, {(row[0], row[1]) for row in methods}
+
+    async def list_orders(self, connection, where, params):
+        return await self._fetchdicts(connection, self.orders_query(where), params)
+
+    async def order_lines(self, connection, order_ids):
+        # Productos de varias ordenes (con id_order), en una consulta
+        return await self._fetchdicts(
+            connection, self.ORDER_LINES,
+            {"order_ids": await self.number_list(connection, order_ids)},
+            arraysize=1000)
+
+    async def list_payments(self, connection, where, params):
+        return await self._fetchdicts(connection, self.payments_query(where), params)
+
+    def get_stats(self):
+        return {"backend": self.name}
+
+
+class OracleRepository(Repository):
+    # Las sentencias de statements.py
+
+    name = "oracle"
+    CATALOG_VERSION = statements.CATALOG_VERSION
+    PRODUCT_VERSION = statements.PRODUCT_VERSION
+    PRODUCT_DETAIL = statements.PRODUCT_DETAIL
+    CLIENT_VERSION = statements.CLIENT_VERSION
+    CLIENT_DETAIL = statements.CLIENT_DETAIL
+    CLIENT_CREDENTIALS = statements.CLIENT_CREDENTIALS
+    REHASH_PASSWORD = statements.REHASH_PASSWORD
+    ORDER_DETAIL = statements.ORDER_DETAIL
+    CATEGORIES = statements.CATEGORIES
+    CATEGORY = statements.CATEGORY
+    LOAD_STOCK = statements.LOAD_STOCK
+    ORDER_CLIENTS = statements.ORDER_CLIENTS
+    ORDER_PAYMENT_METHODS = statements.ORDER_PAYMENT_METHODS
+    ORDER_LINES = statements.ORDER_LINES
+
+    def create_pool(self):
+        # Pool asincrono (modo thin), las operaciones no bloquean el event loop
+        return oracledb.create_pool_async(
+            dsn=dsn,
+            min=POOL_MIN,
+            max=POOL_MAX,
+            increment=POOL_INCREMENT,
+            stmtcachesize=POOL_STMT_CACHE_SIZE,
+            ping_interval=POOL_PING_INTERVAL,
+            getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+            wait_timeout=POOL_WAIT_TIMEOUT
+        )
+
+    async def reserve_key_block(self, connection, table, sequence, size):
+        # Un NEXTVAL reserva el bloque: el INCREMENT BY de la secuencia es
+        # el tamaño del bloque
+        return (await self._fetchone(
+            connection, f"SELECT {sequence}.NEXTVAL FROM dual", {}))[0]
+
+    async def number_list(self, connection, values):
+        # Para TABLE(CAST(:ids AS SYS.ODCINUMBERLIST))
+        numbers = (await connection.gettype("SYS.ODCINUMBERLIST")).newobject()
+        numbers.extend(values)
+        return numbers
+
+    def day(self, name):
+        return f"TO_DATE(:{name}, 'YYYY-MM-DD')"
+
+    def next_day(self, name):
+        return f"TO_DATE(:{name}, 'YYYY-MM-DD') + 1"
+
+    def timestamp(self, name):
+        return f"TO_DATE(:{name}, 'YYYY-MM-DD HH24:MI:SS')"
+
+    def orders_query(self, where):
+        return f"""
+            SELECT 
+                o.id_order,
+                o.id_client,
+                c.name || ' ' || c.lastname as client_name,
+                o.id_location,
+                TO_CHAR(o.created_at, 'YYYY-MM-DD HH24:MI:SS') as created_at,
+                TO_CHAR(o.updated_at, 'YYYY-MM-DD HH24:MI:SS') as updated_at,
+                po.status as payment_status,
+                pm.payment_method,
+                po.total_amount  -- Añadido este campo
+            FROM ordenes o
+            JOIN clientes c ON o.id_client = c.id_client
+            JOIN pagos_ordenes po ON o.id_order = po.id_order
+            JOIN metodos_pago pm ON po.id_payment_method = pm.id_payment_method
+            {where}
+            ORDER BY o.id_order DESC
+            FETCH FIRST :page_size ROWS ONLY
+        """
+
+    def payments_query(self, where):
+        return f"""
+            SELECT 
+                po.id_order_payment,
+                po.id_order,
+                c.id_client,
+                c.name || ' ' || c.lastname as client_name,
+                c.national_document,
+                pm.payment_method,
+                po.total_amount,
+                po.status as payment_status,
+                TO_CHAR(po.created_at, 'YYYY-MM-DD HH24:MI:SS') as payment_date,
+                TO_CHAR(po.updated_at, 'YYYY-MM-DD HH24:MI:SS') as last_update
+            FROM pagos_ordenes po
+            JOIN ordenes o ON po.id_order = o.id_order
+            JOIN clientes c ON o.id_client = c.id_client
+            JOIN metodos_pago pm ON po.id_payment_method = pm.id_payment_method
+            {where}
+            ORDER BY po.created_at DESC, po.id_order_payment DESC
+            FETCH FIRST :page_size ROWS ONLY
+        """
+
+    async def pay_order(self, connection, order_id, id, client_id, method_id):
+        # Bloque PL/SQL: actualizar, registrar y commit en un round-trip
+        cursor = connection.cursor()
+        try:
+            paid = cursor.var(int)
+            await cursor.execute(
+                statements.PAY_ORDER,
+                {
+                    "order_id": order_id,
+                    "paid": paid,
+                    "id": id,
+                    "client_id": client_id,
+                    "method_id": method_id
+                }
+            )
+            return bool(paid.getvalue())
+        finally:
+            cursor.close()
+
+    def products_query(self, conditions, location):
+        # El stock se lee del resumen que mantiene el trigger de inventario
+        stock_join = "LEFT JOIN stock_productos s ON p.id_product = s.id_product"
+        if location is not None:
+            # Solo el stock de esa sede y productos que tengan inventario ahi
+            stock_join = """JOIN stock_sedes s ON p.id_product = s.id_product
+                AND s.id_location = :location"""
+
+        return f"""
+            SELECT p.id_product, p.name, p.price,
+                   COALESCE(s.quantity, 0) as stock
+            FROM productos p
+            {stock_join}
+            WHERE {' AND '.join(conditions)}
+            ORDER BY p.id_product
+            FETCH FIRST :page_size ROWS ONLY
+        """
+
+    # Palabras reservadas de Oracle Text: como prefijo ("and%") se leerian
+    # como operador, se buscan exactas entre llaves
+    TEXT_RESERVED = {
+        "about", "accum", "and", "bt", "btg", "bti", "btp", "equiv", "fuzzy",
+        "haspath", "inpath", "minus", "near", "not", "nt", "ntg", "nti",
+        "ntp", "or", "pt", "rt", "sqe", "syn", "tr", "trsyn", "tt", "within"
+    }
+
+    def search_expression(self, terms):
+        # Todos los terminos (&) y el ultimo como prefijo. Las coincidencias
+        # en name cuentan el doble que en description, slug o sku
+        words = [f"{{{term}}}" for term in terms]
+        last = terms[-1]
+        if len(last) >= SEARCH_PREFIX_MIN and last not in self.TEXT_RESERVED:
+            words[-1] = f"{last}%"
+        expression = " & ".join(words)
+        return f"(({expression}) WITHIN name)*2 ACCUM ({expression})"
+
+    def search_query(self, conditions, after):
+        # Indice de texto de la migracion 008. En la primera pagina el orden
+        # y el limite van en la consulta del indice (FILTER BY resuelve los
+        # filtros y el top-N dentro de el); las siguientes filtran por
+        # (score, id_product) despues de calcular el score
+        top = where = ""
+        if after is None:
+            top = "ORDER BY SCORE(1) DESC, p.id_product FETCH FIRST :page_size ROWS ONLY"
+        else:
+            where = """WHERE r.score < :after_score
+                OR (r.score = :after_score AND r.id_product > :after_id)"""
+
+        return f"""
+            SELECT r.id_product, r.sku, r.name, r.price, r.category_id,
+                   COALESCE(s.quantity, 0) as stock, r.score
+            FROM (
+                SELECT p.id_product, p.sku, p.name, p.price, p.category_id,
+                       SCORE(1) as score
+                FROM productos p
+                WHERE CONTAINS(p.name, :query, 1) > 0
+                AND {' AND '.join(conditions)}
+                {top}
+            ) r
+            LEFT JOIN stock_productos s ON r.id_product = s.id_product
+            {where}
+            ORDER BY r.score DESC, r.id_product
+            FETCH FIRST :page_size ROWS ONLY
+        """
+
+
+def create_repository(backend):
+    if backend == "oracle":
+        return OracleRepository()
+    if backend == "sqlite":
+        # Solo se importa si se usa
+        import sqlite_repository
+        return sqlite_repository.SqliteRepository(sqlite_repository.SQLITE_PATH)
+    raise ValueError(f"DB_BACKEND invalido: {backend}")
+
+
+db = create_repository(DB_BACKEND)
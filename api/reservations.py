@@ -0,0 +1,99 @@
+import asyncio
+import os
+import random
+import oracledb
+import statements
+
+# Reintentos de una transaccion de orden cuando el stock cambio entre la
+# lectura y el descuento, o cuando Oracle la elige como victima de un deadlock
+RESERVE_RETRIES = int(os.getenv("RESERVE_RETRIES", "3"))
+# Espera base entre reintentos (segundos), crece al doble en cada intento
+RESERVE_BACKOFF = float(os.getenv("RESERVE_BACKOFF", "0.02"))
+
+# ORA-00060: deadlock detectado mientras se esperaba un recurso
+RETRYABLE_ERRORS = {60}
+
+stats = {
+    "reservations": 0,
+    "out_of_stock": 0,
+    "deadlocks": 0,
+    "retries": 0,
+    "exhausted": 0
+}
+
+
+class OutOfStock(Exception):
+    # Otra transaccion se llevo el stock despues de la validacion
+    def __init__(self, keys):
+        super().__init__(
+            "Sin stock suficiente para " +
+            ", ".join(f"producto {p} en sede {l}" for p, l in keys))
+        self.keys = keys
+
+
+async def reserve(cursor, quantities):
+    # Descuenta {(id_product, id_location): cantidad} del inventario.
+    # Cada UPDATE solo descuenta si alcanza (quantity >= :quantity), asi dos
+    # ordenes concurrentes no pueden dejar el stock negativo. Las filas se
+    # bloquean ordenadas por (producto, sede): todas las ordenes toman los
+    # bloqueos en el mismo orden y no se forman deadlocks entre ellas.
+    # Cada UPDATE toca una sola fila: uq_inventory_product_location
+    # (migracion 010) garantiza una fila de inventario por producto y sede.
+    keys = sorted(quantities)
+    await cursor.executemany(
+        statements.RESERVE_STOCK,
+        [
+            {
+                "quantity": quantities[key],
+                "id_product": key[0],
+                "id_location": key[1]
+            }
+            for key in keys
+        ],
+        arraydmlrowcounts=True
+    )
+    stats["reservations"] += 1
+
+    missing = [
+        key for key, count in zip(keys, cursor.getarraydmlrowcounts())
+        if count == 0
+    ]
+    if missing:
+        stats["out_of_stock"] += 1
+        raise OutOfStock(missing)
+
+
+def is_retryable(error):
+    if isinstance(error, OutOfStock):
+        return True
+    if isinstance(error, oracledb.DatabaseError):
+        code = getattr(error.args[0], "code", None)
+        if code in RETRYABLE_ERRORS:
+            stats["deadlocks"] += 1
+            return True
+    return False
+
+
+async def run(connection, transaction):
+    # Ejecuta transaction() (que debe leer el stock, validar, escribir y hacer
+    # commit) y la repite desde cero con rollback si falla por un conflicto.
+    # Despues de RESERVE_RETRIES reintentos se propaga el ultimo error.
+    for attempt in range(RESERVE_RETRIES + 1):
+        try:
+            return await transaction()
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            await connection.rollback()
+            if attempt == RESERVE_RETRIES:
+                stats["exhausted"] += 1
+                raise
+            stats["retries"] += 1
+            await asyncio.sleep(RESERVE_BACKOFF * (2 ** attempt) * random.random())
+
+
+def get_stats():
+    return {
+        **stats,
+        "max_retries": RESERVE_RETRIES
+    }
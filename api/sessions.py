@@ -0,0 +1,181 @@
+import hashlib
+import os
+import secrets
+import time
+from collections import OrderedDict
+import statements
+
+# memory: sesiones en el proceso (se pierden al reiniciar, un solo worker)
+# oracle: tabla sesiones (migracion 006), compartida entre workers
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+# Segundos que dura una sesion desde que se crea o se renueva
+SESSION_TTL = int(os.getenv("SESSION_TTL", "3600"))
+# Sesiones maximas en memoria, se descartan las mas proximas a vencer
+SESSION_MAX = int(os.getenv("SESSION_MAX", "100000"))
+
+
+def new_token():
+    return secrets.token_urlsafe(32)
+
+
+def token_hash(token):
+    # Solo se guarda el hash: quien lea el almacen no obtiene tokens validos
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def bearer_token(authorization):
+    # Header "Authorization: Bearer <SessionID>"
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
+
+
+class MemoryStore:
+    # Diccionario token -> (id_client, vencimiento). Todas las sesiones duran
+    # lo mismo, asi que el orden de insercion (o de ultima renovacion) es el
+    # orden de vencimiento y las vencidas se sacan del inicio.
+    # Los metodos reciben la conexion solo para tener la misma firma que
+    # OracleStore.
+
+    def __init__(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.sessions = OrderedDict()
+        self.by_client = {}
+
+    def _remove(self, key):
+        id_client, _ = self.sessions.pop(key)
+        tokens = self.by_client.get(id_client)
+        if tokens is not None:
+            tokens.discard(key)
+            if not tokens:
+                del self.by_client[id_client]
+
+    def _evict(self):
+        now = time.monotonic()
+        while self.sessions:
+            key, (_, expires_at) = next(iter(self.sessions.items()))
+            if expires_at > now and len(self.sessions) <= self.maxsize:
+                break
+            self._remove(key)
+
+    async def create(self, connection, id_client):
+        token = new_token()
+        key = token_hash(token)
+        self.sessions[key] = (id_client, time.monotonic() + self.ttl)
+        self.by_client.setdefault(id_client, set()).add(key)
+        self._evict()
+        return token
+
+    async def validate(self, connection, token):
+        # id_client de la sesion o None si no existe o ya vencio
+        session = self.sessions.get(token_hash(token))
+        if session is None or session[1] <= time.monotonic():
+            return None
+        return session[0]
+
+    async def refresh(self, connection, token):
+        key = token_hash(token)
+        session = self.sessions.get(key)
+        if session is None or session[1] <= time.monotonic():
+            return False
+        self.sessions[key] = (session[0], time.monotonic() + self.ttl)
+        self.sessions.move_to_end(key)
+        return True
+
+    async def revoke(self, connection, token):
+        key = token_hash(token)
+        if key in self.sessions:
+            self._remove(key)
+
+    async def revoke_client(self, connection, id_client):
+        for key in list(self.by_client.get(id_client, ())):
+            self._remove(key)
+
+    def get_stats(self):
+        return {
+            "backend": "memory",
+            "sessions": len(self.sessions),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl
+        }
+
+
+class OracleStore:
+    # Tabla sesiones, validar es una busqueda por llave primaria.
+    # Las escrituras no hacen commit, lo hace el endpoint con su transaccion.
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+
+    async def create(self, connection, id_client):
+        token = new_token()
+        cursor = connection.cursor()
+        try:
+            # Aprovechar para borrar las sesiones vencidas del mismo cliente
+            await cursor.execute(
+                statements.DELETE_EXPIRED_SESSIONS, {"id_client": id_client})
+            await cursor.execute(
+                statements.INSERT_SESSION,
+                {"token_hash": token_hash(token), "id_client": id_client, "ttl": self.ttl}
+            )
+        finally:
+            cursor.close()
+        return token
+
+    async def validate(self, connection, token):
+        cursor = connection.cursor()
+        try:
+            await cursor.execute(
+                statements.SESSION_CLIENT, {"token_hash": token_hash(token)})
+            row = await cursor.fetchone()
+        finally:
+            cursor.close()
+        return row[0] if row else None
+
+    async def refresh(self, connection, token):
+        cursor = connection.cursor()
+        try:
+            await cursor.execute(
+                statements.REFRESH_SESSION,
+                {"token_hash": token_hash(token), "ttl": self.ttl}
+            )
+            return cursor.rowcount > 0
+        finally:
+            cursor.close()
+
+    async def revoke(self, connection, token):
+        cursor = connection.cursor()
+        try:
+            await cursor.execute(
+                statements.DELETE_SESSION, {"token_hash": token_hash(token)})
+        finally:
+            cursor.close()
+
+    async def revoke_client(self, connection, id_client):
+        cursor = connection.cursor()
+        try:
+            await cursor.execute(
+                statements.DELETE_CLIENT_SESSIONS, {"id_client": id_client})
+        finally:
+            cursor.close()
+
+    def get_stats(self):
+        return {
+            "backend": "oracle",
+            "ttl_seconds": self.ttl
+        }
+
+
+def create_store(backend):
+    if backend == "memory":
+        return MemoryStore(SESSION_TTL, SESSION_MAX)
+    if backend == "oracle":
+        return OracleStore(SESSION_TTL)
+    raise ValueError(f"SESSION_BACKEND invalido: {backend}")
+
+
+store = create_store(SESSION_BACKEND)
@@ -0,0 +1,588 @@
+import asyncio
+import functools
+import json
+import os
+import re
+import sqlite3
+import statements
+from repository import Repository
+
+# Backend sqlite (DB_BACKEND=sqlite): la misma api sobre una base embebida
+# con el esquema de console.sql, para perfilar handlers, serializacion y
+# concurrencia sin el tiempo de Oracle. Cubre las lecturas del repositorio,
+# login y el ciclo de las ordenes (crear, cargar en bloque, listar, pagar);
+# las demas rutas siguen usando SQL de Oracle y responden 501
+# (SqliteRepository.routes).
+
+# Archivo de la base, por defecto en memoria (se crea vacia al iniciar)
+SQLITE_PATH = os.getenv("SQLITE_PATH", ":memory:")
+SCHEMA_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "console.sql")
+
+WRITE_STATEMENT = re.compile(r"\s*(INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+# Funciones de Oracle en las sentencias compartidas de statements.py
+DIALECT = [
+    (re.compile(r"\bSYSDATE\b"), "CURRENT_TIMESTAMP"),
+    (re.compile(r"\bNVL\("), "IFNULL(")
+]
+
+CREATE_TABLE = re.compile(r"\s*CREATE\s+TABLE\s+(\w+)\s*\(", re.IGNORECASE)
+TABLE_CONSTRAINT = re.compile(r"(CONSTRAINT|FOREIGN\s+KEY)\b", re.IGNORECASE)
+
+# Equivalente de las migraciones que usan estas consultas (001 a 004, la
+# busqueda de 008, el indice de categorias de 009 y el inventario unico
+# de 010). Los resumenes de stock
+# (005) y de categorias (009) los mantienen triggers PL/SQL, aqui se
+# calculan al leer
+MIGRATIONS = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_clients_national_document ON clientes (national_document)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_inf_client_email ON informacion_contacto_clientes (email)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_product_sku ON productos (sku)",
+    "CREATE INDEX IF NOT EXISTS ix_inf_client_client ON informacion_contacto_clientes (id_client)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_inventory_product_location ON inventario (id_product, id_location)",
+    "CREATE INDEX IF NOT EXISTS ix_order_product_order ON ordenes_productos (id_order)",
+    "CREATE INDEX IF NOT EXISTS ix_order_payment_order ON pagos_ordenes (id_order)",
+    "CREATE INDEX IF NOT EXISTS ix_product_category ON productos (category_id, active, id_product)",
+    """CREATE TABLE IF NOT EXISTS catalogo_version (
+        id_catalog INTEGER NOT NULL PRIMARY KEY,
+        version INTEGER NOT NULL,
+        updated_at DATE DEFAULT CURRENT_TIMESTAMP
+    )""",
+    "INSERT OR IGNORE INTO catalogo_version (id_catalog, version) VALUES (1, 1)",
+    # Busqueda (008): indice FTS5 de productos que mantienen los triggers
+    """CREATE VIRTUAL TABLE IF NOT EXISTS productos_busqueda USING fts5(
+        name, description, slug, sku,
+        content='productos', content_rowid='id_product',
+        tokenize='unicode61 remove_diacritics 2', prefix='3 4 5'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS trg_productos_busqueda_ins AFTER INSERT ON productos BEGIN
+        INSERT INTO productos_busqueda (rowid, name, description, slug, sku)
+        VALUES (new.id_product, new.name, new.description, new.slug, new.sku);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_productos_busqueda_del AFTER DELETE ON productos BEGIN
+        INSERT INTO productos_busqueda (productos_busqueda, rowid, name, description, slug, sku)
+        VALUES ('delete', old.id_product, old.name, old.description, old.slug, old.sku);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_productos_busqueda_upd AFTER UPDATE ON productos BEGIN
+        INSERT INTO productos_busqueda (productos_busqueda, rowid, name, description, slug, sku)
+        VALUES ('delete', old.id_product, old.name, old.description, old.slug, old.sku);
+        INSERT INTO productos_busqueda (rowid, name, description, slug, sku)
+        VALUES (new.id_product, new.name, new.description, new.slug, new.sku);
+    END"""
+]
+
+
+def split_items(body):
+    # Columnas y restricciones de un CREATE TABLE, separadas por las comas
+    # que no estan dentro de parentesis
+    items, depth, start = [], 0, 0
+    for i, char in enumerate(body):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            items.append(body[start:i])
+            start = i + 1
+    items.append(body[start:])
+    return [item.strip() for item in items if item.strip()]
+
+
+def schema_statements(text):
+    # Los CREATE TABLE de console.sql en sintaxis de sqlite: SYSDATE pasa a
+    # CURRENT_TIMESTAMP (mismo formato 'YYYY-MM-DD HH24:MI:SS') y las
+    # restricciones de tabla van despues de todas las columnas. El resto del
+    # archivo (el bloque PL/SQL de las secuencias) no aplica
+    result = []
+    for part in text.split(";"):
+        body = "\n".join(
+            line for line in part.splitlines() if not line.strip().startswith("--"))
+        match = CREATE_TABLE.match(body)
+        if not match:
+            continue
+        items = split_items(body[match.end():body.rindex(")")])
+        items = [re.sub(r"\bSYSDATE\b", "CURRENT_TIMESTAMP", item) for item in items]
+        columns = [item for item in items if not TABLE_CONSTRAINT.match(item)]
+        constraints = [item for item in items if TABLE_CONSTRAINT.match(item)]
+        result.append(
+            f"CREATE TABLE IF NOT EXISTS {match.group(1)} (\n    "
+            + ",\n    ".join(columns + constraints) + "\n)"
+        )
+    return result
+
+
+@functools.lru_cache(maxsize=256)
+def translate(sql):
+    for pattern, replacement in DIALECT:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def connect(path=None, schema_file=SCHEMA_FILE):
+    # Conexion sqlite con el esquema creado (si la base ya lo tiene no se
+    # toca). Autocommit: cada sentencia es su propia transaccion
+    connection = sqlite3.connect(
+        path or SQLITE_PATH, check_same_thread=False, isolation_level=None)
+    connection.execute("PRAGMA foreign_keys = ON")
+    searchable = connection.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE name = 'productos_busqueda'").fetchone()[0]
+    with open(schema_file) as f:
+        for sql in schema_statements(f.read()) + MIGRATIONS:
+            connection.execute(sql)
+    if not searchable:
+        # Base que ya tenia productos antes del indice de busqueda
+        connection.execute(
+            "INSERT INTO productos_busqueda (productos_busqueda) VALUES ('rebuild')")
+    return connection
+
+
+class SqliteCursor:
+    # Interfaz asincrona de AsyncCursor sobre un cursor de sqlite3
+
+    # telemetry.InstrumentedCursor estima round-trips con estos valores: en
+    # sqlite no hay red, cada sentencia cuenta como una llamada y traer las
+    # filas no suma mas
+    prefetchrows = 2 ** 31
+    arraysize = 2 ** 31
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._cursor = connection.raw.cursor()
+        self._rowcounts = []
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    async def execute(self, sql, params=None, **options):
+        # Las opciones de oracledb (fetch_lobs, ...) no aplican
+        if WRITE_STATEMENT.match(sql):
+            await self._connection.begin()
+        self._cursor.execute(translate(sql), params or {})
+
+    async def executemany(self, sql, params, **options):
+        # sqlite corta en la primera fila con error (lanza la excepcion), no
+        # hay batcherrors. Con arraydmlrowcounts se ejecuta fila por fila
+        # para tener las filas afectadas de cada una
+        if WRITE_STATEMENT.match(sql):
+            await self._connection.begin()
+        sql = translate(sql)
+        if options.get("arraydmlrowcounts"):
+            self._rowcounts = []
+            for row in params:
+                self._cursor.execute(sql, row)
+                self._rowcounts.append(self._cursor.rowcount)
+        else:
+            self._cursor.executemany(sql, params)
+
+    def getbatcherrors(self):
+        return []
+
+    def getarraydmlrowcounts(self):
+        return self._rowcounts
+
+    async def fetchone(self):
+        return self._cursor.fetchone()
+
+    async def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or 100)
+
+    async def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class SqliteConnection:
+    # Conexion de una peticion sobre la conexion compartida. Las lecturas van
+    # en autocommit; la primera escritura abre una transaccion y toma el lock
+    # de escritura del pool hasta el commit o rollback, asi las transacciones
+    # de distintas peticiones no se mezclan. Las lecturas de otras peticiones
+    # pueden ver escrituras aun sin confirmar (es la misma conexion)
+
+    def __init__(self, connection, write_lock):
+        self.raw = connection
+        self._write_lock = write_lock
+        self._in_transaction = False
+
+    def cursor(self):
+        return SqliteCursor(self)
+
+    async def begin(self):
+        if not self._in_transaction:
+            await self._write_lock.acquire()
+            self._in_transaction = True
+            self.raw.execute("BEGIN")
+
+    async def _finish(self, sql):
+        if not self._in_transaction:
+            return
+        try:
+            if self.raw.in_transaction:
+                self.raw.execute(sql)
+        finally:
+            self._in_transaction = False
+            self._write_lock.release()
+
+    async def commit(self):
+        await self._finish("COMMIT")
+
+    async def rollback(self):
+        await self._finish("ROLLBACK")
+
+
+class SqlitePool:
+    # Misma interfaz que el pool asincrono de oracledb. Todas las peticiones
+    # comparten una conexion: las llamadas a sqlite son sincronas y cortas y
+    # el event loop ya las ejecuta de a una. Solo las transacciones de
+    # escritura esperan, de a una por vez (SqliteConnection)
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.write_lock = asyncio.Lock()
+
+    async def acquire(self):
+        return SqliteConnection(self.connection, self.write_lock)
+
+    async def release(self, connection):
+        # Como el pool de Oracle: lo que no se confirmo se descarta
+        await connection.rollback()
+
+    async def close(self, force=False):
+        self.connection.close()
+
+
+# Llave primaria de las tablas de keys.SEQUENCES
+PRIMARY_KEYS = {
+    "clientes": "id_client",
+    "informacion_contacto_clientes": "id_inf_client",
+    "productos": "id_product",
+    "inventario": "id_inventory",
+    "ordenes": "id_order",
+    "ordenes_productos": "id_order_product",
+    "pagos_ordenes": "id_order_payment",
+    "pagos": "id_payments",
+    "imagenes": "id_img"
+}
+
+
+class SqliteRepository(Repository):
+    # No hay ORA_ROWSCN: la version de las filas es solo updated_at
+
+    name = "sqlite"
+    routes = {
+        ("GET", "/Hola_mundo"),
+        ("GET", "/metrics"),
+        ("GET", "/metrics/cache"),
+        ("GET", "/metrics/passwords"),
+        ("GET", "/metrics/reservations"),
+        ("GET", "/metrics/sessions"),
+        ("POST", "/users/login"),
+        ("POST", "/users/refresh"),
+        ("POST", "/users/logout"),
+        ("GET", "/users/{id}"),
+        ("GET", "/products"),
+        ("GET", "/products/search"),
+        ("GET", "/products/{id}"),
+        ("GET", "/categories"),
+        ("GET", "/categories/{id}/products"),
+        ("POST", "/orders"),
+        ("POST", "/orders/bulk"),
+        ("GET", "/orders"),
+        ("GET", "/orders/{id}"),
+        ("POST", "/payments"),
+        ("GET", "/payments")
+    }
+    CATALOG_VERSION = """
+        SELECT updated_at, version FROM catalogo_version WHERE id_catalog = :id
+    """
+    PRODUCT_VERSION = """
+        SELECT updated_at, 0 FROM productos WHERE id_product = :id
+    """
+    PRODUCT_DETAIL = """
+        SELECT id_product, sku, name, description, price,
+               slug, category_id, active, created_at, updated_at
+        FROM productos
+        WHERE id_product = :id
+    """
+    CLIENT_VERSION = """
+        SELECT MAX(c.updated_at, ic.updated_at), 0
+        FROM clientes c
+        JOIN informacion_contacto_clientes ic ON c.id_client = ic.id_client
+        WHERE c.id_client = :id
+    """
+    CLIENT_DETAIL = """
+        SELECT c.id_client, c.national_document, c.name, c.lastname,
+               ic.phone, ic.email, ic.active, ic.confirmed_email,
+               c.created_at, c.updated_at
+        FROM clientes c
+        JOIN informacion_contacto_clientes ic ON c.id_client = ic.id_client
+        WHERE c.id_client = :id
+    """
+    CLIENT_CREDENTIALS = """
+        SELECT c.id_client, c.password
+        FROM clientes c
+        JOIN informacion_contacto_clientes ic ON c.id_client = ic.id_client
+        WHERE c.national_document = :doc
+    """
+    REHASH_PASSWORD = statements.REHASH_PASSWORD
+    # Mismo documento que statements.ORDER_DETAIL con las funciones JSON de
+    # sqlite; los productos se ordenan en la subconsulta
+    ORDER_DETAIL = """
+        SELECT
+            MAX(o.updated_at, c.updated_at, po.updated_at,
+                COALESCE(oe.updated_at, o.updated_at)),
+            0,
+            json_object(
+                'order_id', o.id_order,
+                'client', json_object(
+                    'id', o.id_client,
+                    'name', c.name || ' ' || c.lastname,
+                    'document', c.national_document
+                ),
+                'location', json_object(
+                    'id', o.id_location,
+                    'name', s.name
+                ),
+                'created_at', o.created_at,
+                'updated_at', o.updated_at,
+                'payment', json_object(
+                    'method', pm.payment_method,
+                    'method_id', pm.id_payment_method,
+                    'status', po.status,
+                    'total_amount', po.total_amount,
+                    'calculated_total', COALESCE(l.calculated_total, 0)
+                ),
+                'products', json(COALESCE(l.products, '[]'))
+            )
+        FROM ordenes o
+        JOIN clientes c ON o.id_client = c.id_client
+        JOIN pagos_ordenes po ON o.id_order = po.id_order
+        JOIN metodos_pago pm ON po.id_payment_method = pm.id_payment_method
+        LEFT JOIN ordenes_entregadas oe ON o.id_order = oe.id_order
+        LEFT JOIN sedes s ON o.id_location = s.id_site
+        LEFT JOIN (
+            SELECT
+                id_order,
+                SUM(quantity * unit_price) as calculated_total,
+                json_group_array(json_object(
+                    'id_order_product', id_order_product,
+                    'id_product', id_product,
+                    'product_name', product_name,
+                    'product_description', product_description,
+                    'product_sku', product_sku,
+                    'quantity', quantity,
+                    'unit_price', unit_price,
+                    'subtotal', quantity * unit_price,
+                    'added_at', added_at,
+                    'updated_at', updated_at
+                )) as products
+            FROM (
+                SELECT op.id_order, op.id_order_product, op.id_product,
+                       p.name as product_name,
+                       p.description as product_description,
+                       p.sku as product_sku,
+                       op.quantity, op.price as unit_price,
+                       op.created_at as added_at, op.updated_at
+                FROM ordenes_productos op
+                JOIN productos p ON op.id_product = p.id_product
+                WHERE op.id_order = :id
+                ORDER BY op.id_order_product
+            )
+            GROUP BY id_order
+        ) l ON o.id_order = l.id_order
+        WHERE o.id_order = :id
+    """
+
+    CATEGORIES = """
+        SELECT c.id_categories as id_category, c.name,
+               COUNT(p.id_product) as active_products,
+               COUNT(CASE WHEN (SELECT SUM(i.quantity) FROM inventario i
+                                WHERE i.id_product = p.id_product) > 0
+                     THEN 1 END) as in_stock_products,
+               MIN(p.price) as min_price, MAX(p.price) as max_price
+        FROM categorias c
+        LEFT JOIN productos p ON c.id_categories = p.category_id
+            AND p.active = 'TRUE'
+        GROUP BY c.id_categories, c.name
+        ORDER BY c.name, c.id_categories
+    """
+    CATEGORY = statements.CATEGORY
+    # Las listas de ids se enlazan como un arreglo JSON (number_list)
+    LOAD_STOCK = """
+        SELECT p.id_product, i.id_location, p.price, p.active,
+               SUM(i.quantity) as stock
+        FROM productos p
+        JOIN inventario i ON p.id_product = i.id_product
+        WHERE p.id_product IN (SELECT value FROM json_each(:product_ids))
+        AND i.id_location IN (SELECT value FROM json_each(:location_ids))
+        GROUP BY p.id_product, i.id_location, p.price, p.active
+    """
+    ORDER_CLIENTS = """
+        SELECT id_client
+        FROM clientes
+        WHERE id_client IN (SELECT value FROM json_each(:client_ids))
+    """
+    ORDER_PAYMENT_METHODS = """
+        SELECT id_client, id_payment_method
+        FROM metodos_pago_cliente
+        WHERE id_client IN (SELECT value FROM json_each(:client_ids))
+    """
+    ORDER_LINES = """
+        SELECT op.id_order, op.id_product, p.name as product_name,
+               op.quantity, op.price, (op.quantity * op.price) as subtotal
+        FROM ordenes_productos op
+        JOIN productos p ON op.id_product = p.id_product
+        WHERE op.id_order IN (SELECT value FROM json_each(:order_ids))
+        ORDER BY op.id_order, op.id_order_product
+    """
+    PAY_ORDER_STATUS = """
+        UPDATE pagos_ordenes
+        SET status = 'PAID', updated_at = CURRENT_TIMESTAMP
+        WHERE id_order = :order_id
+        AND status != 'PAID'
+    """
+    INSERT_PAYMENT = """
+        INSERT INTO pagos (id_payments, id_client, id_payment_method, created_at, updated_at)
+        VALUES (:id, :client_id, :method_id, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Siguiente id de cada tabla: sin secuencias, se parte del maximo
+        # actual. Todas las peticiones usan la misma conexion y este proceso
+        self._next_keys = {}
+
+    def create_pool(self):
+        self._next_keys = {}
+        return SqlitePool(connect(self.path))
+
+    async def reserve_key_block(self, connection, table, sequence, size):
+        if table not in self._next_keys:
+            row = await self._fetchone(
+                connection,
+                f"SELECT COALESCE(MAX({PRIMARY_KEYS[table]}), 0) + 1 FROM {table}", {})
+            # Otra peticion pudo iniciar el contador mientras se consultaba
+            self._next_keys.setdefault(table, row[0])
+        start = self._next_keys[table]
+        self._next_keys[table] = start + size
+        return start
+
+    async def number_list(self, connection, values):
+        return json.dumps(list(values))
+
+    def day(self, name):
+        # Las fechas se guardan como texto 'YYYY-MM-DD HH:MM:SS'
+        return f"date(:{name})"
+
+    def next_day(self, name):
+        return f"date(:{name}, '+1 day')"
+
+    def timestamp(self, name):
+        return f":{name}"
+
+    def orders_query(self, where):
+        return f"""
+            SELECT o.id_order, o.id_client,
+                   c.name || ' ' || c.lastname as client_name,
+                   o.id_location, o.created_at, o.updated_at,
+                   po.status as payment_status, pm.payment_method,
+                   po.total_amount
+            FROM ordenes o
+            JOIN clientes c ON o.id_client = c.id_client
+            JOIN pagos_ordenes po ON o.id_order = po.id_order
+            JOIN metodos_pago pm ON po.id_payment_method = pm.id_payment_method
+            {where}
+            ORDER BY o.id_order DESC
+            LIMIT :page_size
+        """
+
+    def payments_query(self, where):
+        return f"""
+            SELECT po.id_order_payment, po.id_order, c.id_client,
+                   c.name || ' ' || c.lastname as client_name,
+                   c.national_document, pm.payment_method, po.total_amount,
+                   po.status as payment_status,
+                   po.created_at as payment_date, po.updated_at as last_update
+            FROM pagos_ordenes po
+            JOIN ordenes o ON po.id_order = o.id_order
+            JOIN clientes c ON o.id_client = c.id_client
+            JOIN metodos_pago pm ON po.id_payment_method = pm.id_payment_method
+            {where}
+            ORDER BY po.created_at DESC, po.id_order_payment DESC
+            LIMIT :page_size
+        """
+
+    async def pay_order(self, connection, order_id, id, client_id, method_id):
+        cursor = connection.cursor()
+        try:
+            await cursor.execute(self.PAY_ORDER_STATUS, {"order_id": order_id})
+            if cursor.rowcount == 0:
+                await connection.rollback()
+                return False
+            await cursor.execute(self.INSERT_PAYMENT, {
+                "id": id, "client_id": client_id, "method_id": method_id})
+            await connection.commit()
+            return True
+        finally:
+            cursor.close()
+
+    def products_query(self, conditions, location):
+        # Sin el resumen de stock: se suma el inventario de cada producto
+        stock_join = "LEFT JOIN inventario i ON p.id_product = i.id_product"
+        if location is not None:
+            stock_join = """JOIN inventario i ON p.id_product = i.id_product
+                AND i.id_location = :location"""
+
+        return f"""
+            SELECT p.id_product, p.name, p.price,
+                   COALESCE(SUM(i.quantity), 0) as stock
+            FROM productos p
+            {stock_join}
+            WHERE {' AND '.join(conditions)}
+            GROUP BY p.id_product, p.name, p.price
+            ORDER BY p.id_product
+            LIMIT :page_size
+        """
+
+    def search_expression(self, terms):
+        # Consulta FTS5: todos los terminos y el ultimo como prefijo
+        words = [f'"{term}"' for term in terms]
+        if len(terms[-1]) >= 3:
+            words[-1] += "*"
+        return " ".join(words)
+
+    def search_query(self, conditions, after):
+        # bm25 es menor cuanto mas relevante, el score es su negativo. Pesos
+        # por columna: name 2, description 1, slug 1, sku 1 (como Oracle)
+        where = ""
+        if after is not None:
+            where = """AND (r.score < :after_score
+                OR (r.score = :after_score AND p.id_product > :after_id))"""
+
+        return f"""
+            SELECT p.id_product, p.sku, p.name, p.price, p.category_id,
+                   (SELECT COALESCE(SUM(i.quantity), 0) FROM inventario i
+                    WHERE i.id_product = p.id_product) as stock,
+                   r.score
+            FROM (
+                SELECT rowid as id_product,
+                       -bm25(productos_busqueda, 2.0, 1.0, 1.0, 1.0) as score
+                FROM productos_busqueda
+                WHERE productos_busqueda MATCH :query
+            ) r
+            JOIN productos p ON r.id_product = p.id_product
+            WHERE {' AND '.join(conditions)}
+            {where}
+            ORDER BY r.score DESC, p.id_product
+            LIMIT :page_size
+        """
+
+    def get_stats(self):
+        return {"backend": self.name, "path": self.path}
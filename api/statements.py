@@ -0,0 +1,604 @@
+# Registro de sentencias con nombre y texto fijo para los caminos mas usados
+# (actualizaciones de clientes y productos, creacion de ordenes, sesiones).
+# Con un texto fijo por sentencia el cache de sentencias de cada conexion
+# (stmtcachesize) la reutiliza sin volver a enviarla a parsear, y en Oracle
+# queda un solo cursor compartido en lugar de uno por combinacion de campos.
+# parse_report.py busca estas sentencias en v$sql por nombre.
+#
+# Las actualizaciones parciales usan NVL(:campo, campo): un campo que no se
+# envia se enlaza como NULL y conserva su valor.
+
+STATEMENTS = {}
+
+
+def register(name, sql):
+    if name in STATEMENTS:
+        raise ValueError(f"Sentencia registrada dos veces: {name}")
+    STATEMENTS[name] = sql
+    return sql
+
+
+# Clientes
+CLIENT_VERSION = register("client_version", """
+    SELECT TO_CHAR(GREATEST(c.updated_at, ic.updated_at), 'YYYY-MM-DD HH24:MI:SS'),
+           GREATEST(c.ORA_ROWSCN, ic.ORA_ROWSCN)
+    FROM clientes c
+    JOIN informacion_contacto_clientes ic ON c.id_client = ic.id_client
+    WHERE c.id_client = :id
+""")
+
+CLIENT_DETAIL = register("client_detail", """
+    SELECT c.id_client, c.national_document, c.name, c.lastname,
+           ic.phone, ic.email, ic.active, ic.confirmed_email,
+           TO_CHAR(c.created_at, 'YYYY-MM-DD HH24:MI:SS'),
+           TO_CHAR(c.updated_at, 'YYYY-MM-DD HH24:MI:SS')
+    FROM clientes c
+    JOIN informacion_contacto_clientes ic ON c.id_client = ic.id_client
+    WHERE c.id_client = :id
+""")
+
+CLIENT_CREDENTIALS = register("client_credentials", """
+    SELECT c.id_client, c.password
+    FROM clientes c
+    JOIN informacion_contacto_clientes ic ON c.id_client = ic.id_client
+    WHERE c.national_document = :doc
+""")
+
+CLIENT_EXISTS = register("client_exists", """
+    SELECT COUNT(*) FROM clientes WHERE id_client = :id
+""")
+
+EMAIL_TAKEN = register("email_taken", """
+    SELECT COUNT(*) FROM informacion_contacto_clientes
+    WHERE email = :email AND id_client != :id
+""")
+
+DOCUMENT_TAKEN = register("document_taken", """
+    SELECT COUNT(*) FROM clientes
+    WHERE national_document = :doc AND id_client != :id
+""")
+
+UPDATE_CLIENT = register("update_client", """
+    UPDATE clientes
+    SET national_document = NVL(:national_document, national_document),
+        name = NVL(:name, name),
+        lastname = NVL(:lastname, lastname),
+        updated_at = SYSDATE
+    WHERE id_client = :id
+""")
+
+UPDATE_CONTACT = register("update_contact", """
+    UPDATE informacion_contacto_clientes
+    SET phone = NVL(:phone, phone),
+        email = NVL(:email, email),
+        active = NVL(:active, active),
+        confirmed_email = NVL(:confirmed_email, confirmed_email),
+        updated_at = SYSDATE
+    WHERE id_client = :id
+""")
+
+
+# Productos
+CATALOG_VERSION = register("catalog_version", """
+    SELECT TO_CHAR(updated_at, 'YYYY-MM-DD HH24:MI:SS'), version
+    FROM catalogo_version
+    WHERE id_catalog = :id
+""")
+
+PRODUCT_VERSION = register("product_version", """
+    SELECT TO_CHAR(updated_at, 'YYYY-MM-DD HH24:MI:SS'), ORA_ROWSCN
+    FROM productos
+    WHERE id_product = :id
+""")
+
+PRODUCT_DETAIL = register("product_detail", """
+    SELECT
+        id_product, sku, name, description, price,
+        slug, category_id, active,
+        TO_CHAR(created_at, 'YYYY-MM-DD HH24:MI:SS'),
+        TO_CHAR(updated_at, 'YYYY-MM-DD HH24:MI:SS')
+    FROM productos
+    WHERE id_product = :id
+""")
+
+# Categorias con el resumen que mantienen los triggers de la migracion 009
+CATEGORIES = register("categories", """
+    SELECT c.id_categories as id_category, c.name,
+           COALESCE(r.active_products, 0) as active_products,
+           COALESCE(r.in_stock_products, 0) + COALESCE(q.delta, 0) as in_stock_products,
+           r.min_price, r.max_price
+    FROM categorias c
+    LEFT JOIN resumen_categorias r ON c.id_categories = r.id_category
+    LEFT JOIN (
+        SELECT id_category, SUM(delta) as delta
+        FROM resumen_categorias_stock
+        GROUP BY id_category
+    ) q ON c.id_categories = q.id_category
+    ORDER BY c.name, c.id_categories
+""")
+
+CATEGORY = register("category", """
+    SELECT id_categories, name FROM categorias WHERE id_categories = :id
+""")
+
+PRODUCT_EXISTS = register("product_exists", """
+    SELECT COUNT(*) FROM productos WHERE id_product = :id
+""")
+
+SKU_EXISTS = register("sku_exists", """
+    SELECT COUNT(*) FROM productos WHERE sku = :sku
+""")
+
+SKU_TAKEN = register("sku_taken", """
+    SELECT COUNT(*) FROM productos
+    WHERE sku = :sku AND id_product != :id
+""")
+
+UPDATE_PRODUCT = register("update_product", """
+    UPDATE productos
+    SET sku = NVL(:sku, sku),
+        name = NVL(:name, name),
+        description = NVL(:description, description),
+        price = NVL(:price, price),
+        slug = NVL(:slug, slug),
+        category_id = NVL(:category_id, category_id),
+        active = NVL(:active, active),
+        updated_at = SYSDATE
+    WHERE id_product = :id
+""")
+
+# Respuesta de PUT /products/{id}: el producto con su inventario
+PRODUCT_WITH_INVENTORY = register("product_with_inventory", """
+    SELECT 
+        p.id_product, p.sku, p.name, p.description, p.price, 
+        p.slug, p.category_id, p.active,
+        TO_CHAR(p.created_at, 'YYYY-MM-DD HH24:MI:SS'),
+        TO_CHAR(p.updated_at, 'YYYY-MM-DD HH24:MI:SS'),
+        i.id_location, i.quantity
+    FROM productos p
+    LEFT JOIN inventario i ON p.id_product = i.id_product
+    WHERE p.id_product = :id
+""")
+
+PRODUCT_HAS_INVENTORY = register("product_has_inventory", """
+    SELECT COUNT(*) FROM inventario WHERE id_product = :id
+""")
+
+UPDATE_INVENTORY = register("update_inventory", """
+    UPDATE inventario
+    SET id_location = NVL(:id_location, id_location),
+        quantity = NVL(:quantity, quantity),
+        updated_at = SYSDATE
+    WHERE id_product = :id
+""")
+
+# quantity toma el default de la tabla (0) si no se envia
+INSERT_INVENTORY = register("insert_inventory", """
+    INSERT INTO inventario (
+        id_inventory,
+        id_product,
+        id_location,
+        quantity,
+        created_at,
+        updated_at
+    ) VALUES (
+        :new_id,
+        :id,
+        :id_location,
+        NVL(:quantity, 0),
+        SYSDATE,
+        SYSDATE
+    )
+""")
+
+# Un producto solo se borra si no tiene ordenes, movimientos ni imagenes
+PRODUCT_HAS_ORDERS = register("product_has_orders", """
+    SELECT COUNT(*) FROM ordenes_productos WHERE id_product = :id
+""")
+
+PRODUCT_HAS_MOVEMENTS = register("product_has_movements", """
+    SELECT COUNT(*) FROM movimientos_productos WHERE id_product = :id
+""")
+
+PRODUCT_HAS_IMAGES = register("product_has_images", """
+    SELECT COUNT(*) FROM imagenes WHERE id_product = :id
+""")
+
+DELETE_PRODUCT_INVENTORY = register("delete_product_inventory", """
+    DELETE FROM inventario WHERE id_product = :id
+""")
+
+DELETE_PRODUCT = register("delete_product", """
+    DELETE FROM productos WHERE id_product = :id
+""")
+
+INSERT_PRODUCT = register("insert_product", """
+    INSERT INTO productos (
+        id_product,
+        sku,
+        name,
+        description,
+        price,
+        slug,
+        category_id,
+        active,
+        created_at,
+        updated_at
+    ) VALUES (
+        :id,
+        :sku,
+        :name,
+        :description,
+        :price,
+        :slug,
+        :category_id,
+        :active,
+        SYSDATE,
+        SYSDATE
+    )
+""")
+
+INSERT_IMAGE = register("insert_image", """
+    INSERT INTO imagenes (
+        id_img,
+        id_product,
+        image,
+        created_at,
+        updated_at
+    ) VALUES (
+        :new_id,
+        :id,
+        :image,
+        SYSDATE,
+        SYSDATE
+    )
+""")
+
+# Carga masiva del catalogo: ids de las categorias por nombre
+CATEGORIES_BY_NAME = register("categories_by_name", """
+    SELECT id_categories, LOWER(name)
+    FROM categorias
+    WHERE LOWER(name) IN (
+        SELECT column_value FROM TABLE(CAST(:names AS SYS.ODCIVARCHAR2LIST))
+    )
+""")
+
+BUMP_CATALOG_VERSION = register("bump_catalog_version", """
+    UPDATE catalogo_version
+    SET version = version + 1,
+        updated_at = SYSDATE
+    WHERE id_catalog = 1
+""")
+
+
+# Ordenes
+CLIENT_PAYMENT_METHOD = register("client_payment_method", """
+    SELECT COUNT(*)
+    FROM metodos_pago_cliente
+    WHERE id_client = :id_client
+    AND id_payment_method = :id_payment_method
+""")
+
+LOAD_STOCK = register("load_stock", """
+    SELECT p.id_product, s.id_location, p.price, p.active, s.quantity as stock
+    FROM productos p
+    JOIN stock_sedes s ON p.id_product = s.id_product
+    WHERE p.id_product IN (
+        SELECT column_value FROM TABLE(CAST(:product_ids AS SYS.ODCINUMBERLIST))
+    )
+    AND s.id_location IN (
+        SELECT column_value FROM TABLE(CAST(:location_ids AS SYS.ODCINUMBERLIST))
+    )
+""")
+
+# Referencias de una carga masiva de ordenes
+ORDER_CLIENTS = register("order_clients", """
+    SELECT id_client
+    FROM clientes
+    WHERE id_client IN (
+        SELECT column_value FROM TABLE(CAST(:client_ids AS SYS.ODCINUMBERLIST))
+    )
+""")
+
+ORDER_PAYMENT_METHODS = register("order_payment_methods", """
+    SELECT id_client, id_payment_method
+    FROM metodos_pago_cliente
+    WHERE id_client IN (
+        SELECT column_value FROM TABLE(CAST(:client_ids AS SYS.ODCINUMBERLIST))
+    )
+""")
+
+# Productos de las ordenes de una pagina de GET /orders
+ORDER_LINES = register("order_lines", """
+    SELECT 
+        op.id_order,
+        op.id_product,
+        p.name as product_name,
+        op.quantity,
+        op.price,
+        (op.quantity * op.price) as subtotal
+    FROM ordenes_productos op
+    JOIN productos p ON op.id_product = p.id_product
+    WHERE op.id_order IN (SELECT column_value FROM TABLE(CAST(:order_ids AS SYS.ODCINUMBERLIST)))
+    ORDER BY op.id_order, op.id_order_product
+""")
+
+INSERT_ORDER = register("insert_order", """
+    INSERT INTO ordenes (
+        id_order,
+        id_client,
+        id_location,
+        created_at,
+        updated_at
+    ) VALUES (
+        :id,
+        :id_client,
+        :id_location,
+        SYSDATE,
+        SYSDATE
+    )
+""")
+
+INSERT_ORDER_LINE = register("insert_order_line", """
+    INSERT INTO ordenes_productos (
+        id_order_product,
+        id_order,
+        id_product,
+        quantity,
+        price,
+        created_at,
+        updated_at
+    ) VALUES (
+        :id,
+        :id_order,
+        :id_product,
+        :quantity,
+        :price,
+        SYSDATE,
+        SYSDATE
+    )
+""")
+
+INSERT_ORDER_PAYMENT = register("insert_order_payment", """
+    INSERT INTO pagos_ordenes (
+        id_order_payment,
+        id_order,
+        id_payment_method,
+        status,
+        total_amount,
+        created_at,
+        updated_at
+    ) VALUES (
+        :id,
+        :id_order,
+        :id_payment_method,
+        'PENDING',
+        :total_amount,
+        SYSDATE,
+        SYSDATE
+    )
+""")
+
+# Descuento condicional, ver reservations.reserve
+RESERVE_STOCK = register("reserve_stock", """
+    UPDATE inventario
+    SET quantity = quantity - :quantity,
+        updated_at = SYSDATE
+    WHERE id_product = :id_product
+    AND id_location = :id_location
+    AND quantity >= :quantity
+""")
+
+
+# Sesiones (SESSION_BACKEND=oracle, ver sessions.py)
+SESSION_CLIENT = register("session_client", """
+    SELECT id_client FROM sesiones
+    WHERE token_hash = :token_hash AND expires_at > SYSDATE
+""")
+
+INSERT_SESSION = register("insert_session", """
+    INSERT INTO sesiones (
+        token_hash,
+        id_client,
+        created_at,
+        expires_at
+    ) VALUES (
+        :token_hash,
+        :id_client,
+        SYSDATE,
+        SYSDATE + :ttl / 86400
+    )
+""")
+
+DELETE_EXPIRED_SESSIONS = register("delete_expired_sessions", """
+    DELETE FROM sesiones
+    WHERE id_client = :id_client AND expires_at <= SYSDATE
+""")
+
+REFRESH_SESSION = register("refresh_session", """
+    UPDATE sesiones
+    SET expires_at = SYSDATE + :ttl / 86400
+    WHERE token_hash = :token_hash AND expires_at > SYSDATE
+""")
+
+DELETE_SESSION = register("delete_session", """
+    DELETE FROM sesiones WHERE token_hash = :token_hash
+""")
+
+DELETE_CLIENT_SESSIONS = register("delete_client_sessions", """
+    DELETE FROM sesiones WHERE id_client = :id_client
+""")
+
+# Hash nuevo al iniciar sesion; solo si nadie cambio la contraseña entre la
+# lectura y esta escritura
+REHASH_PASSWORD = register("rehash_password", """
+    UPDATE clientes
+    SET password = :new_hash
+    WHERE id_client = :id AND password = :old_hash
+""")
+
+# Alta de un cliente con su contacto y commit en una sola llamada. Los
+# duplicados los rechazan las restricciones unicas (migracion 001)
+REGISTER_CLIENT = register("register_client", """
+    BEGIN
+        INSERT INTO clientes (
+            id_client,
+            national_document,
+            name,
+            lastname,
+            password,
+            created_at,
+            updated_at
+        ) VALUES (
+            :id,
+            :doc,
+            :nombre,
+            :apellido,
+            :pwd,
+            SYSDATE,
+            SYSDATE
+        );
+
+        INSERT INTO informacion_contacto_clientes (
+            id_inf_client,
+            id_client,
+            phone,
+            email,
+            active,
+            confirmed_email,
+            created_at,
+            updated_at
+        ) VALUES (
+            :id_inf,
+            :id,
+            :phone,
+            :email,
+            :active,
+            :confirmed_email,
+            SYSDATE,
+            SYSDATE
+        );
+
+        COMMIT;
+    END;
+""")
+
+
+# Detalle de orden en una consulta: version (para el ETag) y el documento
+# de la respuesta armado por Oracle con JSON_OBJECT / JSON_ARRAYAGG
+ORDER_DETAIL = register("order_detail", """
+    SELECT
+        TO_CHAR(GREATEST(o.updated_at, c.updated_at, po.updated_at,
+                         NVL(oe.updated_at, o.updated_at)),
+                'YYYY-MM-DD HH24:MI:SS'),
+        GREATEST(o.ORA_ROWSCN, c.ORA_ROWSCN, po.ORA_ROWSCN,
+                 NVL(oe.ORA_ROWSCN, 0)),
+        JSON_OBJECT(
+            'order_id' VALUE o.id_order,
+            'client' VALUE JSON_OBJECT(
+                'id' VALUE o.id_client,
+                'name' VALUE c.name || ' ' || c.lastname,
+                'document' VALUE c.national_document
+            ),
+            'location' VALUE JSON_OBJECT(
+                'id' VALUE o.id_location,
+                'name' VALUE s.name
+            ),
+            'created_at' VALUE TO_CHAR(o.created_at, 'YYYY-MM-DD HH24:MI:SS'),
+            'updated_at' VALUE TO_CHAR(o.updated_at, 'YYYY-MM-DD HH24:MI:SS'),
+            'payment' VALUE JSON_OBJECT(
+                'method' VALUE pm.payment_method,
+                'method_id' VALUE pm.id_payment_method,
+                'status' VALUE po.status,
+                'total_amount' VALUE po.total_amount,
+                'calculated_total' VALUE NVL(l.calculated_total, 0)
+            ),
+            'products' VALUE NVL(l.products, '[]') FORMAT JSON
+            RETURNING CLOB
+        )
+    FROM ordenes o
+    JOIN clientes c ON o.id_client = c.id_client
+    JOIN pagos_ordenes po ON o.id_order = po.id_order
+    JOIN metodos_pago pm ON po.id_payment_method = pm.id_payment_method
+    LEFT JOIN ordenes_entregadas oe ON o.id_order = oe.id_order
+    LEFT JOIN sedes s ON o.id_location = s.id_site
+    LEFT JOIN (
+        SELECT
+            op.id_order,
+            SUM(op.quantity * op.price) as calculated_total,
+            JSON_ARRAYAGG(
+                JSON_OBJECT(
+                    'id_order_product' VALUE op.id_order_product,
+                    'id_product' VALUE op.id_product,
+                    'product_name' VALUE p.name,
+                    'product_description' VALUE p.description,
+                    'product_sku' VALUE p.sku,
+                    'quantity' VALUE op.quantity,
+                    'unit_price' VALUE op.price,
+                    'subtotal' VALUE op.quantity * op.price,
+                    'added_at' VALUE TO_CHAR(op.created_at, 'YYYY-MM-DD HH24:MI:SS'),
+                    'updated_at' VALUE TO_CHAR(op.updated_at, 'YYYY-MM-DD HH24:MI:SS')
+                )
+                ORDER BY op.id_order_product
+                RETURNING CLOB
+            ) as products
+        FROM ordenes_productos op
+        JOIN productos p ON op.id_product = p.id_product
+        WHERE op.id_order = :id
+        GROUP BY op.id_order
+    ) l ON o.id_order = l.id_order
+    WHERE o.id_order = :id
+""")
+
+
+# Pagos: todo lo que valida create_payment en una consulta. Sin filas la
+# orden no existe; las columnas nulas indican que falta el metodo o el pago
+PAYMENT_LOOKUP = register("payment_lookup", """
+    SELECT
+        o.id_client,
+        pm.id_payment_method,
+        (
+            SELECT COUNT(*)
+            FROM metodos_pago_cliente mpc
+            WHERE mpc.id_client = o.id_client
+            AND mpc.id_payment_method = pm.id_payment_method
+        ) as method_linked,
+        po.status,
+        po.total_amount
+    FROM ordenes o
+    LEFT JOIN metodos_pago pm ON LOWER(pm.payment_method) = LOWER(:method)
+    LEFT JOIN pagos_ordenes po ON o.id_order = po.id_order
+    WHERE o.id_order = :order_id
+""")
+
+# Marca la orden como pagada y registra el pago con commit en una llamada.
+# :paid queda en 0 si otra peticion ya la pago (no se escribe nada)
+PAY_ORDER = register("pay_order", """
+    BEGIN
+        UPDATE pagos_ordenes
+        SET
+            status = 'PAID',
+            updated_at = SYSDATE
+        WHERE id_order = :order_id
+        AND status != 'PAID';
+
+        :paid := SQL%ROWCOUNT;
+
+        IF :paid > 0 THEN
+            INSERT INTO pagos (
+                id_payments,
+                id_client,
+                id_payment_method,
+                created_at,
+                updated_at
+            ) VALUES (
+                :id,
+                :client_id,
+                :method_id,
+                SYSDATE,
+                SYSDATE
+            );
+            COMMIT;
+        END IF;
+    END;
+""")
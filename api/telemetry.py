@@ -0,0 +1,261 @@
+import contextvars
+import math
+import time
+
+# Metricas por endpoint: latencia (histograma), round-trips y filas de la
+# base, espera por una conexion del pool y tiempo de bcrypt. Se exponen en
+# /metrics (formato de texto de Prometheus) y en el header Server-Timing.
+
+# Limites (segundos) de los buckets del histograma de latencia
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class RequestStats:
+    # Lo que consume una peticion, se acumula mientras se atiende
+
+    def __init__(self):
+        self.round_trips = 0
+        self.rows = 0
+        self.db_seconds = 0.0
+        self.acquire_seconds = 0.0
+        self.bcrypt_seconds = 0.0
+
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+def current():
+    # Estadisticas de la peticion en curso o None fuera de una peticion
+    return _current.get()
+
+
+def record(field, value):
+    stats = _current.get()
+    if stats is not None:
+        setattr(stats, field, getattr(stats, field) + value)
+
+
+class EndpointStats:
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.seconds = 0.0
+        self.statuses = {}
+        self.round_trips = 0
+        self.rows = 0
+        self.db_seconds = 0.0
+        self.acquire_seconds = 0.0
+        self.bcrypt_seconds = 0.0
+
+    def observe(self, elapsed, status, stats):
+        for i, limit in enumerate(LATENCY_BUCKETS):
+            if elapsed <= limit:
+                self.buckets[i] += 1
+        self.count += 1
+        self.seconds += elapsed
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.round_trips += stats.round_trips
+        self.rows += stats.rows
+        self.db_seconds += stats.db_seconds
+        self.acquire_seconds += stats.acquire_seconds
+        self.bcrypt_seconds += stats.bcrypt_seconds
+
+
+# (metodo, ruta) -> EndpointStats
+endpoints = {}
+
+
+def server_timing(stats, elapsed):
+    # Header Server-Timing, duraciones en milisegundos
+    return ", ".join([
+        f"app;dur={elapsed * 1000:.1f}",
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.round_trips} round-trips, {stats.rows} filas"',
+        f"acquire;dur={stats.acquire_seconds * 1000:.1f}",
+        f"bcrypt;dur={stats.bcrypt_seconds * 1000:.1f}"
+    ])
+
+
+class TelemetryMiddleware:
+    # Middleware ASGI: mide cada peticion HTTP y agrega Server-Timing
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = server_timing(stats, time.perf_counter() - start)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", header.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            # La ruta queda en el scope despues del ruteo de FastAPI
+            route = scope.get("route")
+            key = (scope["method"], route.path if route else "unmatched")
+            endpoint = endpoints.get(key)
+            if endpoint is None:
+                endpoint = endpoints[key] = EndpointStats()
+            endpoint.observe(time.perf_counter() - start, status, stats)
+
+
+class InstrumentedCursor:
+    # Envuelve un AsyncCursor y cuenta round-trips, filas y tiempo en la base.
+    # Cada execute/executemany es un round-trip (incluye las primeras
+    # prefetchrows filas); las filas siguientes se traen de arraysize en
+    # arraysize, cada bloque es otro round-trip.
+
+    def __init__(self, cursor):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_fetched", 0)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+    async def _timed(self, call, round_trips):
+        start = time.perf_counter()
+        try:
+            return await call
+        finally:
+            record("db_seconds", time.perf_counter() - start)
+            record("round_trips", round_trips)
+
+    async def execute(self, *args, **kwargs):
+        object.__setattr__(self, "_fetched", 0)
+        await self._timed(self._cursor.execute(*args, **kwargs), 1)
+
+    async def executemany(self, *args, **kwargs):
+        await self._timed(self._cursor.executemany(*args, **kwargs), 1)
+
+    def _fetch_round_trips(self, rows):
+        # Bloques que hubo que pedir para traer estas filas
+        before = self._fetched
+        after = before + rows
+        object.__setattr__(self, "_fetched", after)
+        prefetch = self._cursor.prefetchrows
+        arraysize = max(1, self._cursor.arraysize)
+        blocks = lambda fetched: math.ceil(max(0, fetched - prefetch) / arraysize)
+        return blocks(after) - blocks(before)
+
+    async def _fetch(self, call, rows_of):
+        start = time.perf_counter()
+        result = await call
+        rows = rows_of(result)
+        record("db_seconds", time.perf_counter() - start)
+        record("rows", rows)
+        record("round_trips", self._fetch_round_trips(rows))
+        return result
+
+    async def fetchone(self):
+        return await self._fetch(
+            self._cursor.fetchone(), lambda row: 0 if row is None else 1)
+
+    async def fetchmany(self, *args, **kwargs):
+        return await self._fetch(self._cursor.fetchmany(*args, **kwargs), len)
+
+    async def fetchall(self):
+        return await self._fetch(self._cursor.fetchall(), len)
+
+    def close(self):
+        self._cursor.close()
+
+
+class InstrumentedConnection:
+    # Envuelve una AsyncConnection: sus cursores cuentan round-trips y
+    # commit/rollback tambien se cuentan
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def cursor(self):
+        return InstrumentedCursor(self._connection.cursor())
+
+    async def _timed(self, call):
+        start = time.perf_counter()
+        try:
+            return await call
+        finally:
+            record("db_seconds", time.perf_counter() - start)
+            record("round_trips", 1)
+
+    async def commit(self):
+        await self._timed(self._connection.commit())
+
+    async def rollback(self):
+        await self._timed(self._connection.rollback())
+
+
+def _labels(method, path, **extra):
+    labels = {"method": method, "route": path, **extra}
+    return "{" + ",".join(
+        f'{name}="{str(value)}"' for name, value in labels.items()) + "}"
+
+
+def render(gauges=None):
+    # Texto de /metrics. gauges: {"cache": {"hits": 3, ...}, ...} se agregan
+    # como api_<grupo>_<campo> (solo los valores numericos)
+    lines = [
+        "# HELP api_request_duration_seconds Latencia de las peticiones por endpoint",
+        "# TYPE api_request_duration_seconds histogram"
+    ]
+    for (method, path), endpoint in sorted(endpoints.items()):
+        for limit, count in zip(LATENCY_BUCKETS, endpoint.buckets):
+            lines.append(
+                f"api_request_duration_seconds_bucket{_labels(method, path, le=limit)} {count}")
+        lines.append(
+            f"api_request_duration_seconds_bucket{_labels(method, path, le='+Inf')} {endpoint.count}")
+        lines.append(
+            f"api_request_duration_seconds_sum{_labels(method, path)} {endpoint.seconds}")
+        lines.append(
+            f"api_request_duration_seconds_count{_labels(method, path)} {endpoint.count}")
+
+    lines += [
+        "# HELP api_requests_total Peticiones por endpoint y codigo de respuesta",
+        "# TYPE api_requests_total counter"
+    ]
+    for (method, path), endpoint in sorted(endpoints.items()):
+        for status, count in sorted(endpoint.statuses.items()):
+            lines.append(
+                f"api_requests_total{_labels(method, path, status=status)} {count}")
+
+    counters = [
+        ("api_db_round_trips_total", "round_trips", "Round-trips a Oracle (estimados)"),
+        ("api_db_rows_total", "rows", "Filas leidas de Oracle"),
+        ("api_db_seconds_total", "db_seconds", "Tiempo esperando a Oracle"),
+        ("api_pool_acquire_seconds_total", "acquire_seconds", "Espera por una conexion del pool"),
+        ("api_bcrypt_seconds_total", "bcrypt_seconds", "Tiempo de bcrypt (cola y calculo)")
+    ]
+    for name, field, description in counters:
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} counter"]
+        for (method, path), endpoint in sorted(endpoints.items()):
+            lines.append(
+                f"{name}{_labels(method, path)} {getattr(endpoint, field)}")
+
+    for group, values in (gauges or {}).items():
+        for field, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                name = f"api_{group}_{field}"
+                lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+
+    return "\n".join(lines) + "\n"
@@ -234,3 +234,29 @@ CREATE TABLE metodos_pago_cliente (
     created_at DATE DEFAULT SYSDATE,
     updated_at DATE DEFAULT SYSDATE
 );
+
+-- Secuencias para las llaves primarias (reemplazan SELECT MAX(id) + 1).
+-- INCREMENT BY 20 debe coincidir con KEY_BLOCK_SIZE en api/keys.py: cada
+-- NEXTVAL reserva un bloque de 20 ids que la api reparte en memoria.
+-- Empiezan despues del id maximo actual para no chocar con datos cargados.
+DECLARE
+    PROCEDURE crear_secuencia(p_secuencia VARCHAR2, p_tabla VARCHAR2, p_columna VARCHAR2) IS
+        v_inicio INTEGER;
+    BEGIN
+        EXECUTE IMMEDIATE 'SELECT COALESCE(MAX(' || p_columna || '), 0) + 1 FROM ' || p_tabla
+            INTO v_inicio;
+        EXECUTE IMMEDIATE 'CREATE SEQUENCE ' || p_secuencia
+            || ' START WITH ' || v_inicio
+            || ' INCREMENT BY 20 CACHE 50 NOCYCLE';
+    END;
+BEGIN
+    crear_secuencia('seq_clientes', 'clientes', 'id_client');
+    crear_secuencia('seq_informacion_contacto_clientes', 'informacion_contacto_clientes', 'id_inf_client');
+    crear_secuencia('seq_productos', 'productos', 'id_product');
+    crear_secuencia('seq_inventario', 'inventario', 'id_inventory');
+    crear_secuencia('seq_ordenes', 'ordenes', 'id_order');
+    crear_secuencia('seq_ordenes_productos', 'ordenes_productos', 'id_order_product');
+    crear_secuencia('seq_pagos_ordenes', 'pagos_ordenes', 'id_order_payment');
+    crear_secuencia('seq_pagos', 'pagos', 'id_payments');
+END;
+/
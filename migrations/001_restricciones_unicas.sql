@@ -0,0 +1,10 @@
+-- Restricciones unicas para los campos que la api valida antes de insertar.
+-- Tambien crean el indice que usan esas validaciones.
+ALTER TABLE clientes
+    ADD CONSTRAINT uq_clients_national_document UNIQUE (national_document);
+
+ALTER TABLE informacion_contacto_clientes
+    ADD CONSTRAINT uq_inf_client_email UNIQUE (email);
+
+ALTER TABLE productos
+    ADD CONSTRAINT uq_product_sku UNIQUE (sku);
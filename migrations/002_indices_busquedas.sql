@@ -0,0 +1,16 @@
+-- Indices para las busquedas que hace la api por columnas que no son llave primaria.
+
+-- login, get_client, delete_client
+CREATE INDEX ix_inf_client_client ON informacion_contacto_clientes (id_client);
+
+-- stock por producto y sede (get_products, create_order)
+CREATE INDEX ix_inventory_product_location ON inventario (id_product, id_location);
+
+-- lineas de una orden (get_orders, get_order_detail)
+CREATE INDEX ix_order_product_order ON ordenes_productos (id_order);
+
+-- pago de una orden (create_payment, update_order_status)
+CREATE INDEX ix_order_payment_order ON pagos_ordenes (id_order);
+
+-- metodo de pago asociado al cliente (create_order, create_payment)
+CREATE INDEX ix_client_payment_methods ON metodos_pago_cliente (id_client, id_payment_method);
@@ -0,0 +1,13 @@
+-- Indices para la paginacion por llave y los filtros de los listados.
+
+-- /payments ordena por (created_at, id_order_payment)
+CREATE INDEX ix_order_payment_created ON pagos_ordenes (created_at, id_order_payment);
+
+-- filtros por cliente y fecha en /orders
+CREATE INDEX ix_order_client ON ordenes (id_client, id_order);
+CREATE INDEX ix_order_created ON ordenes (created_at);
+
+-- validaciones de delete_product
+CREATE INDEX ix_order_product_product ON ordenes_productos (id_product);
+CREATE INDEX ix_movements_product_product ON movimientos_productos (id_product);
+CREATE INDEX ix_img_product ON imagenes (id_product);
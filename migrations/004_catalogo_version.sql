@@ -0,0 +1,12 @@
+-- Version de todo el catalogo (productos e inventario) para el ETag de
+-- GET /products. La api la incrementa justo antes del commit de cada cambio.
+CREATE TABLE catalogo_version (
+    id_catalog INTEGER NOT NULL,
+    CONSTRAINT pk_catalog_version PRIMARY KEY (id_catalog),
+    version INTEGER NOT NULL,
+    updated_at DATE DEFAULT SYSDATE
+);
+
+INSERT INTO catalogo_version (id_catalog, version, updated_at) VALUES (1, 1, SYSDATE);
+
+COMMIT;
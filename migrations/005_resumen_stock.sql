@@ -0,0 +1,89 @@
+-- Resumen de stock por producto y por producto/sede. Lo mantiene un trigger
+-- sobre inventario, asi leer el stock es buscar una fila en lugar de hacer
+-- SUM(quantity) ... GROUP BY sobre inventario en cada peticion.
+-- inventory_rows cuenta las filas de inventario resumidas, cuando llega a 0
+-- la fila del resumen se borra.
+CREATE TABLE stock_productos (
+    id_product INTEGER NOT NULL,
+    CONSTRAINT pk_stock_products PRIMARY KEY (id_product),
+    quantity INTEGER DEFAULT 0 NOT NULL,
+    inventory_rows INTEGER DEFAULT 0 NOT NULL
+);
+
+CREATE TABLE stock_sedes (
+    id_product INTEGER NOT NULL,
+    id_location INTEGER NOT NULL,
+    CONSTRAINT pk_stock_locations PRIMARY KEY (id_product, id_location),
+    quantity INTEGER DEFAULT 0 NOT NULL,
+    inventory_rows INTEGER DEFAULT 0 NOT NULL
+);
+
+INSERT INTO stock_productos (id_product, quantity, inventory_rows)
+SELECT id_product, COALESCE(SUM(quantity), 0), COUNT(*)
+FROM inventario
+GROUP BY id_product;
+
+INSERT INTO stock_sedes (id_product, id_location, quantity, inventory_rows)
+SELECT id_product, id_location, COALESCE(SUM(quantity), 0), COUNT(*)
+FROM inventario
+WHERE id_location IS NOT NULL
+GROUP BY id_product, id_location;
+
+COMMIT;
+
+CREATE OR REPLACE TRIGGER trg_inventario_stock
+AFTER INSERT OR UPDATE OR DELETE ON inventario
+FOR EACH ROW
+DECLARE
+    PROCEDURE ajustar(p_product INTEGER, p_location INTEGER, p_quantity INTEGER, p_rows INTEGER) IS
+    BEGIN
+        MERGE INTO stock_productos s
+        USING (SELECT p_product AS id_product FROM dual) d
+        ON (s.id_product = d.id_product)
+        WHEN MATCHED THEN UPDATE
+            SET s.quantity = s.quantity + p_quantity,
+                s.inventory_rows = s.inventory_rows + p_rows
+        WHEN NOT MATCHED THEN INSERT (id_product, quantity, inventory_rows)
+            VALUES (p_product, p_quantity, p_rows);
+
+        IF p_rows < 0 THEN
+            DELETE FROM stock_productos
+            WHERE id_product = p_product AND inventory_rows = 0;
+        END IF;
+
+        IF p_location IS NOT NULL THEN
+            MERGE INTO stock_sedes s
+            USING (SELECT p_product AS id_product, p_location AS id_location FROM dual) d
+            ON (s.id_product = d.id_product AND s.id_location = d.id_location)
+            WHEN MATCHED THEN UPDATE
+                SET s.quantity = s.quantity + p_quantity,
+                    s.inventory_rows = s.inventory_rows + p_rows
+            WHEN NOT MATCHED THEN INSERT (id_product, id_location, quantity, inventory_rows)
+                VALUES (p_product, p_location, p_quantity, p_rows);
+
+            IF p_rows < 0 THEN
+                DELETE FROM stock_sedes
+                WHERE id_product = p_product AND id_location = p_location
+                AND inventory_rows = 0;
+            END IF;
+        END IF;
+    END;
+BEGIN
+    IF UPDATING
+        AND :OLD.id_product = :NEW.id_product
+        AND DECODE(:OLD.id_location, :NEW.id_location, 1, 0) = 1 THEN
+        -- Solo cambio la cantidad (descontar stock al crear ordenes)
+        IF NVL(:NEW.quantity, 0) <> NVL(:OLD.quantity, 0) THEN
+            ajustar(:NEW.id_product, :NEW.id_location,
+                    NVL(:NEW.quantity, 0) - NVL(:OLD.quantity, 0), 0);
+        END IF;
+    ELSE
+        IF DELETING OR UPDATING THEN
+            ajustar(:OLD.id_product, :OLD.id_location, -NVL(:OLD.quantity, 0), -1);
+        END IF;
+        IF INSERTING OR UPDATING THEN
+            ajustar(:NEW.id_product, :NEW.id_location, NVL(:NEW.quantity, 0), 1);
+        END IF;
+    END IF;
+END;
+/
@@ -0,0 +1,14 @@
+-- Sesiones de los clientes para SESSION_BACKEND=oracle (api/sessions.py).
+-- Se guarda el sha256 del token, no el token. Validar una sesion es buscar
+-- una fila por la llave primaria.
+CREATE TABLE sesiones (
+    token_hash VARCHAR2(64) NOT NULL,
+    CONSTRAINT pk_sessions PRIMARY KEY (token_hash),
+    id_client INTEGER NOT NULL,
+    FOREIGN KEY (id_client) REFERENCES clientes(id_client),
+    created_at DATE DEFAULT SYSDATE,
+    expires_at DATE NOT NULL
+);
+
+-- Cerrar todas las sesiones de un cliente y limpiar sus sesiones vencidas
+CREATE INDEX ix_sessions_client ON sesiones (id_client);
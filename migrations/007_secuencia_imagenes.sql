@@ -0,0 +1,12 @@
+-- Secuencia para imagenes: la carga masiva del catalogo (api/catalog_loader.py)
+-- inserta imagenes desde varios procesos a la vez y MAX(id) + 1 repetiria
+-- ids. INCREMENT BY 20 como las demas secuencias (KEY_BLOCK_SIZE en
+-- api/keys.py), empieza despues del id maximo actual.
+DECLARE
+    v_inicio INTEGER;
+BEGIN
+    SELECT COALESCE(MAX(id_img), 0) + 1 INTO v_inicio FROM imagenes;
+    EXECUTE IMMEDIATE 'CREATE SEQUENCE seq_imagenes START WITH ' || v_inicio
+        || ' INCREMENT BY 20 CACHE 50 NOCYCLE';
+END;
+/
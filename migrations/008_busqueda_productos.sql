@@ -0,0 +1,41 @@
+-- Busqueda de productos (GET /products/search) con Oracle Text. Un indice
+-- CONTEXT sobre name que indexa name, description, slug y sku (cada columna
+-- es una seccion, para dar mas peso a name). FILTER BY deja category_id,
+-- price y active dentro del indice: los filtros y el orden por SCORE se
+-- resuelven sin leer productos. El indice se sincroniza en cada commit;
+-- UPDATE_PRODUCT siempre asigna name, asi cualquier cambio lo reindexa.
+-- Requiere EXECUTE sobre CTXSYS.CTX_DDL (rol CTXAPP).
+BEGIN
+    CTX_DDL.CREATE_PREFERENCE('productos_busqueda_ds', 'MULTI_COLUMN_DATASTORE');
+    CTX_DDL.SET_ATTRIBUTE('productos_busqueda_ds', 'COLUMNS', 'name, description, slug, sku');
+
+    CTX_DDL.CREATE_SECTION_GROUP('productos_busqueda_sg', 'BASIC_SECTION_GROUP');
+    CTX_DDL.ADD_FIELD_SECTION('productos_busqueda_sg', 'name', 'name', TRUE);
+    CTX_DDL.ADD_FIELD_SECTION('productos_busqueda_sg', 'description', 'description', TRUE);
+    CTX_DDL.ADD_FIELD_SECTION('productos_busqueda_sg', 'slug', 'slug', TRUE);
+    CTX_DDL.ADD_FIELD_SECTION('productos_busqueda_sg', 'sku', 'sku', TRUE);
+
+    -- Sin acentos: "cafe" encuentra "café"
+    CTX_DDL.CREATE_PREFERENCE('productos_busqueda_lx', 'BASIC_LEXER');
+    CTX_DDL.SET_ATTRIBUTE('productos_busqueda_lx', 'BASE_LETTER', 'YES');
+
+    -- Prefijos indexados: el ultimo termino se busca como prefijo ("cami%")
+    -- sin expandir el diccionario en cada consulta
+    CTX_DDL.CREATE_PREFERENCE('productos_busqueda_wl', 'BASIC_WORDLIST');
+    CTX_DDL.SET_ATTRIBUTE('productos_busqueda_wl', 'PREFIX_INDEX', 'TRUE');
+    CTX_DDL.SET_ATTRIBUTE('productos_busqueda_wl', 'PREFIX_MIN_LENGTH', '3');
+    CTX_DDL.SET_ATTRIBUTE('productos_busqueda_wl', 'PREFIX_MAX_LENGTH', '8');
+END;
+/
+
+CREATE INDEX ix_product_search ON productos (name)
+    INDEXTYPE IS CTXSYS.CONTEXT
+    FILTER BY category_id, price, active
+    PARAMETERS ('
+        DATASTORE productos_busqueda_ds
+        SECTION GROUP productos_busqueda_sg
+        LEXER productos_busqueda_lx
+        WORDLIST productos_busqueda_wl
+        STOPLIST CTXSYS.EMPTY_STOPLIST
+        SYNC (ON COMMIT)
+    ');
@@ -0,0 +1,161 @@
+-- Resumen del catalogo por categoria (GET /categories): productos activos,
+-- productos activos con stock y precio minimo y maximo. Lo mantienen
+-- triggers sobre productos y sobre el resumen de stock (005) en la misma
+-- transaccion que el cambio, asi el menu de categorias lee una fila por
+-- categoria en lugar de recorrer productos. Las filas bloqueadas por un
+-- cambio se liberan en el commit, igual que catalogo_version.
+CREATE TABLE resumen_categorias (
+    id_category INTEGER NOT NULL,
+    CONSTRAINT pk_category_summary PRIMARY KEY (id_category),
+    active_products INTEGER DEFAULT 0 NOT NULL,
+    in_stock_products INTEGER DEFAULT 0 NOT NULL,
+    min_price INTEGER,
+    max_price INTEGER,
+    updated_at DATE DEFAULT SYSDATE
+);
+
+-- MIN/MAX de precio al recalcular una categoria
+CREATE INDEX ix_product_category_price ON productos (category_id, active, price);
+
+-- paginas de /categories/{id}/products
+CREATE INDEX ix_product_category ON productos (category_id, active, id_product);
+
+INSERT INTO resumen_categorias (id_category, active_products, in_stock_products, min_price, max_price)
+SELECT p.category_id, COUNT(*), COUNT(CASE WHEN s.quantity > 0 THEN 1 END),
+       MIN(p.price), MAX(p.price)
+FROM productos p
+LEFT JOIN stock_productos s ON p.id_product = s.id_product
+WHERE p.active = 'TRUE'
+GROUP BY p.category_id;
+
+COMMIT;
+
+-- Cambios en productos: se acumulan por categoria durante la sentencia
+-- (una carga masiva escribe una vez por categoria, no por fila). Sumar un
+-- producto solo puede bajar el minimo o subir el maximo; si sale uno
+-- (borrado, desactivado, cambio de precio o de categoria) el MIN/MAX de la
+-- categoria se recalcula con ix_product_category_price al final.
+CREATE OR REPLACE TRIGGER trg_productos_categorias
+FOR INSERT OR UPDATE OR DELETE ON productos
+COMPOUND TRIGGER
+    TYPE cambio IS RECORD (
+        products INTEGER,
+        in_stock INTEGER,
+        min_price INTEGER,
+        max_price INTEGER,
+        recompute BOOLEAN
+    );
+    TYPE cambios_categoria IS TABLE OF cambio INDEX BY PLS_INTEGER;
+    cambios cambios_categoria;
+
+    PROCEDURE acumular(p_category INTEGER, p_product INTEGER, p_price INTEGER, p_sign INTEGER) IS
+        v_in_stock INTEGER;
+    BEGIN
+        IF NOT cambios.EXISTS(p_category) THEN
+            cambios(p_category).products := 0;
+            cambios(p_category).in_stock := 0;
+            cambios(p_category).recompute := FALSE;
+        END IF;
+
+        SELECT COUNT(*) INTO v_in_stock
+        FROM stock_productos
+        WHERE id_product = p_product AND quantity > 0;
+
+        cambios(p_category).products := cambios(p_category).products + p_sign;
+        cambios(p_category).in_stock := cambios(p_category).in_stock + p_sign * v_in_stock;
+        IF p_sign < 0 THEN
+            cambios(p_category).recompute := TRUE;
+        ELSE
+            cambios(p_category).min_price := LEAST(NVL(cambios(p_category).min_price, p_price), p_price);
+            cambios(p_category).max_price := GREATEST(NVL(cambios(p_category).max_price, p_price), p_price);
+        END IF;
+    END;
+
+    AFTER EACH ROW IS
+    BEGIN
+        -- UPDATE_PRODUCT asigna todas las columnas: si no cambia nada del
+        -- resumen no se acumula
+        IF NOT (UPDATING
+                AND :OLD.category_id = :NEW.category_id
+                AND :OLD.active = :NEW.active
+                AND :OLD.price = :NEW.price) THEN
+            IF (DELETING OR UPDATING) AND :OLD.active = 'TRUE' THEN
+                acumular(:OLD.category_id, :OLD.id_product, :OLD.price, -1);
+            END IF;
+            IF (INSERTING OR UPDATING) AND :NEW.active = 'TRUE' THEN
+                acumular(:NEW.category_id, :NEW.id_product, :NEW.price, 1);
+            END IF;
+        END IF;
+    END AFTER EACH ROW;
+
+    AFTER STATEMENT IS
+        v_category INTEGER;
+        v_products INTEGER;
+        v_in_stock INTEGER;
+        v_min_price INTEGER;
+        v_max_price INTEGER;
+    BEGIN
+        v_category := cambios.FIRST;
+        WHILE v_category IS NOT NULL LOOP
+            v_products := cambios(v_category).products;
+            v_in_stock := cambios(v_category).in_stock;
+            v_min_price := cambios(v_category).min_price;
+            v_max_price := cambios(v_category).max_price;
+
+            MERGE INTO resumen_categorias r
+            USING (SELECT v_category AS id_category FROM dual) d
+            ON (r.id_category = d.id_category)
+            WHEN MATCHED THEN UPDATE
+                SET r.active_products = r.active_products + v_products,
+                    r.in_stock_products = r.in_stock_products + v_in_stock,
+                    r.min_price = LEAST(NVL(r.min_price, v_min_price), NVL(v_min_price, r.min_price)),
+                    r.max_price = GREATEST(NVL(r.max_price, v_max_price), NVL(v_max_price, r.max_price)),
+                    r.updated_at = SYSDATE
+            WHEN NOT MATCHED THEN INSERT (id_category, active_products, in_stock_products, min_price, max_price)
+                VALUES (v_category, v_products, v_in_stock, v_min_price, v_max_price);
+
+            IF cambios(v_category).recompute THEN
+                UPDATE resumen_categorias
+                SET min_price = (SELECT MIN(price) FROM productos
+                                 WHERE category_id = v_category AND active = 'TRUE'),
+                    max_price = (SELECT MAX(price) FROM productos
+                                 WHERE category_id = v_category AND active = 'TRUE')
+                WHERE id_category = v_category;
+            END IF;
+
+            v_category := cambios.NEXT(v_category);
+        END LOOP;
+        cambios.DELETE;
+    END AFTER STATEMENT;
+END;
+/
+
+-- Un producto activo entra o sale de in_stock_products cuando su stock
+-- pasa de 0 a positivo o al reves (el resumen de stock lo cambia el
+-- trigger de inventario)
+CREATE OR REPLACE TRIGGER trg_stock_categorias
+AFTER INSERT OR UPDATE OR DELETE ON stock_productos
+FOR EACH ROW
+DECLARE
+    v_before INTEGER := 0;
+    v_after INTEGER := 0;
+BEGIN
+    IF (DELETING OR UPDATING) AND :OLD.quantity > 0 THEN
+        v_before := 1;
+    END IF;
+    IF (INSERTING OR UPDATING) AND :NEW.quantity > 0 THEN
+        v_after := 1;
+    END IF;
+
+    IF v_after <> v_before THEN
+        UPDATE resumen_categorias
+        SET in_stock_products = in_stock_products + (v_after - v_before),
+            updated_at = SYSDATE
+        WHERE id_category = (
+            SELECT category_id FROM productos
+            WHERE id_product = NVL(:NEW.id_product, :OLD.id_product)
+            AND active = 'TRUE'
+        );
+    END IF;
+END;
+/
@@ -0,0 +1,32 @@
+-- Una fila de inventario por producto y sede. reservations.reserve descuenta
+-- con un UPDATE por (id_product, id_location) y la validacion lee el total
+-- de stock_sedes: con el stock repartido en varias filas el descuento no
+-- encuentra una que alcance (409 falso) o descuenta de todas las que
+-- alcanzan (se descuenta de mas).
+-- Si ya hay pares repetidos la migracion se detiene sin cambiar nada: hay
+-- que unificarlos (sumar las cantidades en una fila) y volver a correrla.
+DECLARE
+    v_duplicates INTEGER;
+BEGIN
+    SELECT COUNT(*) INTO v_duplicates
+    FROM (
+        SELECT id_product, id_location
+        FROM inventario
+        GROUP BY id_product, id_location
+        HAVING COUNT(*) > 1
+    );
+    IF v_duplicates > 0 THEN
+        RAISE_APPLICATION_ERROR(-20010,
+            'inventario tiene ' || v_duplicates ||
+            ' pares (id_product, id_location) repetidos, unificarlos antes de esta migracion');
+    END IF;
+END;
+/
+
+-- El indice unico reemplaza al de la migracion 002 (mismas columnas)
+DROP INDEX ix_inventory_product_location;
+
+CREATE UNIQUE INDEX uq_inventory_product_location ON inventario (id_product, id_location);
+
+ALTER TABLE inventario ADD CONSTRAINT uq_inventory_product_location
+    UNIQUE (id_product, id_location) USING INDEX uq_inventory_product_location;
@@ -0,0 +1,196 @@
+-- Evita deadlocks entre las ordenes y el resumen de categorias (009).
+-- Las ordenes bloquean filas de inventario ordenadas por (producto, sede).
+-- Si el stock de un producto llegaba a 0, trg_stock_categorias bloqueaba
+-- ademas la fila de la categoria a mitad de esa secuencia. Dos ordenes, o
+-- una orden y un cambio de producto (que bloquea la categoria y despues
+-- inventario), podian esperarse en orden inverso (ORA-00060).
+--
+-- Ahora los cambios de in_stock_products que vienen del stock se agregan a
+-- una cola (solo INSERT, sin bloqueos compartidos) y un job los suma a
+-- resumen_categorias cada minuto, en orden de categoria. Las lecturas suman
+-- lo pendiente de la cola, asi el resumen sigue al dia.
+CREATE TABLE resumen_categorias_stock (
+    id_category INTEGER NOT NULL,
+    delta INTEGER NOT NULL,
+    created_at DATE DEFAULT SYSDATE
+);
+
+CREATE OR REPLACE TRIGGER trg_stock_categorias
+AFTER INSERT OR UPDATE OR DELETE ON stock_productos
+FOR EACH ROW
+DECLARE
+    v_before INTEGER := 0;
+    v_after INTEGER := 0;
+BEGIN
+    IF (DELETING OR UPDATING) AND :OLD.quantity > 0 THEN
+        v_before := 1;
+    END IF;
+    IF (INSERTING OR UPDATING) AND :NEW.quantity > 0 THEN
+        v_after := 1;
+    END IF;
+
+    IF v_after <> v_before THEN
+        INSERT INTO resumen_categorias_stock (id_category, delta)
+        SELECT category_id, v_after - v_before
+        FROM productos
+        WHERE id_product = NVL(:NEW.id_product, :OLD.id_product)
+        AND active = 'TRUE';
+    END IF;
+END;
+/
+
+-- El trigger de productos lee el stock con FOR UPDATE. Con la api
+-- escribiendo inventario antes que productos, los dos caminos bloquean en
+-- el mismo orden: inventario, stock_productos, resumen_categorias
+CREATE OR REPLACE TRIGGER trg_productos_categorias
+FOR INSERT OR UPDATE OR DELETE ON productos
+COMPOUND TRIGGER
+    TYPE cambio IS RECORD (
+        products INTEGER,
+        in_stock INTEGER,
+        min_price INTEGER,
+        max_price INTEGER,
+        recompute BOOLEAN
+    );
+    TYPE cambios_categoria IS TABLE OF cambio INDEX BY PLS_INTEGER;
+    cambios cambios_categoria;
+
+    PROCEDURE acumular(p_category INTEGER, p_product INTEGER, p_price INTEGER, p_sign INTEGER) IS
+        v_in_stock INTEGER;
+    BEGIN
+        IF NOT cambios.EXISTS(p_category) THEN
+            cambios(p_category).products := 0;
+            cambios(p_category).in_stock := 0;
+            cambios(p_category).recompute := FALSE;
+        END IF;
+
+        -- FOR UPDATE: si una orden sin confirmar esta cambiando el stock se
+        -- espera a su commit, asi no se cuenta dos veces el mismo cambio
+        -- (aqui y en la cola de la orden)
+        BEGIN
+            SELECT CASE WHEN quantity > 0 THEN 1 ELSE 0 END INTO v_in_stock
+            FROM stock_productos
+            WHERE id_product = p_product
+            FOR UPDATE;
+        EXCEPTION
+            WHEN NO_DATA_FOUND THEN
+                v_in_stock := 0;
+        END;
+
+        cambios(p_category).products := cambios(p_category).products + p_sign;
+        cambios(p_category).in_stock := cambios(p_category).in_stock + p_sign * v_in_stock;
+        IF p_sign < 0 THEN
+            cambios(p_category).recompute := TRUE;
+        ELSE
+            cambios(p_category).min_price := LEAST(NVL(cambios(p_category).min_price, p_price), p_price);
+            cambios(p_category).max_price := GREATEST(NVL(cambios(p_category).max_price, p_price), p_price);
+        END IF;
+    END;
+
+    AFTER EACH ROW IS
+    BEGIN
+        -- UPDATE_PRODUCT asigna todas las columnas: si no cambia nada del
+        -- resumen no se acumula
+        IF NOT (UPDATING
+                AND :OLD.category_id = :NEW.category_id
+                AND :OLD.active = :NEW.active
+                AND :OLD.price = :NEW.price) THEN
+            IF (DELETING OR UPDATING) AND :OLD.active = 'TRUE' THEN
+                acumular(:OLD.category_id, :OLD.id_product, :OLD.price, -1);
+            END IF;
+            IF (INSERTING OR UPDATING) AND :NEW.active = 'TRUE' THEN
+                acumular(:NEW.category_id, :NEW.id_product, :NEW.price, 1);
+            END IF;
+        END IF;
+    END AFTER EACH ROW;
+
+    AFTER STATEMENT IS
+        v_category INTEGER;
+        v_products INTEGER;
+        v_in_stock INTEGER;
+        v_min_price INTEGER;
+        v_max_price INTEGER;
+    BEGIN
+        v_category := cambios.FIRST;
+        WHILE v_category IS NOT NULL LOOP
+            v_products := cambios(v_category).products;
+            v_in_stock := cambios(v_category).in_stock;
+            v_min_price := cambios(v_category).min_price;
+            v_max_price := cambios(v_category).max_price;
+
+            MERGE INTO resumen_categorias r
+            USING (SELECT v_category AS id_category FROM dual) d
+            ON (r.id_category = d.id_category)
+            WHEN MATCHED THEN UPDATE
+                SET r.active_products = r.active_products + v_products,
+                    r.in_stock_products = r.in_stock_products + v_in_stock,
+                    r.min_price = LEAST(NVL(r.min_price, v_min_price), NVL(v_min_price, r.min_price)),
+                    r.max_price = GREATEST(NVL(r.max_price, v_max_price), NVL(v_max_price, r.max_price)),
+                    r.updated_at = SYSDATE
+            WHEN NOT MATCHED THEN INSERT (id_category, active_products, in_stock_products, min_price, max_price)
+                VALUES (v_category, v_products, v_in_stock, v_min_price, v_max_price);
+
+            IF cambios(v_category).recompute THEN
+                UPDATE resumen_categorias
+                SET min_price = (SELECT MIN(price) FROM productos
+                                 WHERE category_id = v_category AND active = 'TRUE'),
+                    max_price = (SELECT MAX(price) FROM productos
+                                 WHERE category_id = v_category AND active = 'TRUE')
+                WHERE id_category = v_category;
+            END IF;
+
+            v_category := cambios.NEXT(v_category);
+        END LOOP;
+        cambios.DELETE;
+    END AFTER STATEMENT;
+END;
+/
+
+-- Suma la cola al resumen. Solo se borran y suman las filas confirmadas al
+-- empezar; las categorias se bloquean en orden ascendente, igual que en el
+-- trigger de productos
+CREATE OR REPLACE PROCEDURE plegar_resumen_categorias IS
+    TYPE numeros IS TABLE OF INTEGER;
+    TYPE totales_categoria IS TABLE OF INTEGER INDEX BY PLS_INTEGER;
+    v_categories numeros;
+    v_deltas numeros;
+    v_totals totales_categoria;
+    v_category INTEGER;
+    v_delta INTEGER;
+BEGIN
+    DELETE FROM resumen_categorias_stock
+    RETURNING id_category, delta BULK COLLECT INTO v_categories, v_deltas;
+
+    FOR i IN 1 .. v_categories.COUNT LOOP
+        IF v_totals.EXISTS(v_categories(i)) THEN
+            v_totals(v_categories(i)) := v_totals(v_categories(i)) + v_deltas(i);
+        ELSE
+            v_totals(v_categories(i)) := v_deltas(i);
+        END IF;
+    END LOOP;
+
+    v_category := v_totals.FIRST;
+    WHILE v_category IS NOT NULL LOOP
+        v_delta := v_totals(v_category);
+        IF v_delta <> 0 THEN
+            UPDATE resumen_categorias
+            SET in_stock_products = in_stock_products + v_delta,
+                updated_at = SYSDATE
+            WHERE id_category = v_category;
+        END IF;
+        v_category := v_totals.NEXT(v_category);
+    END LOOP;
+    COMMIT;
+END;
+/
+
+BEGIN
+    DBMS_SCHEDULER.CREATE_JOB(
+        job_name => 'plegar_resumen_categorias_job',
+        job_type => 'STORED_PROCEDURE',
+        job_action => 'plegar_resumen_categorias',
+        repeat_interval => 'FREQ=MINUTELY',
+        enabled => TRUE
+    );
+END;
+/